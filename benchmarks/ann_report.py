@@ -0,0 +1,92 @@
+# benchmarks/ann_report.py
+
+import argparse
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from utils.lance_db_utils import LanceDBUtils
+from utils.logger_config import setup_logging
+
+def recall_latency_report(db_utils: LanceDBUtils, table_name: str, num_queries: int = 200, top_k: int = 5,
+                          nprobes_values: Optional[List[int]] = None, refine_values: Optional[List[Optional[int]]] = None,
+                          seed: int = 0) -> List[Dict[str, float]]:
+    """
+    Measure recall@k and latency of indexed search against exact brute-force search.
+
+    Queries are vectors sampled from the table itself; the exact neighbours are computed with
+    NumPy over all stored embeddings.
+
+    :param db_utils: LanceDBUtils connected to the database holding the table.
+    :param table_name: Name of an indexed table.
+    :param num_queries: Number of sampled query vectors.
+    :param top_k: Number of neighbours per query.
+    :param nprobes_values: nprobes settings to evaluate.
+    :param refine_values: refine_factor settings to evaluate (None disables re-ranking).
+    :param seed: Random seed for query sampling.
+    :return: One row per setting with recall and latency percentiles in milliseconds.
+    """
+    nprobes_values = nprobes_values or [1, 5, 10, 20, 50, 100]
+    refine_values = refine_values or [None, 5, 10]
+
+    rows = db_utils.read_columns(table_name, ['id', 'embedding'])
+    ids = np.array([row['id'] for row in rows])
+    vectors = np.asarray([row['embedding'] for row in rows], dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)]
+
+    report = []
+    latencies = []
+    truth = []
+    for query in queries:
+        started = time.perf_counter()
+        distances = np.sum((vectors - query) ** 2, axis=1)
+        nearest = np.argpartition(distances, top_k)[:top_k]
+        latencies.append(time.perf_counter() - started)
+        truth.append(set(ids[nearest]))
+    report.append(_summarize('brute_force', None, 1.0, latencies))
+
+    for nprobes in nprobes_values:
+        for refine_factor in refine_values:
+            latencies = []
+            hits = 0
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                result = db_utils.search(table_name, query, top_k, nprobes=nprobes, refine_factor=refine_factor)
+                found = result.to_arrow()['id'].to_pylist()
+                latencies.append(time.perf_counter() - started)
+                hits += len(expected.intersection(found))
+            report.append(_summarize(nprobes, refine_factor, hits / (len(queries) * top_k), latencies))
+    return report
+
+def _summarize(nprobes, refine_factor, recall: float, latencies: List[float]) -> Dict[str, float]:
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'nprobes': nprobes,
+        'refine_factor': refine_factor,
+        'recall': round(recall, 4),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 2),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report recall versus latency of the ANN index against brute force.")
+    parser.add_argument('--db_path', type=str, default=os.getenv('DB_PATH', 'my_lancedb'), help='Path of the LanceDB database.')
+    parser.add_argument('--table_name', type=str, default='xbot_data', help='Name of the table to evaluate.')
+    parser.add_argument('--num_queries', type=int, default=200, help='Number of sampled query vectors.')
+    parser.add_argument('--top_k', type=int, default=5, help='Number of neighbours per query.')
+    parser.add_argument('--build', action='store_true', help='Build the index first, even below the size threshold.')
+    args = parser.parse_args()
+    setup_logging()
+
+    db_utils = LanceDBUtils(db_path=args.db_path)
+    if args.build:
+        db_utils.build_index(args.table_name)
+    elif not db_utils.has_index(args.table_name):
+        logging.error(f"Table '{args.table_name}' has no vector index; rerun with --build.")
+        raise SystemExit(1)
+
+    print(f"{'nprobes':>12} {'refine':>7} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for row in recall_latency_report(db_utils, args.table_name, args.num_queries, args.top_k):
+        print(f"{str(row['nprobes']):>12} {str(row['refine_factor']):>7} {row['recall']:>7.3f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}")
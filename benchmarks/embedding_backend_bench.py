@@ -0,0 +1,100 @@
+# benchmarks/embedding_backend_bench.py
+
+import argparse
+import random
+import sys
+import time
+from typing import Any, Dict, List
+import numpy as np
+from utils.embedding_backends import ONNXBackend, SentenceTransformerBackend
+from utils.logger_config import setup_logging
+
+SAMPLE_WORDS = [
+    'quantum', 'computing', 'language', 'models', 'research', 'the', 'bot', 'replies', 'to', 'a', 'thread',
+    'about', 'vector', 'search', 'latency', 'embedding', 'retrieval', 'memory', 'of', 'conversation', 'and',
+]
+
+def sample_texts(count: int, min_words: int = 4, max_words: int = 60, seed: int = 0) -> List[str]:
+    """
+    Generate texts of varied length, like a mix of tweets and corpus chunks.
+
+    :param count: Number of texts.
+    :param min_words: Minimum words per text.
+    :param max_words: Maximum words per text.
+    :param seed: Random seed.
+    :return: The generated texts.
+    """
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(SAMPLE_WORDS) for _ in range(rng.randint(min_words, max_words))) + '.' for _ in range(count)]
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """
+    Compare the vectors of two backends text by text.
+
+    :param reference: Reference vectors, one row per text.
+    :param candidate: Vectors of the same texts from another backend.
+    :return: Mean and minimum cosine similarity between corresponding rows.
+    """
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    return {'mean_cosine': float(cosines.mean()), 'min_cosine': float(cosines.min())}
+
+def backend_report(backends: Dict[str, Any], texts: List[str], repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    Time each backend on the same texts and compare its vectors with those of the first one.
+
+    Each backend embeds the texts once before timing, which loads (and if needed exports and
+    quantizes) its model.
+
+    :param backends: Backends by name; the first is the reference.
+    :param texts: Texts to embed.
+    :param repeat: Runs per backend; the fastest is reported.
+    :return: One row per backend with its throughput and agreement with the reference.
+    """
+    report = []
+    reference = None
+    for name, backend in backends.items():
+        started = time.perf_counter()
+        vectors = backend.encode(texts[:1])
+        first_use_s = time.perf_counter() - started
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            vectors = backend.encode(texts)
+            timings.append(time.perf_counter() - started)
+        if reference is None:
+            reference = vectors
+        row = {'backend': name, 'first_use_s': round(first_use_s, 2), 'texts_per_s': round(len(texts) / min(timings), 1)}
+        row.update(cosine_agreement(reference, vectors))
+        report.append(row)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the throughput and accuracy of the embedding backends on CPU.")
+    parser.add_argument('--model_name', type=str, default='sentence-transformers/all-MiniLM-L6-v2', help='Embedding model.')
+    parser.add_argument('--texts', type=int, default=1000, help='Number of texts to embed.')
+    parser.add_argument('--batch_size', type=int, default=32, help='Texts per forward pass.')
+    parser.add_argument('--num_threads', type=int, default=0, help='ONNX Runtime threads (0 lets it decide).')
+    parser.add_argument('--cache_dir', type=str, default='onnx_models', help='Directory of the exported ONNX models.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per backend.')
+    parser.add_argument('--min_cosine', type=float, default=0.99, help='Minimum mean cosine agreement with PyTorch.')
+    args = parser.parse_args()
+    setup_logging()
+
+    backends = {
+        'pytorch': SentenceTransformerBackend(args.model_name, batch_size=args.batch_size),
+        'onnx': ONNXBackend(args.model_name, args.cache_dir, quantize=False, num_threads=args.num_threads, batch_size=args.batch_size),
+        'onnx-int8': ONNXBackend(args.model_name, args.cache_dir, quantize=True, num_threads=args.num_threads, batch_size=args.batch_size),
+    }
+    report = backend_report(backends, sample_texts(args.texts), args.repeat)
+
+    baseline = report[0]['texts_per_s']
+    print(f"{'backend':<10} {'first use s':>11} {'texts/s':>9} {'speedup':>8} {'mean cos':>9} {'min cos':>8}")
+    for row in report:
+        print(f"{row['backend']:<10} {row['first_use_s']:>11.2f} {row['texts_per_s']:>9.1f} {row['texts_per_s'] / baseline:>7.2f}x "
+              f"{row['mean_cosine']:>9.4f} {row['min_cosine']:>8.4f}")
+    failures = [row['backend'] for row in report if row['mean_cosine'] < args.min_cosine]
+    for name in failures:
+        print(f"FAIL: {name} agrees with PyTorch at a mean cosine below {args.min_cosine}")
+    sys.exit(1 if failures else 0)
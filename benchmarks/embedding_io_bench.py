@@ -0,0 +1,112 @@
+# benchmarks/embedding_io_bench.py
+
+import argparse
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+from utils.lance_db_utils import LanceDBUtils
+from utils.logger_config import setup_logging
+
+def sample_chunks(count: int, dimension: int = 384, seed: int = 0) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Generate corpus rows and their float32 embeddings, as the embedding model returns them.
+
+    :param count: Number of chunks.
+    :param dimension: Embedding dimension.
+    :param seed: Random seed.
+    :return: The rows (without embeddings) and a (count, dimension) float32 array.
+    """
+    rng = np.random.default_rng(seed)
+    rows = [{'id': f'chunk-{index}', 'source': f'https://example.com/{index % 50}', 'text': f'Chunk {index} of the corpus. ' * 8}
+            for index in range(count)]
+    return rows, rng.standard_normal((count, dimension), dtype=np.float32)
+
+def list_insert(db_utils: LanceDBUtils, table_name: str, rows: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+    # The former path: embeddings boxed into Python lists, one per row dict
+    data = [dict(row, embedding=embedding) for row, embedding in zip(rows, embeddings.tolist())]
+    db_utils.create_table(table_name, data=data)
+
+def arrow_insert(db_utils: LanceDBUtils, table_name: str, rows: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+    db_utils.add_data(table_name, rows, embeddings=embeddings)
+
+def dataframe_query(db_utils: LanceDBUtils, table_name: str, query: np.ndarray, top_k: int) -> List[str]:
+    # The former path: every column, embeddings included, read into a DataFrame
+    return db_utils.search(table_name, query.tolist(), top_k).to_df()['text'].tolist()
+
+def arrow_query(db_utils: LanceDBUtils, table_name: str, query: np.ndarray, top_k: int) -> List[str]:
+    return db_utils.search_texts(table_name, query, top_k)
+
+def measure(run: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """
+    Time a function and measure the peak Python heap (NumPy arrays included) it allocates.
+
+    :param run: Function to measure; it must leave state so that each call does the same work.
+    :param repeat: Timed runs; the fastest is reported. One more run is traced for allocations.
+    :return: Best time in milliseconds and traced peak allocation in MiB.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ms': min(timings) * 1000, 'peak_mib': peak / 2 ** 20}
+
+def io_report(chunks: int = 10000, dimension: int = 384, queries: int = 100, top_k: int = 5, repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    Compare writing chunks and reading search results through Python lists and through Arrow.
+
+    Each insert run writes ``chunks`` rows into a fresh table; each query run performs
+    ``queries`` searches against the table written last.
+
+    :param chunks: Chunks per insert.
+    :param dimension: Embedding dimension.
+    :param queries: Searches per query run.
+    :param top_k: Results per search.
+    :param repeat: Timed runs per path.
+    :return: One row per path and stage with its time and peak allocation.
+    """
+    rows, embeddings = sample_chunks(chunks, dimension)
+    query_vectors = embeddings[:queries]
+    db_path = tempfile.mkdtemp()
+    try:
+        db_utils = LanceDBUtils(db_path=db_path)
+        report = []
+        for name, insert, query in (('lists', list_insert, dataframe_query), ('arrow', arrow_insert, arrow_query)):
+            def write() -> None:
+                db_utils.drop_table(name)
+                insert(db_utils, name, rows, embeddings)
+
+            def read() -> None:
+                for vector in query_vectors:
+                    query(db_utils, name, vector, top_k)
+
+            report.append(dict(measure(write, repeat), path=name, stage=f'insert {chunks}'))
+            report.append(dict(measure(read, repeat), path=name, stage=f'{queries} queries'))
+        return report
+    finally:
+        shutil.rmtree(db_path, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the time and allocations of list-based and Arrow embedding I/O.")
+    parser.add_argument('--chunks', type=int, default=10000, help='Chunks written per insert.')
+    parser.add_argument('--dimension', type=int, default=384, help='Embedding dimension.')
+    parser.add_argument('--queries', type=int, default=100, help='Searches per query run.')
+    parser.add_argument('--top_k', type=int, default=5, help='Results per search.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per path.')
+    args = parser.parse_args()
+    setup_logging()
+
+    report = io_report(args.chunks, args.dimension, args.queries, args.top_k, args.repeat)
+    baselines = {row['stage']: row for row in report if row['path'] == 'lists'}
+    print(f"{'stage':<14} {'path':<6} {'ms':>9} {'peak MiB':>9} {'speedup':>8} {'MiB saved':>10}")
+    for row in report:
+        baseline = baselines[row['stage']]
+        print(f"{row['stage']:<14} {row['path']:<6} {row['ms']:>9.1f} {row['peak_mib']:>9.1f} "
+              f"{baseline['ms'] / row['ms']:>7.2f}x {baseline['peak_mib'] - row['peak_mib']:>10.1f}")
@@ -0,0 +1,110 @@
+# benchmarks/startup_bench.py
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+# Dependencies that must not be imported until a component first needs them
+HEAVY_MODULES = ['lancedb', 'pyarrow', 'sentence_transformers', 'torch', 'onnxruntime', 'tokenizers', 'openai', 'tweepy', 'langchain', 'aiohttp', 'unstructured']
+
+# Imports XBot and constructs it in a fresh interpreter, reporting both phases and what got loaded
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from bots.xbot import XBot
+imported = time.perf_counter()
+bot = XBot(config_path=sys.argv[1])
+constructed = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'construct_ms': (constructed - imported) * 1000,
+    'loaded': [name for name in json.loads(sys.argv[2]) if name in sys.modules],
+}))
+"""
+
+def _environment(state_dir: str) -> Dict[str, str]:
+    # Keep every on-disk state file of the measured process in a scratch directory
+    env = dict(os.environ)
+    env.update({
+        'DB_PATH': os.path.join(state_dir, 'lancedb'),
+        'EMBEDDING_CACHE_PATH': os.path.join(state_dir, 'embedding_cache.sqlite'),
+        'RATE_LIMIT_STATE_PATH': os.path.join(state_dir, 'rate_limits.sqlite'),
+    })
+    return env
+
+def cold_start(config_path: str = 'config/xbot_character.json', runs: int = 5) -> Dict[str, Any]:
+    """
+    Measure the cold start of XBot: importing it and constructing it in fresh interpreters.
+
+    :param config_path: Path to the character JSON file.
+    :param runs: Number of fresh interpreters to measure.
+    :return: Median import, construction and total times in milliseconds, and the heavy
+        modules loaded by the end of construction.
+    """
+    samples = []
+    with tempfile.TemporaryDirectory() as state_dir:
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT, config_path, json.dumps(HEAVY_MODULES)],
+                capture_output=True, text=True, check=True, env=_environment(state_dir)
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+    import_ms = statistics.median(sample['import_ms'] for sample in samples)
+    construct_ms = statistics.median(sample['construct_ms'] for sample in samples)
+    return {
+        'import_ms': round(import_ms, 1),
+        'construct_ms': round(construct_ms, 1),
+        'total_ms': round(import_ms + construct_ms, 1),
+        'loaded': sorted({name for sample in samples for name in sample['loaded']}),
+    }
+
+def import_profile(module: str = 'bots.xbot', top: int = 15) -> List[Tuple[str, float, float]]:
+    """
+    Profile the imports of a module with ``python -X importtime``.
+
+    :param module: Module to import in a fresh interpreter.
+    :param top: Number of modules to report.
+    :return: (module, self ms, cumulative ms) of the modules with the largest cumulative time.
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        capture_output=True, text=True, check=True
+    ).stderr
+    rows = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        # The first entry of a module is where it was really imported
+        rows.setdefault(name, (name, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return sorted(rows.values(), key=lambda row: row[2], reverse=True)[:top]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile XBot's cold start and enforce a startup budget.")
+    parser.add_argument('--config_path', type=str, default='config/xbot_character.json', help='Path to the character JSON file.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to measure.')
+    parser.add_argument('--budget_ms', type=float, default=1000.0, help='Maximum median cold start (import and construction) in milliseconds.')
+    parser.add_argument('--top', type=int, default=15, help='Number of modules in the import profile.')
+    args = parser.parse_args()
+
+    print(f"{'module':<48} {'self ms':>9} {'cumulative ms':>14}")
+    for name, self_ms, cumulative_ms in import_profile('bots.xbot', args.top):
+        print(f"{name:<48} {self_ms:>9.1f} {cumulative_ms:>14.1f}")
+
+    report = cold_start(args.config_path, args.runs)
+    print(f"\nimport {report['import_ms']:.1f} ms + construction {report['construct_ms']:.1f} ms = {report['total_ms']:.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms)")
+    failures = []
+    if report['total_ms'] > args.budget_ms:
+        failures.append(f"cold start of {report['total_ms']:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if report['loaded']:
+        failures.append(f"heavy modules loaded at startup: {', '.join(report['loaded'])}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,106 @@
+# benchmarks/tweet_splitter_bench.py
+
+import argparse
+import random
+import re
+import time
+from typing import Dict, List
+from utils.logger_config import setup_logging
+from utils.tweet_splitter import TweetSegmenter
+
+SAMPLE_WORDS = [
+    'quantum', 'computing', 'réseau', 'данные', 'مرحبا', 'नमस्ते', '機械学習', '인공지능', '👩‍💻', '🇯🇵',
+    'https://example.com/path?q=1', 'research', 'language', 'models',
+]
+SAMPLE_PUNCTUATION = ['', '', '', ',', '.', '!', '?', '。']
+
+class LegacyTweetSegmenter:
+    """
+    The previous splitter, kept for comparison: it counts code points rather than Twitter's
+    weighted length and re-scans and copies the remaining buffer for every tweet it cuts.
+    """
+    SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s+')
+
+    def __init__(self, character_limit: int = 280):
+        self.capacity = character_limit
+        self._buffer = ''
+
+    def _cut(self, text: str) -> int:
+        window = text[:self.capacity + 1]
+        boundary = 0
+        for match in self.SENTENCE_END.finditer(window):
+            if len(window[:match.end()].rstrip()) <= self.capacity:
+                boundary = match.end()
+        if boundary:
+            return boundary
+        space = max(window.rfind(' '), window.rfind('\n'))
+        return space + 1 if space > 0 else self.capacity
+
+    def split(self, text: str) -> List[str]:
+        self._buffer = text
+        tweets = []
+        while len(self._buffer.strip()) > self.capacity:
+            self._buffer = self._buffer.lstrip()
+            cut = self._cut(self._buffer)
+            segment = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:]
+            if segment:
+                tweets.append(segment)
+        if self._buffer.strip():
+            tweets.append(self._buffer.strip())
+        return tweets
+
+def sample_text(num_chars: int, seed: int = 0) -> str:
+    """
+    Generate multilingual text of roughly a given length.
+
+    :param num_chars: Number of characters to generate.
+    :param seed: Random seed.
+    :return: The generated text.
+    """
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < num_chars:
+        part = rng.choice(SAMPLE_WORDS) + rng.choice(SAMPLE_PUNCTUATION) + rng.choice([' ', ' ', '\n'])
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)
+
+def splitter_report(sizes: List[int], character_limit: int = 280, repeat: int = 3) -> List[Dict[str, float]]:
+    """
+    Time the legacy and current splitters on texts of increasing length.
+
+    :param sizes: Text lengths in characters.
+    :param character_limit: Maximum tweet length.
+    :param repeat: Runs per measurement; the fastest is reported.
+    :return: One row per size with both timings in milliseconds and microseconds per character.
+    """
+    report = []
+    for size in sizes:
+        text = sample_text(size)
+        row = {'chars': len(text)}
+        for name, splitter in (('legacy', LegacyTweetSegmenter(character_limit)), ('segmenter', TweetSegmenter(character_limit))):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                tweets = splitter.split(text)
+                timings.append(time.perf_counter() - started)
+            row[f'{name}_ms'] = round(min(timings) * 1000, 2)
+            row[f'{name}_us_per_char'] = round(min(timings) * 1e6 / len(text), 3)
+            row[f'{name}_tweets'] = len(tweets)
+        report.append(row)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the legacy and current tweet splitters on growing texts.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000], help='Text lengths in characters.')
+    parser.add_argument('--character_limit', type=int, default=280, help='Maximum tweet length.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement.')
+    args = parser.parse_args()
+    setup_logging()
+
+    print(f"{'chars':>9} {'legacy ms':>10} {'µs/char':>8} {'tweets':>7} {'new ms':>9} {'µs/char':>8} {'tweets':>7}")
+    for row in splitter_report(args.sizes, args.character_limit, args.repeat):
+        print(f"{row['chars']:>9} {row['legacy_ms']:>10.2f} {row['legacy_us_per_char']:>8.3f} {row['legacy_tweets']:>7} "
+              f"{row['segmenter_ms']:>9.2f} {row['segmenter_us_per_char']:>8.3f} {row['segmenter_tweets']:>7}")
@@ -1,7 +1,9 @@
 # bots/__init__.py
 
+from .host import BotHost
 from .xbot import XBot
 
 __all__ = [
+    "BotHost",
     "XBot"
 ]
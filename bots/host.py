@@ -0,0 +1,155 @@
+# bots/host.py
+
+import json
+import logging
+import re
+from threading import Lock
+from typing import Dict, List, Optional
+from utils.config import Config
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.embedding_cache import EmbeddingCache
+from utils.http_transport import HTTPTransport
+from utils.lance_db_utils import LanceDBUtils, LocalEmbeddings
+from utils.rate_limiter import RateLimiter
+from utils.twitter_utils import TWITTER_RATE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+def persona_key(name: str) -> str:
+    """
+    Turn a persona name into a key usable in table names.
+
+    :param name: The persona's name.
+    :return: Lowercase name with runs of other characters replaced by underscores.
+    """
+    return re.sub(r'[^0-9a-zA-Z]+', '_', name).strip('_').lower() or 'persona'
+
+class BotHost:
+    def __init__(self, transport: Optional[HTTPTransport] = None):
+        """
+        Initialize a host running any number of personas in one process.
+
+        The embedding model (and its cache), the LanceDB connection, the HTTP connection pools
+        and the Twitter endpoint rate limits of the account are created once and shared by every
+        persona; each persona keeps its own corpus and memory tables, system prompt, response
+        cache scope and response rate limit. Shared components are lazy, so a persona costs
+        little more than its character profile.
+
+        :param transport: HTTP transport shared by every persona's clients; one is built from
+            the configured pool sizes and timeouts if omitted.
+        """
+        self.config = Config()
+        self._owns_transport = transport is None
+        self.transport = transport or HTTPTransport(
+            pool_connections=self.config.http_pool_connections,
+            pool_maxsize=self.config.http_pool_maxsize,
+            connect_timeout=self.config.http_connect_timeout,
+            read_timeout=self.config.http_read_timeout
+        )
+        self.db_utils = LanceDBUtils(
+            db_path=self.config.db_path,
+            index_min_rows=self.config.index_min_rows,
+            index_rebuild_fraction=self.config.index_rebuild_fraction,
+            nprobes=self.config.index_nprobes,
+            refine_factor=self.config.index_refine_factor or None,
+            index_check_ttl=self.config.index_check_ttl
+        )
+        self.embedding_cache = EmbeddingCache(
+            max_entries=self.config.embedding_cache_size,
+            db_path=self.config.embedding_cache_path or None
+        )
+        self.embedding_fn = LocalEmbeddings(
+            model_name=self.config.embedding_model,
+            cache=self.embedding_cache,
+            backend=self.config.embedding_backend,
+            onnx_cache_dir=self.config.embedding_onnx_cache_dir,
+            quantize=self.config.embedding_quantize,
+            num_threads=self.config.embedding_threads
+        )
+        # Concurrent queries and memory writes of every persona share batched model calls
+        self.embedding_batcher: Optional[EmbeddingBatcher] = None
+        if self.config.embedding_batch_wait_ms > 0:
+            self.embedding_batcher = EmbeddingBatcher(
+                self.embedding_fn,
+                max_batch_size=self.config.embedding_batch_size,
+                max_wait_ms=self.config.embedding_batch_wait_ms
+            )
+            self.embedding_fn = self.embedding_batcher
+        # Twitter's limits apply to the account, which every persona posts from
+        self.twitter_rate_limiter = RateLimiter(TWITTER_RATE_LIMITS, db_path=self.config.rate_limit_state_path or None)
+        self.bots: Dict[str, 'XBot'] = {}
+        self._lock = Lock()
+
+    def add_persona(self, config_path: str, table_name: Optional[str] = None) -> 'XBot':
+        """
+        Start a persona from its character file.
+
+        :param config_path: Path to the character JSON file.
+        :param table_name: Name of the persona's corpus table; ``<persona>_data`` by default.
+        :return: The persona's bot.
+        :raises ValueError: If a persona with the same name, or a name mapping to the same table
+            names (such as "Ada L" and "Ada-L"), is already running.
+        """
+        from bots.xbot import XBot
+
+        with open(config_path, 'r') as file:
+            name = json.load(file).get('name', 'Alexandra')
+        key = persona_key(name)
+        with self._lock:
+            running = next((other for other in self.bots if persona_key(other) == key), None)
+            if running is not None:
+                raise ValueError(f"Persona '{name}' would share the tables of the running persona '{running}'."
+                                 if running != name else f"Persona '{name}' is already running.")
+            bot = XBot(
+                config_path=config_path,
+                table_name=table_name or f"{key}_data",
+                host=self,
+                memory_table_name=f"{key}_memory"
+            )
+            self.bots[name] = bot
+        logger.info(f"Started persona '{name}' ({len(self.bots)} running).")
+        return bot
+
+    def get(self, name: str) -> 'XBot':
+        """
+        Return a running persona.
+
+        :param name: The persona's name.
+        :return: The persona's bot.
+        :raises KeyError: If no persona of that name is running.
+        """
+        with self._lock:
+            return self.bots[name]
+
+    def personas(self) -> List[str]:
+        """
+        Return the names of the running personas.
+        """
+        with self._lock:
+            return list(self.bots)
+
+    def remove_persona(self, name: str) -> None:
+        """
+        Stop a persona, flushing its state.
+
+        :param name: The persona's name.
+        """
+        with self._lock:
+            bot = self.bots.pop(name, None)
+        if bot is not None:
+            bot.close()
+            logger.info(f"Stopped persona '{name}'.")
+
+    def close(self) -> None:
+        """
+        Stop every persona and release the shared components.
+        """
+        for name in self.personas():
+            self.remove_persona(name)
+        if self.embedding_batcher is not None:
+            self.embedding_batcher.close()
+            logger.info(f"Embedding batcher stats: {self.embedding_batcher.stats()}")
+        self.embedding_cache.close()
+        self.twitter_rate_limiter.close()
+        if self._owns_transport:
+            self.transport.close()
@@ -0,0 +1,80 @@
+# bots/run_worker.py
+
+import logging
+import argparse
+from utils.logger_config import setup_logging
+from bots.worker import MentionWorker
+from bots.xbot import XBot
+
+def main(config_path: str, table_name: str, workers: int, queue_size: int, poll_interval: float, state_path: str,
+         max_attempts: int):
+    try:
+        setup_logging()
+        bot = XBot(config_path=config_path, table_name=table_name)
+        worker = MentionWorker(
+            bot,
+            num_workers=workers,
+            queue_size=queue_size,
+            poll_interval=poll_interval,
+            state_path=state_path,
+            max_attempts=max_attempts
+        )
+        worker.run_forever()
+        bot.close()
+    except Exception as e:
+        logging.error(f"An error occurred in the worker service: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the XBot mention and DM worker service.")
+    parser.add_argument(
+        '--config_path',
+        type=str,
+        default='config/xbot_character.json',
+        help='Path to the character configuration JSON file.'
+    )
+    parser.add_argument(
+        '--table_name',
+        type=str,
+        default='xbot_data',
+        help='Name of the database table to use.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Number of worker threads answering mentions and DMs.'
+    )
+    parser.add_argument(
+        '--queue_size',
+        type=int,
+        default=100,
+        help='Maximum number of queued mentions and DMs.'
+    )
+    parser.add_argument(
+        '--poll_interval',
+        type=float,
+        default=60.0,
+        help='Seconds between polls for new mentions and DMs.'
+    )
+    parser.add_argument(
+        '--state_path',
+        type=str,
+        default='worker_state.json',
+        help='Path of the file holding the persisted polling cursors.'
+    )
+    parser.add_argument(
+        '--max_attempts',
+        type=int,
+        default=3,
+        help='Attempts at answering a mention or DM before it is skipped.'
+    )
+    args = parser.parse_args()
+    main(
+        config_path=args.config_path,
+        table_name=args.table_name,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        poll_interval=args.poll_interval,
+        state_path=args.state_path,
+        max_attempts=args.max_attempts
+    )
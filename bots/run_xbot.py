@@ -15,6 +15,7 @@ def main(config_path: str, table_name: str):
         user_query = "Can you explain the basics of Quantum Computing?"
         response = bot.process_query(user_query)
         print(f"Bot Response: {response}")
+        bot.close()
     except Exception as e:
         logging.error(f"An error occurred in main: {e}")
 
@@ -0,0 +1,299 @@
+# bots/worker.py
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class CursorStore:
+    def __init__(self, path: str):
+        """
+        Initialize persisted polling cursors.
+
+        For each stream (mentions, DMs) the store keeps a since_id below which every item has been
+        handled, plus the IDs above it that are already done. Restarting from this state neither
+        skips nor repeats an item.
+
+        :param path: Path of the JSON file holding the cursors.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as file:
+                    self._state = json.load(file)
+                logger.info(f"Loaded worker cursors from {path}.")
+            except Exception as e:
+                logger.error(f"Failed to load worker cursors from {path}: {e}")
+
+    def since_id(self, stream: str) -> Optional[int]:
+        with self._lock:
+            return self._state.get(stream, {}).get('since_id')
+
+    def done_ids(self, stream: str) -> Set[int]:
+        with self._lock:
+            return set(self._state.get(stream, {}).get('done', []))
+
+    def commit(self, stream: str, since_id: Optional[int], done: Set[int]) -> None:
+        """
+        Persist a stream's cursor atomically.
+
+        :param stream: Stream name.
+        :param since_id: Highest ID below which everything is handled.
+        :param done: Handled IDs above ``since_id``.
+        """
+        with self._lock:
+            self._state[stream] = {'since_id': since_id, 'done': sorted(done)}
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w') as file:
+                    json.dump(self._state, file)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Failed to persist worker cursors to {self.path}: {e}")
+
+class _StreamState:
+    def __init__(self, since_id: Optional[int], done: Set[int]):
+        self.since_id = since_id
+        self.done = done
+        self.in_flight: Set[int] = set()
+        self.high_water = max([since_id or 0, *done])
+
+    def is_new(self, item_id: int) -> bool:
+        return (self.since_id is None or item_id > self.since_id) and item_id not in self.done and item_id not in self.in_flight
+
+    def watermark(self) -> Optional[int]:
+        """
+        Return the highest ID below which nothing is still in flight.
+        """
+        if self.in_flight:
+            return min(self.in_flight) - 1
+        return self.high_water or self.since_id
+
+class MentionWorker:
+    STREAMS = ('mentions', 'direct_messages')
+
+    def __init__(self, bot: Any, twitter: Optional[Any] = None, num_workers: int = 4, queue_size: int = 100,
+                 poll_interval: float = 60.0, state_path: str = 'worker_state.json', max_attempts: int = 3,
+                 retry_delay: float = 5.0):
+        """
+        Initialize a worker service that answers mentions and DMs.
+
+        A poller thread fetches mentions and DMs newer than the persisted cursors and puts them
+        on a bounded queue; a pool of worker threads answers them through the bot. Items are
+        deduplicated by ID, and cursors only advance past items that were fully handled, so a
+        restart continues where the previous run stopped. A failed item is retried with
+        exponential backoff and given up on after ``max_attempts`` attempts.
+
+        Workers never sleep on a wait: before answering an item they reserve the bot's response
+        rate-limit slot, and an item whose slot (or retry) is not due yet is set aside until it
+        is while the worker moves on, so stopping is never held up by a pending wait.
+
+        :param bot: Bot whose process_query answers each item (normally an XBot).
+        :param twitter: Twitter client with get_mentions and get_direct_messages; defaults to bot.twitter.
+        :param num_workers: Number of worker threads.
+        :param queue_size: Maximum number of queued items; polling blocks while the queue is full.
+        :param poll_interval: Seconds between polls.
+        :param state_path: Path of the JSON file holding the cursors.
+        :param max_attempts: Attempts at answering an item before it is counted as failed and skipped.
+        :param retry_delay: Seconds before the first retry; doubled for each further one.
+        """
+        self.bot = bot
+        self.twitter = twitter or bot.twitter
+        self.rate_limiter = getattr(bot, 'rate_limiter', None)
+        self.num_workers = max(1, num_workers)
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.cursors = CursorStore(state_path)
+        self.jobs: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max(1, queue_size))
+        # Items waiting for their rate-limit slot or retry, as a heap of (due time, sequence, job)
+        self._deferred: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._sequence = itertools.count()
+        self._streams = {
+            stream: _StreamState(self.cursors.since_id(stream), self.cursors.done_ids(stream))
+            for stream in self.STREAMS
+        }
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.processed = 0
+        self.failed = 0
+
+    def poll_once(self) -> int:
+        """
+        Fetch new mentions and DMs and queue them.
+
+        :return: Number of items queued.
+        """
+        fetchers = {
+            'mentions': self.twitter.get_mentions,
+            'direct_messages': self.twitter.get_direct_messages,
+        }
+        queued = 0
+        for stream, fetch in fetchers.items():
+            state = self._streams[stream]
+            for item in fetch(since_id=state.since_id):
+                with self._lock:
+                    if not state.is_new(item['id']):
+                        continue
+                    state.in_flight.add(item['id'])
+                    state.high_water = max(state.high_water, item['id'])
+                if not self._put(dict(item, stream=stream)):
+                    # Stopping: the item stays in flight so the cursor cannot move past it
+                    return queued
+                queued += 1
+        if queued:
+            logger.info(f"Queued {queued} new mentions and messages.")
+        return queued
+
+    def _put(self, job: Dict[str, Any]) -> bool:
+        while not self._stop.is_set():
+            if len(self._deferred) >= self.jobs.maxsize:
+                # Set-aside items count towards the queue bound
+                self._stop.wait(0.5)
+                continue
+            try:
+                self.jobs.put(job, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _poll_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Error polling Twitter: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def handle(self, job: Dict[str, Any]) -> None:
+        """
+        Answer one mention or DM.
+
+        :param job: The queued item.
+        :raises Exception: If the item could not be answered.
+        """
+        options = {'user_id': str(job['user_id']), 'raise_errors': True, 'rate_limit_reserved': self.rate_limiter is not None}
+        if job['stream'] == 'direct_messages':
+            self.bot.process_query(job['text'], recipient_id=job['user_id'], **options)
+        else:
+            self.bot.process_query(job['text'], in_reply_to_status_id=job['id'], **options)
+
+    def _defer(self, job: Dict[str, Any], delay: float) -> None:
+        with self._lock:
+            heapq.heappush(self._deferred, (time.monotonic() + delay, next(self._sequence), job))
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """
+        Return the next item to work on: a set-aside item that is due, or else the next queued one.
+
+        :return: The item, or None once the service is stopping.
+        """
+        while True:
+            wait = 0.5
+            with self._lock:
+                if self._deferred and not self._stop.is_set():
+                    wait = self._deferred[0][0] - time.monotonic()
+                    if wait <= 0:
+                        return heapq.heappop(self._deferred)[2]
+            try:
+                return self.jobs.get(timeout=min(max(wait, 0.01), 0.5))
+            except queue.Empty:
+                continue
+
+    def _worker_loop(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            if self.rate_limiter is not None and not job.get('reserved'):
+                # Take the next response slot now and come back when it is due, rather than sleeping until then
+                job['reserved'] = True
+                delay = self.rate_limiter.reserve('response')
+                if delay > 0:
+                    self._defer(job, delay)
+                    continue
+            attempt = job.get('attempt', 0)
+            try:
+                self.handle(job)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                logger.warning(f"Attempt {attempt + 1} of {self.max_attempts} at {job['stream']} item {job['id']} failed: {e}")
+                if attempt + 1 < self.max_attempts:
+                    self._defer(dict(job, attempt=attempt + 1, reserved=False), self.retry_delay * 2 ** attempt)
+                    continue
+                with self._lock:
+                    self.failed += 1
+                logger.error(f"Giving up on {job['stream']} item {job['id']} after {self.max_attempts} attempts.")
+            self._complete(job)
+
+    def _complete(self, job: Dict[str, Any]) -> None:
+        stream = job['stream']
+        state = self._streams[stream]
+        with self._lock:
+            state.in_flight.discard(job['id'])
+            state.done.add(job['id'])
+            state.since_id = state.watermark()
+            state.done = {item_id for item_id in state.done if item_id > (state.since_id or 0)}
+            self.cursors.commit(stream, state.since_id, state.done)
+
+    def start(self) -> None:
+        """
+        Start the poller and worker threads.
+        """
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._worker_loop, name=f"xbot-worker-{index}", daemon=True) for index in range(self.num_workers)]
+        self._threads.append(threading.Thread(target=self._poll_loop, name='xbot-poller', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Worker service started with {self.num_workers} workers.")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop polling, let workers finish the items they are handling, and shut down.
+
+        Queued items that were not started, and items set aside for a rate-limit slot or a
+        retry, are dropped. They stay marked as in flight, which keeps the persisted cursor
+        below them, so the next run picks them up again.
+
+        :param timeout: Optional seconds to wait for each thread.
+        """
+        self._stop.set()
+        with self._lock:
+            dropped = len(self._deferred)
+            self._deferred.clear()
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                dropped += 1
+        for _ in range(self.num_workers):
+            self.jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        logger.info(f"Worker service stopped ({self.processed} processed, {self.failed} failed, {dropped} left for the next run).")
+
+    def run_forever(self) -> None:
+        """
+        Run until SIGINT or SIGTERM, then shut down gracefully.
+        """
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self._stop.set())
+        self.start()
+        while not self._stop.wait(1.0):
+            pass
+        self.stop()
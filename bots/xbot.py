@@ -1,66 +1,115 @@
 # bots/xbot.py
 
+import asyncio
 import logging
 import json
-from typing import Optional, List
-from utils.config import Config
-from utils.lance_db_utils import LanceDBUtils, LocalEmbeddings
-from utils.memory import Memory
-from utils.openai_utils import OpenAILLM
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, List, Tuple
+from bots.host import BotHost
+from utils.context_assembler import ContextAssembler
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.http_transport import HTTPTransport
+from utils.memory import DEFAULT_USER, Memory
+from utils.memory_compactor import MemoryCompactor, llm_summarizer
+from utils.openai_utils import OpenAILLM, StreamInterruptedError
+from utils.rate_limiter import RateLimiter, RetryPolicy
+from utils.response_cache import SemanticResponseCache
+from utils.tweet_splitter import TweetSegmenter, weighted_length
 from utils.twitter_utils import TwitterAPI
-from langchain.document_loaders import UnstructuredURLLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from threading import Lock
-import time
 
 logger = logging.getLogger(__name__)
 
 class XBot:
-    _instance = None
-    _lock = Lock()
-
-    def __new__(cls, *args, **kwargs):
-        """
-        Implement singleton pattern to ensure only one instance of XBot exists.
-        """
-        if not cls._instance:
-            with cls._lock:
-                if not cls._instance:
-                    cls._instance = super(XBot, cls).__new__(cls)
-        return cls._instance
-
-    def __init__(self, config_path: str = 'config/xbot_character.json', table_name: str = 'xbot_data'):
+    def __init__(self, config_path: str = 'config/xbot_character.json', table_name: str = 'xbot_data',
+                 transport: Optional[HTTPTransport] = None, openai_llm: Optional[OpenAILLM] = None,
+                 twitter: Optional[TwitterAPI] = None, host: Optional[BotHost] = None,
+                 memory_table_name: str = 'conversation_memory'):
         """
         Initialize the XBot with all necessary utilities and character configuration.
-        """
-        if hasattr(self, '_initialized') and self._initialized:
-            return  # Avoid re-initialization in singleton
 
+        The embedding model, LanceDB connection, HTTP pools and Twitter endpoint limits come from
+        ``host``, so several personas can share them in one process (see BotHost); a standalone
+        bot creates a private host.
+
+        :param config_path: Path to the character JSON file.
+        :param table_name: Name of the corpus table.
+        :param transport: HTTP transport shared by the clients when no host is given; one is
+            built from the configured pool sizes and timeouts if omitted.
+        :param openai_llm: LLM client to use instead of constructing one.
+        :param twitter: Twitter client to use instead of constructing one.
+        :param host: Host providing the shared components.
+        :param memory_table_name: Name of the persona's conversation memory table.
+        """
         try:
-            self.config = Config()
+            self._owns_host = host is None
+            self.host = host or BotHost(transport=transport)
+            self.config = self.host.config
             self.character_config_path = config_path
             self.table_name = table_name
             self.load_character_config(self.character_config_path)
-
-            self.db_utils = LanceDBUtils(db_path=self.config.db_path)
-            self.embedding_fn = LocalEmbeddings(model_name=self.config.embedding_model)
-            self.memory = Memory(db_utils=self.db_utils, embedding_fn=self.embedding_fn, table_name='conversation_memory')
-            self.memory.set_character_name(self.character.get('name', 'Alexandra'))
-            self.openai_llm = OpenAILLM(
+            self.persona = self.character.get('name', 'Alexandra')
+
+            self.transport = self.host.transport
+            self.db_utils = self.host.db_utils
+            self.embedding_cache = self.host.embedding_cache
+            self.embedding_fn = self.host.embedding_fn
+            self.memory = Memory(db_utils=self.db_utils, embedding_fn=self.embedding_fn, table_name=memory_table_name)
+            self.memory.set_character_name(self.persona)
+            self.openai_llm = openai_llm or OpenAILLM(
                 model=self.config.llm_model,
                 llm_settings=self.character.get('llm_settings', {}),
-                character_profile=self.character
+                character_profile=self.character,
+                character_config_path=self.character_config_path,
+                transport=self.transport
             )
-            self.twitter = TwitterAPI()
             self.interaction_policies = self.character.get('interaction_policies', {})
             self.rate_limit = self.interaction_policies.get('rate_limit_per_minute', 60)
             self.error_handling_strategy = self.interaction_policies.get('error_handling_strategy', 'retry_with_exponential_backoff')
             self.logging_level = self.interaction_policies.get('logging_level', 'INFO')
-            self.last_tweet_time = 0
-            self.tweet_interval = 60 / self.rate_limit if self.rate_limit > 0 else 0
-
-            self._initialized = True
-            logger.info("XBot initialized successfully.")
+            self.stream_responses = self.character.get('llm_settings', {}).get('stream', False)
+            # The persona's own response budget; Twitter's endpoint limits are shared through the host
+            self.rate_limiter = RateLimiter(
+                {'response': (self.rate_limit, 60)},
+                db_path=self.config.rate_limit_state_path or None,
+                namespace=self.persona
+            )
+            self.twitter = twitter or TwitterAPI(
+                rate_limiter=self.host.twitter_rate_limiter,
+                retry_policy=RetryPolicy(self.error_handling_strategy),
+                transport=self.transport
+            )
+            self.context_budget = self.character.get('context_budget', {})
+            self.retrieval_top_k = self.context_budget.get('retrieval_top_k', 5)
+            self.history_turns = self.context_budget.get('history_turns', 2)
+            self.recall_top_k = self.context_budget.get('recall_top_k', 3)
+            self.context_assembler = ContextAssembler(
+                model=self.openai_llm.prompt_cache.model,
+                max_prompt_tokens=self.context_budget.get('max_prompt_tokens', 2048),
+                context_share=self.context_budget.get('context_share', 0.6)
+            )
+            response_cache_settings = self.character.get('response_cache', {})
+            self.response_cache: Optional[SemanticResponseCache] = None
+            if response_cache_settings.get('enabled', True):
+                self.response_cache = SemanticResponseCache(
+                    db_utils=self.db_utils,
+                    persona=self.persona,
+                    similarity_threshold=response_cache_settings.get('similarity_threshold', 0.95),
+                    ttl_seconds=response_cache_settings.get('ttl_seconds', 24 * 60 * 60)
+                )
+            compaction_settings = self.character.get('memory_compaction', {})
+            self.memory_compactor: Optional[MemoryCompactor] = None
+            if compaction_settings.get('enabled', False):
+                self.memory_compactor = MemoryCompactor(
+                    memory=self.memory,
+                    summarize=llm_summarizer(self.openai_llm, self.persona),
+                    interval_seconds=compaction_settings.get('interval_seconds', 600),
+                    threshold=compaction_settings.get('threshold', 200),
+                    keep_recent=compaction_settings.get('keep_recent', 100),
+                    batch_size=compaction_settings.get('batch_size', 50),
+                    max_summaries=compaction_settings.get('max_summaries', 50),
+                    model=self.openai_llm.prompt_cache.model
+                )
+
+            logger.info(f"XBot initialized successfully as '{self.persona}'.")
         except Exception as e:
             logger.error(f"Failed to initialize XBot: {e}")
             raise
@@ -79,9 +128,18 @@ class XBot:
             logger.error(f"Failed to load character configuration: {e}")
             self.character = {}
 
-    def ingest_data(self) -> None:
+    def ingest_data(self, full_refresh: bool = False, batch_size: int = 256, **loader_options: Any) -> None:
         """
         Ingest data from URLs specified in the character configuration into LanceDB.
+
+        Ingestion is incremental: only sources whose content changed are re-split and
+        re-embedded, and the corpus table stays queryable throughout. Documents stream from the
+        loader into batched embedding and insertion, so memory use stays flat as the corpus grows.
+
+        :param full_refresh: Re-split and re-index every source even if its content is unchanged.
+        :param batch_size: Number of chunks embedded and inserted per batch.
+        :param loader_options: Options for ConcurrentURLLoader (fetch_workers, parse_workers,
+            per_host_limit, timeout, max_in_flight).
         """
         try:
             urls = self.character.get('ingestion_urls', [])
@@ -90,41 +148,36 @@ class XBot:
                 return
 
             logger.info("Ingesting data...")
-            self.db_utils.create_table(self.table_name)
-            self.db_utils.clear_table(self.table_name)
+            # Imported here so that processes which only serve queries never load the ingestion stack
+            from utils.ingestion import IncrementalIngestor
+            from utils.url_loader import ConcurrentURLLoader
 
             # Load and process data
-            loader = UnstructuredURLLoader(urls=urls)
-            documents = loader.load()
-            logger.debug(f"Loaded {len(documents)} documents from URLs.")
-
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-            docs = text_splitter.split_documents(documents)
-            logger.debug(f"Split documents into {len(docs)} chunks.")
-
-            data = [
-                {
-                    'id': idx,
-                    'text': doc.page_content,
-                    'source': doc.metadata.get('source', 'unknown')
-                }
-                for idx, doc in enumerate(docs)
-            ]
-
-            self.db_utils.add_data(data, embedding_fn=self.embedding_fn)
-            logger.info("Data ingestion completed.")
+            loader = ConcurrentURLLoader(urls, **loader_options)
+            ingestor = IncrementalIngestor(self.db_utils, self.embedding_fn, self.table_name, batch_size=batch_size)
+            ingestor.ingest(urls, loader.lazy_load(), full_refresh=full_refresh)
+            if loader.failures:
+                logger.warning(f"{len(loader.failures)} URLs failed to load: {loader.failures}")
+            self.db_utils.ensure_index(self.table_name)
+            logger.info(f"Data ingestion completed. Embedding cache stats: {self.embedding_cache.stats()}")
         except Exception as e:
             logger.error(f"Error during data ingestion: {e}")
 
-    def generate_prompt(self, user_query: str) -> str:
+    def generate_prompt(self, user_query: str, user_id: str = DEFAULT_USER) -> str:
         """
         Generate a prompt based on user query, conversation history, and character configuration.
 
         :param user_query: The user's query string.
+        :param user_id: Id of the user or conversation whose history is used.
         :return: The generated prompt string.
         """
         context = self.get_context_for_query(user_query)
-        conversation_history = self.memory.get_recent_interactions(top_k=5)
+        turns = self.memory.recall(user_query, k=self.recall_top_k, recent=self.history_turns, user_id=user_id)
+        conversation_history = '\n'.join(
+            f"Summary of earlier conversation: {turn['summary']}" if turn.get('kind') == 'summary'
+            else f"User: {turn['user_query']}\n{self.persona}: {turn['bot_response']}"
+            for turn in turns
+        )
         system_prompt = self.openai_llm.generate_system_prompt()
         full_prompt = f"{system_prompt}\n\n{conversation_history}\n\nUser's question: {user_query}\n{self.character.get('name', 'Alexandra')}'s answer:"
         return full_prompt
@@ -137,9 +190,10 @@ class XBot:
         :return: Concatenated relevant text snippets.
         """
         relevant_texts = self.db_utils.retrieve_relevant_info(
+            table_name=self.table_name,
             query_text=user_query,
             embedding_fn=self.embedding_fn,
-            top_k=3
+            top_k=self.retrieval_top_k
         )
 
         if not relevant_texts:
@@ -148,67 +202,362 @@ class XBot:
 
         return '\n'.join(relevant_texts)
 
-    def process_query(self, user_query: str, recipient_screen_name: Optional[str] = None) -> str:
+    def build_messages(self, user_query: str, relevant_texts: List[str], query_embedding: Optional[List[float]] = None,
+                       user_id: str = DEFAULT_USER) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for a query from the persona, retrieved context and conversation history.
+
+        The history is the few past interactions recalled as relevant to the query plus the
+        latest ones, and the parts are packed into the token budget from the character's
+        ``context_budget`` settings, so the prompt stays bounded however large the corpus or
+        history grows.
+
+        :param user_query: The user's query string.
+        :param relevant_texts: Text snippets retrieved for the query, in rank order.
+        :param query_embedding: Embedding of the query if already computed.
+        :param user_id: Id of the user or conversation whose history is used.
+        :return: List of chat messages.
+        """
+        compiled = self.openai_llm.prompt_cache.get()
+        return self.context_assembler.assemble(
+            system_prompt=compiled.text,
+            user_query=user_query,
+            chunks=relevant_texts,
+            turns=self.memory.recall(user_query, k=self.recall_top_k, recent=self.history_turns, query_embedding=query_embedding, user_id=user_id),
+            system_prompt_tokens=compiled.token_count
+        )
+
+    def process_queries(self, user_queries: List[str], recipient_screen_names: Optional[List[Optional[str]]] = None,
+                        use_cache: bool = True, user_ids: Optional[List[Optional[str]]] = None) -> List[str]:
+        """
+        Process a batch of user queries, embedding them and retrieving their context in batched calls.
+
+        :param user_queries: The users' query strings.
+        :param recipient_screen_names: Optional Twitter handle per query to send a DM to.
+        :param use_cache: Whether to answer from and populate the semantic response cache.
+        :param user_ids: Optional user or conversation id per query, keying its memory.
+        :return: The generated responses, in the order of ``user_queries``.
+        """
+        recipients = recipient_screen_names or [None] * len(user_queries)
+        user_ids = user_ids or [None] * len(user_queries)
+        query_embeddings = self.embedding_fn(user_queries) if user_queries else []
+        contexts = self.db_utils.retrieve_relevant_info_batch(
+            table_name=self.table_name,
+            query_texts=user_queries,
+            embedding_fn=self.embedding_fn,
+            top_k=self.retrieval_top_k,
+            query_embeddings=query_embeddings
+        )
+        return [
+            self.process_query(user_query, recipient, relevant_texts=relevant_texts, query_embedding=query_embedding, use_cache=use_cache,
+                               user_id=user_id)
+            for user_query, recipient, relevant_texts, query_embedding, user_id in zip(user_queries, recipients, contexts, query_embeddings, user_ids)
+        ]
+
+    def _prepare_query(self, user_query: str, relevant_texts: Optional[List[str]], query_embedding: Optional[List[float]],
+                       use_cache: bool, user_id: str = DEFAULT_USER) -> Tuple[Optional[str], Optional[List[Dict[str, str]]], Optional[List[float]]]:
+        """
+        Embed a query once, then answer it from the response cache or build its chat messages.
+
+        :return: The cached response (or None), the chat messages on a miss, and the query embedding.
+        """
+        use_cache = use_cache and self.response_cache is not None
+        if query_embedding is None and (use_cache or relevant_texts is None):
+            query_embedding = self.embedding_fn([user_query])[0]
+        if use_cache:
+            cached = self.response_cache.lookup(query_embedding)
+            if cached is not None:
+                logger.info("Answered query from the response cache.")
+                return cached, None, query_embedding
+        if relevant_texts is None:
+            relevant_texts = self.db_utils.retrieve_relevant_info(
+                table_name=self.table_name,
+                query_text=user_query,
+                embedding_fn=self.embedding_fn,
+                top_k=self.retrieval_top_k,
+                query_embedding=query_embedding
+            )
+        return None, self.build_messages(user_query, relevant_texts, query_embedding, user_id), query_embedding
+
+    @staticmethod
+    def conversation_id(user_id: Optional[str], recipient_id: Optional[int] = None, recipient_screen_name: Optional[str] = None) -> str:
+        """
+        Return the id keying a query's conversation memory.
+
+        :param user_id: Explicit user or conversation id.
+        :param recipient_id: Twitter user ID the response is sent to.
+        :param recipient_screen_name: Twitter handle the response is sent to.
+        :return: The first of these that is set, or the shared default id.
+        """
+        return str(user_id or recipient_id or recipient_screen_name or DEFAULT_USER)
+
+    def _record_interaction(self, user_query: str, response: str, user_id: str) -> None:
+        # The compactor thread starts with the first interaction, so a bot that never answers
+        # queries (such as the ingestion CLI) never runs it
+        if self.memory_compactor is not None:
+            self.memory_compactor.start()
+        self.memory.add_interaction(user_query, response, user_id)
+
+    def _cache_response(self, user_query: str, query_embedding: Optional[List[float]], response: str, use_cache: bool) -> None:
+        if use_cache and self.response_cache is not None and query_embedding is not None and not self.openai_llm.is_fallback_response(response):
+            self.response_cache.store(user_query, query_embedding, response)
+
+    def _should_stream(self, stream: Optional[bool], recipient_screen_name: Optional[str], recipient_id: Optional[int]) -> bool:
+        # Only tweet threads gain from streaming; a DM is sent in one piece
+        stream = self.stream_responses if stream is None else stream
+        return stream and not recipient_screen_name and not recipient_id
+
+    def _stream_thread(self, pieces: Iterable[str], in_reply_to_status_id: Optional[int],
+                       rate_limit_reserved: bool = False) -> Tuple[str, bool]:
+        """
+        Post a streamed response as a tweet thread, dispatching each tweet as soon as it is complete.
+
+        If the stream is interrupted, the text received so far is still posted.
+
+        :param pieces: Pieces of the response text as they are generated.
+        :param in_reply_to_status_id: Optional tweet the thread replies to.
+        :param rate_limit_reserved: Whether the caller already reserved the response rate-limit slot.
+        :return: The response, and whether it is complete (False if the stream was interrupted).
+        """
+        segmenter = self.tweet_segmenter()
+        received: List[str] = []
+        reply_to = in_reply_to_status_id
+        tweets_posted = 0
+
+        def post(tweets: List[str]) -> None:
+            nonlocal reply_to, tweets_posted
+            for tweet_part in tweets:
+                if tweets_posted == 0 and not rate_limit_reserved:
+                    self.rate_limiter.acquire('response')
+                reply_to = self.twitter.post_tweet(tweet_part, in_reply_to_status_id=reply_to) or reply_to
+                tweets_posted += 1
+                logger.info(f"Posted tweet: {tweet_part}")
+
+        complete = True
+        try:
+            for piece in pieces:
+                received.append(piece)
+                post(segmenter.feed(piece))
+        except StreamInterruptedError:
+            complete = False
+        post(segmenter.flush())
+        return ''.join(received).strip(), complete
+
+    async def _astream_thread(self, pieces: AsyncIterator[str], in_reply_to_status_id: Optional[int]) -> Tuple[str, bool]:
+        """
+        Post a streamed response as a tweet thread like _stream_thread, without blocking the event loop.
+
+        :param pieces: Pieces of the response text as they are generated.
+        :param in_reply_to_status_id: Optional tweet the thread replies to.
+        :return: The response, and whether it is complete (False if the stream was interrupted).
+        """
+        segmenter = self.tweet_segmenter()
+        received: List[str] = []
+        reply_to = in_reply_to_status_id
+        tweets_posted = 0
+
+        async def post(tweets: List[str]) -> None:
+            nonlocal reply_to, tweets_posted
+            for tweet_part in tweets:
+                if tweets_posted == 0:
+                    await self.rate_limiter.aacquire('response')
+                reply_to = await self.twitter.apost_tweet(tweet_part, in_reply_to_status_id=reply_to) or reply_to
+                tweets_posted += 1
+                logger.info(f"Posted tweet: {tweet_part}")
+
+        complete = True
+        try:
+            async for piece in pieces:
+                received.append(piece)
+                await post(segmenter.feed(piece))
+        except StreamInterruptedError:
+            complete = False
+        await post(segmenter.flush())
+        return ''.join(received).strip(), complete
+
+    def process_query(self, user_query: str, recipient_screen_name: Optional[str] = None,
+                      relevant_texts: Optional[List[str]] = None, recipient_id: Optional[int] = None,
+                      in_reply_to_status_id: Optional[int] = None, query_embedding: Optional[List[float]] = None,
+                      use_cache: bool = True, stream: Optional[bool] = None, user_id: Optional[str] = None,
+                      raise_errors: bool = False, rate_limit_reserved: bool = False) -> str:
         """
         Process a user query, generate a response, and post it as a tweet or send as a DM.
 
+        Unless ``rate_limit_reserved`` is set, the calling thread sleeps until the persona's
+        response rate limit allows the reply. Callers able to reschedule the work (such as the
+        worker service) reserve the slot with ``rate_limiter.reserve('response')`` instead and
+        call back once it is due.
+
         :param user_query: The user's query string.
         :param recipient_screen_name: Optional Twitter handle to send a DM.
+        :param relevant_texts: Context already retrieved for the query; retrieved here if omitted.
+        :param recipient_id: Optional Twitter user ID to send a DM, skipping the handle lookup.
+        :param in_reply_to_status_id: Optional tweet the response thread replies to.
+        :param query_embedding: Embedding of the query if already computed.
+        :param use_cache: Whether to answer from and populate the semantic response cache.
+        :param stream: Whether to stream a tweeted response, posting each tweet as soon as it is
+            complete; defaults to the ``stream`` LLM setting.
+        :param user_id: Id of the user or conversation, keying the memory the response draws on
+            and is recorded in; defaults to the DM recipient.
+        :param raise_errors: Whether to raise failures instead of answering with a fallback, so a caller
+            such as the worker service can retry: an error, a response that could not be generated, or
+            a reply of which nothing could be delivered. A streamed thread that was partly posted is not
+            retried.
+        :param rate_limit_reserved: Whether the caller already reserved the response rate-limit slot
+            and waited until it was due.
         :return: The generated response.
+        :raises Exception: With ``raise_errors``, if the query could not be answered.
         """
         try:
             logger.info(f"Processing query: {user_query}")
-            
-            # Generate system prompt and messages
-            system_prompt = self.openai_llm.generate_system_prompt()
-            conversation_history = self.memory.get_recent_interactions(top_k=5)
-            
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            if conversation_history:
-                messages.append({"role": "assistant", "content": conversation_history})
-            
-            messages.append({"role": "user", "content": user_query})
-            
-            response = self.openai_llm.generate_response(messages=messages)
-            
-            # Save interaction to memory
-            self.memory.add_interaction(user_query, response)
-            
-            # Rate limiting
-            current_time = time.time()
-            if self.tweet_interval > 0:
-                elapsed = current_time - self.last_tweet_time
-                if elapsed < self.tweet_interval:
-                    sleep_time = self.tweet_interval - elapsed
-                    logger.debug(f"Rate limit reached. Sleeping for {sleep_time:.2f} seconds.")
-                    time.sleep(sleep_time)
+            user_id = self.conversation_id(user_id, recipient_id, recipient_screen_name)
+
+            response, messages, query_embedding = self._prepare_query(user_query, relevant_texts, query_embedding, use_cache, user_id)
+            if response is None and self._should_stream(stream, recipient_screen_name, recipient_id):
+                response, complete = self._stream_thread(self.openai_llm.stream_response(messages), in_reply_to_status_id,
+                                                         rate_limit_reserved)
+                # A truncated response is neither served to later queries nor remembered as an answer
+                if complete:
+                    self._cache_response(user_query, query_embedding, response, use_cache)
+                    self._record_interaction(user_query, response, user_id)
+                return response
+            if response is None:
+                response = self.openai_llm.generate_response(messages=messages)
+                if raise_errors and self.openai_llm.is_fallback_response(response):
+                    raise RuntimeError("The language model did not generate a response")
+                self._cache_response(user_query, query_embedding, response, use_cache)
+
+            if not rate_limit_reserved:
+                # Blocks this thread only: callers on an event loop use aprocess_query
+                self.rate_limiter.acquire('response')
 
             # Decide whether to post a tweet or send a DM
-            if recipient_screen_name:
+            delivered = False
+            if recipient_screen_name and recipient_id is None:
                 recipient_id = self.twitter.get_user_id(recipient_screen_name)
-                if recipient_id:
-                    self.twitter.send_direct_message(recipient_id, response)
-                    logger.info(f"Sent DM to @{recipient_screen_name}: {response}")
-            else:
-                tweets = self.split_text_for_twitter(response)
-                for tweet_part in tweets:
-                    self.twitter.post_tweet(tweet_part)
+            if recipient_id:
+                delivered = self.twitter.send_direct_message(recipient_id, response)
+                if delivered:
+                    logger.info(f"Sent DM to {recipient_screen_name or recipient_id}: {response}")
+            elif not recipient_screen_name:
+                reply_to = in_reply_to_status_id
+                for tweet_part in self.split_text_for_twitter(response):
+                    posted_id = self.twitter.post_tweet(tweet_part, in_reply_to_status_id=reply_to)
+                    delivered = delivered or posted_id is not None
+                    reply_to = posted_id or reply_to
                     logger.info(f"Posted tweet: {tweet_part}")
+            if raise_errors and not delivered:
+                raise RuntimeError("The response could not be delivered")
 
-            self.last_tweet_time = time.time()
+            # Save interaction to memory
+            self._record_interaction(user_query, response, user_id)
             return response
         except Exception as e:
             logger.error(f"Error processing query: {e}")
+            if raise_errors:
+                raise
             return "I'm sorry, but I couldn't process your request at the moment."
 
-    def split_text_for_twitter(self, text: str, character_limit: int = 280) -> List[str]:
+    async def aprocess_query(self, user_query: str, recipient_screen_name: Optional[str] = None,
+                             relevant_texts: Optional[List[str]] = None, recipient_id: Optional[int] = None,
+                             in_reply_to_status_id: Optional[int] = None, query_embedding: Optional[List[float]] = None,
+                             use_cache: bool = True, stream: Optional[bool] = None, user_id: Optional[str] = None,
+                             raise_errors: bool = False) -> str:
         """
-        Split text into chunks suitable for tweeting.
+        Process a user query like process_query, but without blocking the event loop.
 
-        :param text: The text to split.
-        :param character_limit: Maximum number of characters per tweet.
-        :return: List of text chunks.
+        Embedding, vector search, the response cache and the memory write run in worker threads, while the OpenAI
+        completion, rate limiting and Twitter calls are awaited, so many in-flight queries can
+        overlap their network waits in one process.
+
+        :param user_query: The user's query string.
+        :param recipient_screen_name: Optional Twitter handle to send a DM.
+        :param relevant_texts: Context already retrieved for the query; retrieved here if omitted.
+        :param recipient_id: Optional Twitter user ID to send a DM, skipping the handle lookup.
+        :param in_reply_to_status_id: Optional tweet the response thread replies to.
+        :param query_embedding: Embedding of the query if already computed.
+        :param use_cache: Whether to answer from and populate the semantic response cache.
+        :param stream: Whether to stream a tweeted response, posting each tweet as soon as it is
+            complete; defaults to the ``stream`` LLM setting.
+        :param user_id: Id of the user or conversation, keying the memory the response draws on
+            and is recorded in; defaults to the DM recipient.
+        :param raise_errors: Whether to raise failures instead of answering with a fallback, so a caller
+            such as the worker service can retry: an error, a response that could not be generated, or
+            a reply of which nothing could be delivered. A streamed thread that was partly posted is not
+            retried.
+        :return: The generated response.
+        :raises Exception: With ``raise_errors``, if the query could not be answered.
+        """
+        try:
+            logger.info(f"Processing query: {user_query}")
+            user_id = self.conversation_id(user_id, recipient_id, recipient_screen_name)
+            if query_embedding is None and isinstance(self.embedding_fn, EmbeddingBatcher):
+                # Awaited rather than embedded in the worker thread, so the thread is not held while the batch fills
+                query_embedding = (await self.embedding_fn.aembed([user_query]))[0]
+
+            response, messages, query_embedding = await asyncio.to_thread(
+                self._prepare_query, user_query, relevant_texts, query_embedding, use_cache, user_id
+            )
+            if response is None and self._should_stream(stream, recipient_screen_name, recipient_id):
+                response, complete = await self._astream_thread(self.openai_llm.astream_response(messages), in_reply_to_status_id)
+                if complete:
+                    await asyncio.to_thread(self._cache_response, user_query, query_embedding, response, use_cache)
+                    await asyncio.to_thread(self._record_interaction, user_query, response, user_id)
+                return response
+            if response is None:
+                response = await self.openai_llm.agenerate_response(messages=messages)
+                if raise_errors and self.openai_llm.is_fallback_response(response):
+                    raise RuntimeError("The language model did not generate a response")
+                await asyncio.to_thread(self._cache_response, user_query, query_embedding, response, use_cache)
+
+            await self.rate_limiter.aacquire('response')
+
+            delivered = False
+            if recipient_screen_name and recipient_id is None:
+                recipient_id = await self.twitter.aget_user_id(recipient_screen_name)
+            if recipient_id:
+                delivered = await self.twitter.asend_direct_message(recipient_id, response)
+                if delivered:
+                    logger.info(f"Sent DM to {recipient_screen_name or recipient_id}: {response}")
+            elif not recipient_screen_name:
+                reply_to = in_reply_to_status_id
+                for tweet_part in self.split_text_for_twitter(response):
+                    posted_id = await self.twitter.apost_tweet(tweet_part, in_reply_to_status_id=reply_to)
+                    delivered = delivered or posted_id is not None
+                    reply_to = posted_id or reply_to
+                    logger.info(f"Posted tweet: {tweet_part}")
+            if raise_errors and not delivered:
+                raise RuntimeError("The response could not be delivered")
+
+            await asyncio.to_thread(self._record_interaction, user_query, response, user_id)
+            return response
+        except Exception as e:
+            logger.error(f"Error processing query: {e}")
+            if raise_errors:
+                raise
+            return "I'm sorry, but I couldn't process your request at the moment."
+
+    def close(self) -> None:
+        """
+        Flush buffered state (such as pending memory writes) and close pooled connections before shutdown.
+        """
+        if self.memory_compactor is not None:
+            self.memory_compactor.stop()
+            logger.info(f"Memory compaction stats: {self.memory_compactor.stats()}")
+            self.memory_compactor = None
+        self.memory.close()
+        self.rate_limiter.close()
+        if self._owns_host:
+            self.host.close()
+        if self.response_cache is not None:
+            logger.info(f"Response cache stats: {self.response_cache.stats()}")
+
+    def tweet_segmenter(self, character_limit: int = 280) -> TweetSegmenter:
+        """
+        Create a tweet segmenter applying the character's response format.
+
+        :param character_limit: Maximum weighted length of a tweet.
+        :return: A segmenter adding the configured emoji prefix, hashtags, mentions and thread numbering.
         """
         response_format = self.character.get('response_format', {})
         use_emojis = response_format.get('use_emojis', False)
@@ -217,8 +566,12 @@ class XBot:
 
         hashtags = ''
         if include_hashtags:
-            preferred_topics = self.character.get('preferred_topics', [])
-            hashtags = ' '.join([f"#{topic.replace(' ', '')}" for topic in preferred_topics])
+            # Keep the leading hashtags that fit in a quarter of the tweet, leaving room for the text
+            for topic in self.character.get('preferred_topics', []):
+                candidate = f"{hashtags} #{topic.replace(' ', '')}".strip()
+                if weighted_length(candidate) > character_limit // 4:
+                    break
+                hashtags = candidate
 
         mentions = ''
         if include_mentions:
@@ -228,28 +581,20 @@ class XBot:
         if use_emojis:
             prefix = '😊 '
 
-        words = text.split()
-        chunks = []
-        chunk = prefix
-
-        for word in words:
-            # Check if adding the next word exceeds the character limit
-            potential_length = len(chunk) + len(word) + 1 + len(hashtags) + len(mentions)
-            if potential_length <= character_limit:
-                chunk += (' ' if len(chunk.strip()) > 0 else '') + word
-            else:
-                if hashtags and len(chunk) + len(hashtags) + len(mentions) + 1 <= character_limit:
-                    chunk += f" {hashtags}"
-                if mentions and len(chunk) + len(mentions) + 1 <= character_limit:
-                    chunk += f" {mentions}"
-                chunks.append(chunk)
-                chunk = prefix + word
-
-        if chunk:
-            if hashtags and len(chunk) + len(hashtags) + len(mentions) + 1 <= character_limit:
-                chunk += f" {hashtags}"
-            if mentions and len(chunk) + len(mentions) + 1 <= character_limit:
-                chunk += f" {mentions}"
-            chunks.append(chunk)
-
-        return chunks
+        suffix = ' '.join(part for part in (hashtags, mentions) if part)
+        return TweetSegmenter(
+            character_limit=character_limit,
+            prefix=prefix,
+            suffix=suffix,
+            numbering=self.interaction_policies.get('thread_numbering', False)
+        )
+
+    def split_text_for_twitter(self, text: str, character_limit: int = 280) -> List[str]:
+        """
+        Split text into chunks suitable for tweeting, preferring sentence boundaries.
+
+        :param text: The text to split.
+        :param character_limit: Maximum weighted length of a tweet, as Twitter counts it.
+        :return: List of text chunks.
+        """
+        return self.tweet_segmenter(character_limit).split(text)
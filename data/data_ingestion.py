@@ -2,21 +2,29 @@
 
 import logging
 import argparse
+from typing import Any
 from utils.logger_config import setup_logging
 from bots.xbot import XBot
 
-def ingest_data(config_path: str, table_name: str) -> None:
+def ingest_data(config_path: str, table_name: str, full_refresh: bool = False, batch_size: int = 256, **loader_options: Any) -> None:
     """
     Ingest data into the database using the XBot class.
 
     :param config_path: Path to the character configuration JSON file.
     :param table_name: Name of the database table to use.
+    :param full_refresh: Re-index every source even if its content is unchanged.
+    :param batch_size: Number of chunks embedded and inserted per batch.
+    :param loader_options: Concurrency options for the URL loader.
     """
+    bot = None
     try:
         bot = XBot(config_path=config_path, table_name=table_name)
-        bot.ingest_data()
+        bot.ingest_data(full_refresh=full_refresh, batch_size=batch_size, **loader_options)
     except Exception as e:
         logging.error(f"Error during data ingestion: {e}")
+    finally:
+        if bot is not None:
+            bot.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ingest data for XBot.")
@@ -32,6 +40,57 @@ if __name__ == "__main__":
         default='xbot_data',
         help='Name of the database table to use.'
     )
+    parser.add_argument(
+        '--full_refresh',
+        action='store_true',
+        help='Re-split and re-index every source, even those whose content is unchanged.'
+    )
+    parser.add_argument(
+        '--fetch_workers',
+        type=int,
+        default=8,
+        help='Number of threads fetching URLs concurrently.'
+    )
+    parser.add_argument(
+        '--parse_workers',
+        type=int,
+        default=None,
+        help='Number of processes parsing documents (0 parses in the fetch threads). Defaults to the CPU count.'
+    )
+    parser.add_argument(
+        '--per_host_limit',
+        type=int,
+        default=4,
+        help='Maximum number of concurrent requests to a single host.'
+    )
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=30.0,
+        help='Per-request timeout in seconds.'
+    )
+    parser.add_argument(
+        '--max_in_flight',
+        type=int,
+        default=None,
+        help='Maximum number of URLs fetched or parsed at once. Defaults to twice --fetch_workers.'
+    )
+    parser.add_argument(
+        '--batch_size',
+        type=int,
+        default=256,
+        help='Number of chunks embedded and inserted per batch.'
+    )
     args = parser.parse_args()
     setup_logging()
-    ingest_data(config_path=args.config_path, table_name=args.table_name)
+    ingest_data(
+        config_path=args.config_path,
+        table_name=args.table_name,
+        full_refresh=args.full_refresh,
+        batch_size=args.batch_size,
+        fetch_workers=args.fetch_workers,
+        parse_workers=args.parse_workers,
+        per_host_limit=args.per_host_limit,
+        timeout=args.timeout,
+        max_in_flight=args.max_in_flight
+    )
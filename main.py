@@ -29,6 +29,7 @@ def main():
     user_query = "What are the main applications of artificial intelligence?"
     response = bot.process_query(user_query)
     print(f"Response: {response}")
+    bot.close()
 
 if __name__ == "__main__":
     main()
@@ -31,10 +31,11 @@ class XBot:
             for idx, doc in enumerate(docs)
         ]
         
-        self.db_utils.add_data(data, embedding_fn=self.embedding_fn)
+        self.db_utils.add_data('my_table', data, embedding_fn=self.embedding_fn)
         
     def process_query(self, user_query, recipient_screen_name):
         relevant_texts = self.db_utils.retrieve_relevant_info(
+            table_name='my_table',
             query_text=user_query,
             embedding_fn=self.embedding_fn,
             top_k=3
@@ -1,7 +1,44 @@
 # tests/__init__.py
 
+from .test_context_assembler import TestContextAssembler
+from .test_embedding_backends import TestONNXBackend
+from .test_embedding_batcher import TestEmbeddingBatcher
+from .test_embedding_cache import TestEmbeddingCache
+from .test_host import TestBotHost
+from .test_http_transport import TestHTTPTransport
+from .test_ingestion import TestIncrementalIngestor
+from .test_lance_db_utils import TestLanceDBUtils
+from .test_memory import TestMemory
+from .test_query_paths import TestQueryPaths
+from .test_rate_limiter import TestRateLimiter, TestRetryPolicy
+from .test_response_cache import TestSemanticResponseCache
+from .test_startup import TestLazyStartup
+from .test_system_prompt import TestSystemPromptCache
+from .test_tweet_splitter import TestTweetSegmenter
+from .test_twitter_utils import TestTwitterAPI
+from .test_url_loader import TestConcurrentURLLoader
+from .test_worker import TestMentionWorker
 from .test_xbot import TestXBot
 
 __all__ = [
+    "TestBotHost",
+    "TestConcurrentURLLoader",
+    "TestContextAssembler",
+    "TestEmbeddingBatcher",
+    "TestEmbeddingCache",
+    "TestHTTPTransport",
+    "TestIncrementalIngestor",
+    "TestLanceDBUtils",
+    "TestLazyStartup",
+    "TestMemory",
+    "TestMentionWorker",
+    "TestONNXBackend",
+    "TestQueryPaths",
+    "TestRateLimiter",
+    "TestRetryPolicy",
+    "TestSemanticResponseCache",
+    "TestSystemPromptCache",
+    "TestTweetSegmenter",
+    "TestTwitterAPI",
     "TestXBot"
 ]
@@ -0,0 +1,68 @@
+# tests/test_context_assembler.py
+
+import unittest
+from utils.context_assembler import ContextAssembler
+
+SYSTEM_PROMPT = "You are Alexandra, a futurist who explains technology plainly."
+QUERY = "How do quantum computers differ from classical ones?"
+
+def chunk(index: int, words: int = 40) -> str:
+    return ' '.join(f"fact{index}-{word}" for word in range(words))
+
+def turn(index: int, words: int = 20) -> dict:
+    return {'user_query': f"Question {index}: " + ' '.join(['why'] * words),
+            'bot_response': f"Answer {index}: " + ' '.join(['because'] * words)}
+
+class TestContextAssembler(unittest.TestCase):
+    def setUp(self):
+        self.assembler = ContextAssembler(max_prompt_tokens=512, context_share=0.6, min_chunk_tokens=16)
+
+    def test_prompt_never_exceeds_the_budget(self):
+        for chunks, turns in (([chunk(index) for index in range(50)], []),
+                              ([], [turn(index) for index in range(50)]),
+                              ([chunk(index) for index in range(50)], [turn(index) for index in range(50)])):
+            messages = self.assembler.assemble(SYSTEM_PROMPT, QUERY, chunks, turns)
+            self.assertLessEqual(self.assembler.count_messages(messages), self.assembler.max_prompt_tokens)
+
+    def test_system_prompt_and_query_are_always_kept(self):
+        messages = self.assembler.assemble(SYSTEM_PROMPT, QUERY, [chunk(index) for index in range(50)], [turn(index) for index in range(50)])
+        self.assertEqual(messages[0], {"role": "system", "content": SYSTEM_PROMPT})
+        self.assertEqual(messages[-1], {"role": "user", "content": QUERY})
+
+        # A query too long for the budget is truncated rather than dropped
+        long_query = ' '.join(['qubit'] * 2000)
+        messages = self.assembler.assemble(SYSTEM_PROMPT, long_query, [chunk(0)])
+        self.assertEqual(messages[0]['content'], SYSTEM_PROMPT)
+        self.assertEqual(messages[-1]['role'], 'user')
+        self.assertTrue(long_query.startswith(messages[-1]['content']))
+        self.assertLessEqual(self.assembler.count_messages(messages), self.assembler.max_prompt_tokens)
+
+    def test_lower_priority_sections_are_dropped_first(self):
+        chunks = [chunk(index) for index in range(50)]
+        turns = [turn(index) for index in range(50)]
+        messages = self.assembler.assemble(SYSTEM_PROMPT, QUERY, chunks, turns)
+
+        context = messages[1]['content']
+        self.assertTrue(context.startswith("Relevant information:\n"))
+        kept_chunks = context.split('\n')[1:]
+        # Chunks are kept in rank order; only the lowest-ranked ones are left out (the last one kept may be truncated)
+        self.assertLess(len(kept_chunks), len(chunks))
+        self.assertEqual(kept_chunks[:-1], chunks[:len(kept_chunks) - 1])
+        self.assertTrue(chunks[len(kept_chunks) - 1].startswith(kept_chunks[-1]))
+
+        # History keeps the newest turns, in order, and drops the oldest
+        history = [message['content'] for message in messages[2:-1]]
+        self.assertGreater(len(history), 0)
+        self.assertLess(len(history), 2 * len(turns))
+        kept_turns = turns[-(len(history) // 2):]
+        self.assertEqual(history, [text for item in kept_turns for text in (item['user_query'], item['bot_response'])])
+
+    def test_duplicate_chunks_are_removed(self):
+        chunks = [chunk(0, 5), '  ' + chunk(0, 5).upper() + '\n', chunk(0, 3), chunk(1, 5), '', chunk(1, 5)]
+        self.assertEqual(self.assembler.dedupe(chunks), [chunk(0, 5), chunk(1, 5)])
+
+        messages = self.assembler.assemble(SYSTEM_PROMPT, QUERY, chunks)
+        self.assertEqual(messages[1]['content'], "Relevant information:\n" + '\n'.join([chunk(0, 5), chunk(1, 5)]))
+
+if __name__ == '__main__':
+    unittest.main()
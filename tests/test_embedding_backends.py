@@ -0,0 +1,99 @@
+# tests/test_embedding_backends.py
+
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from utils.embedding_backends import ONNXBackend, pool
+from utils.embedding_cache import EmbeddingCache
+from utils.lance_db_utils import LocalEmbeddings, embedding_matrix, rows_to_arrow
+
+VOCABULARY = ['[PAD]', '[UNK]', 'the', 'bot', 'posts', 'a', 'thread', 'about', 'quantum', 'computing']
+DIMENSION = 16
+
+def write_exported_model(model_dir: str) -> None:
+    """
+    Write what ONNXBackend exports for a model: a tiny encoder (embedding lookup and a
+    projection), its tokenizer and its pooling settings.
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    os.makedirs(model_dir)
+    generator = np.random.default_rng(7)
+    embedding = numpy_helper.from_array(generator.normal(size=(len(VOCABULARY), DIMENSION)).astype(np.float32), 'embedding')
+    projection = numpy_helper.from_array(generator.normal(size=(DIMENSION, DIMENSION)).astype(np.float32), 'projection')
+    graph = helper.make_graph(
+        [helper.make_node('Gather', ['embedding', 'input_ids'], ['tokens']),
+         helper.make_node('MatMul', ['tokens', 'projection'], ['last_hidden_state'])],
+        'encoder',
+        [helper.make_tensor_value_info('input_ids', TensorProto.INT64, ['batch', 'sequence'])],
+        [helper.make_tensor_value_info('last_hidden_state', TensorProto.FLOAT, ['batch', 'sequence', DIMENSION])],
+        initializer=[embedding, projection]
+    )
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid('', 14)], ir_version=8), os.path.join(model_dir, 'model.onnx'))
+
+    tokenizer = Tokenizer(models.WordLevel({token: index for index, token in enumerate(VOCABULARY)}, unk_token='[UNK]'))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(os.path.join(model_dir, 'tokenizer.json'))
+    with open(os.path.join(model_dir, 'settings.json'), 'w') as file:
+        json.dump({'model_name': 'tiny', 'max_seq_length': 8, 'pad_token': '[PAD]', 'pooling': 'mean', 'normalize': True}, file)
+
+@unittest.skipUnless(all(importlib.util.find_spec(name) for name in ('onnx', 'onnxruntime', 'tokenizers')),
+                     'onnx, onnxruntime and tokenizers are required')
+class TestONNXBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        write_exported_model(os.path.join(self.tmp_dir, 'tiny'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_padding_does_not_change_an_embedding(self):
+        backend = ONNXBackend('tiny', cache_dir=self.tmp_dir, quantize=False, num_threads=1)
+        texts = ['the bot posts a thread about quantum computing', 'quantum', 'the bot']
+        batched = backend.encode(texts)
+        alone = np.vstack([backend.encode([text]) for text in texts])
+
+        self.assertEqual(batched.shape, (3, DIMENSION))
+        np.testing.assert_allclose(batched, alone, atol=1e-5)
+        np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, atol=1e-5)
+        self.assertEqual(backend.encode([]).shape[0], 0)
+
+    def test_quantized_model_is_written_on_first_use_and_agrees(self):
+        texts = ['the bot posts a thread', 'quantum computing', 'a thread about the bot']
+        reference = ONNXBackend('tiny', cache_dir=self.tmp_dir, quantize=False).encode(texts)
+        quantized = ONNXBackend('tiny', cache_dir=self.tmp_dir, quantize=True)
+        # The model is already exported, so first use only quantizes it
+        with mock.patch.object(ONNXBackend, '_export', side_effect=AssertionError('re-exported')):
+            vectors = quantized.encode(texts)
+
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, 'tiny', 'model.int8.onnx')))
+        self.assertGreater(float((reference * vectors).sum(axis=1).min()), 0.98)
+
+    def test_local_embeddings_keeps_backends_apart_in_the_cache(self):
+        cache = EmbeddingCache(max_entries=100)
+        embeddings = LocalEmbeddings('tiny', cache=cache, backend='onnx', onnx_cache_dir=self.tmp_dir, quantize=False)
+        vectors = embeddings(['quantum computing', 'the bot', 'quantum computing'])
+
+        self.assertEqual((vectors.dtype, vectors.shape), (np.float32, (3, DIMENSION)))
+        np.testing.assert_array_equal(vectors[0], vectors[2])
+        # Rows are written and read back through Arrow without copying the vectors
+        batch = rows_to_arrow([{'id': str(index)} for index in range(3)], vectors)
+        self.assertTrue(np.shares_memory(embedding_matrix(batch), vectors))
+        self.assertEqual(len(cache.get_many('tiny#onnx', [EmbeddingCache.hash_text('the bot')])), 1)
+        self.assertEqual(cache.get_many('tiny', [EmbeddingCache.hash_text('the bot')]), {})
+
+    def test_mean_pooling_ignores_padding(self):
+        hidden = np.array([[[1.0, 0.0], [3.0, 4.0], [100.0, 100.0]]], dtype=np.float32)
+        mask = np.array([[1, 1, 0]])
+        np.testing.assert_allclose(pool(hidden, mask, normalize=False), [[2.0, 2.0]])
+        np.testing.assert_allclose(pool(hidden, mask, mode='cls'), [[1.0, 0.0]])
+
+if __name__ == '__main__':
+    unittest.main()
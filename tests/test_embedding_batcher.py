@@ -0,0 +1,80 @@
+# tests/test_embedding_batcher.py
+
+import asyncio
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import numpy as np
+from utils.embedding_batcher import EmbeddingBatcher
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls: List[int] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        if 'boom' in texts:
+            raise RuntimeError('model failed')
+        with self._lock:
+            self.calls.append(len(texts))
+        return np.array([[len(text), index] for index, text in enumerate(texts)], dtype=np.float32)
+
+class TestEmbeddingBatcher(unittest.TestCase):
+    def setUp(self):
+        self.embeddings = CountingEmbeddings()
+        self.batcher = EmbeddingBatcher(self.embeddings, max_batch_size=8, max_wait_ms=50)
+
+    def tearDown(self):
+        self.batcher.close()
+
+    def test_concurrent_threads_share_batches(self):
+        texts = [f"query {'x' * index}" for index in range(16)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            vectors = list(pool.map(lambda text: self.batcher([text]), texts))
+
+        self.assertEqual([vector[0][0] for vector in vectors], [len(text) for text in texts])
+        self.assertEqual(sum(self.embeddings.calls), 16)
+        self.assertLess(len(self.embeddings.calls), 16)
+        stats = self.batcher.stats()
+        self.assertEqual((stats['requests'], stats['batches']), (16, len(self.embeddings.calls)))
+        self.assertEqual(sum(stats['batch_size']['buckets'].values()), stats['batches'])
+
+    def test_coroutines_share_a_batch_and_errors_reach_every_caller(self):
+        async def embed_all():
+            return await asyncio.gather(self.batcher.aembed(['a']), self.batcher.aembed(['bb', 'ccc']), self.batcher.aembed(['dddd']))
+
+        vectors = asyncio.run(embed_all())
+        self.assertEqual([vector[:, 0].tolist() for vector in vectors], [[1], [2, 3], [4]])
+        self.assertEqual(self.embeddings.calls, [4])
+
+        futures = [self.batcher.submit(['fine']), self.batcher.submit(['boom'])]
+        for future in futures:
+            self.assertRaises(RuntimeError, future.result, 5)
+
+    def test_large_requests_skip_the_queue(self):
+        self.batcher([f'chunk {index}' for index in range(8)])
+        self.assertEqual(self.embeddings.calls, [8])
+        self.assertIsNone(self.batcher._thread)
+        self.assertEqual(self.batcher.stats()['batches'], 0)
+
+    def test_request_racing_close_is_resolved(self):
+        put = self.batcher._queue.put
+        closer = threading.Thread(target=self.batcher.close)
+
+        def put_while_closing(item, *args, **kwargs):
+            # Let close() run between a request's closed check and its enqueue
+            if item is not None and not closer.is_alive():
+                closer.start()
+                closer.join(0.2)
+            put(item, *args, **kwargs)
+
+        with mock.patch.object(self.batcher._queue, 'put', side_effect=put_while_closing):
+            future = self.batcher.submit(['late'])
+            closer.join(5)
+        self.assertEqual(future.result(5)[0][0], 4)
+        self.assertEqual(self.batcher.submit(['after']).result(5)[0][0], 5)
+
+if __name__ == '__main__':
+    unittest.main()
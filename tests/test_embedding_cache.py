@@ -0,0 +1,61 @@
+# tests/test_embedding_cache.py
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from utils.embedding_cache import EmbeddingCache
+
+MODEL = 'all-MiniLM-L6-v2'
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = EmbeddingCache(max_entries=2, db_path=os.path.join(self.tmp_dir, 'embedding_cache.sqlite'))
+        self.hashes = [EmbeddingCache.hash_text(text) for text in ('qubits', 'entanglement', 'superposition')]
+        self.batch = np.arange(9, dtype=np.float32).reshape(3, 3)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_memory_hit_does_not_keep_the_batch_alive(self):
+        self.cache.put_many(MODEL, {self.hashes[0]: self.batch[0]})
+        found = self.cache.get_many(MODEL, [self.hashes[0]])
+
+        np.testing.assert_array_equal(found[self.hashes[0]], self.batch[0])
+        self.assertIsNone(found[self.hashes[0]].base)
+        self.assertEqual((self.cache.memory_hits, self.cache.disk_hits, self.cache.misses), (1, 0, 0))
+
+    def test_disk_hit_after_lru_eviction(self):
+        self.cache.put_many(MODEL, dict(zip(self.hashes, self.batch)))
+        self.assertEqual(self.cache.stats()['size'], 2)
+
+        found = self.cache.get_many(MODEL, [self.hashes[0]])
+        np.testing.assert_array_equal(found[self.hashes[0]], self.batch[0])
+        self.assertEqual((self.cache.memory_hits, self.cache.disk_hits), (0, 1))
+        # The disk hit is promoted back into memory
+        self.cache.get_many(MODEL, [self.hashes[0]])
+        self.assertEqual(self.cache.memory_hits, 1)
+
+    def test_keys_are_separated_by_model(self):
+        self.cache.put_many(MODEL, {self.hashes[0]: self.batch[0]})
+        self.cache.put_many('other-model', {self.hashes[0]: self.batch[1]})
+
+        np.testing.assert_array_equal(self.cache.get_many(MODEL, [self.hashes[0]])[self.hashes[0]], self.batch[0])
+        np.testing.assert_array_equal(self.cache.get_many('other-model', [self.hashes[0]])[self.hashes[0]], self.batch[1])
+        self.assertEqual(self.cache.get_many('missing-model', [self.hashes[0]]), {})
+
+    def test_lru_evicts_the_least_recently_used_at_max_entries(self):
+        cache = EmbeddingCache(max_entries=2)
+        cache.put_many(MODEL, dict(zip(self.hashes[:2], self.batch)))
+        cache.get_many(MODEL, [self.hashes[0]])
+        cache.put_many(MODEL, {self.hashes[2]: self.batch[2]})
+
+        self.assertEqual(set(cache.get_many(MODEL, self.hashes)), {self.hashes[0], self.hashes[2]})
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
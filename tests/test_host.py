@@ -0,0 +1,90 @@
+# tests/test_host.py
+
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+from bots.host import BotHost
+from utils.config import Config
+
+class TestBotHost(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        environment = {
+            'DB_PATH': os.path.join(self.tmp_dir, 'lancedb'),
+            'EMBEDDING_CACHE_PATH': os.path.join(self.tmp_dir, 'embedding_cache.sqlite'),
+            'RATE_LIMIT_STATE_PATH': os.path.join(self.tmp_dir, 'rate_limits.sqlite'),
+        }
+        for patcher in (mock.patch.dict(os.environ, environment), mock.patch.object(Config, '_instance', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with open('config/xbot_character.json', 'r') as file:
+            self.character = json.load(file)
+        self.host = BotHost()
+
+    def tearDown(self):
+        self.host.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def character_file(self, name: str, rate_limit: int = 60) -> str:
+        character = dict(self.character, name=name)
+        character['interaction_policies'] = dict(character.get('interaction_policies', {}), rate_limit_per_minute=rate_limit)
+        path = os.path.join(self.tmp_dir, f"{name}.json")
+        with open(path, 'w') as file:
+            json.dump(character, file)
+        return path
+
+    def test_personas_share_components_and_keep_their_own_state(self):
+        alexandra = self.host.add_persona(self.character_file('Alexandra'))
+        zed = self.host.add_persona(self.character_file('Zed Prime'))
+
+        self.assertIsNot(alexandra, zed)
+        self.assertEqual(self.host.personas(), ['Alexandra', 'Zed Prime'])
+        for shared in ('db_utils', 'embedding_fn', 'embedding_cache', 'transport'):
+            self.assertIs(getattr(alexandra, shared), getattr(zed, shared))
+        self.assertIs(alexandra.twitter.rate_limiter, zed.twitter.rate_limiter)
+
+        self.assertEqual((alexandra.table_name, alexandra.memory.table_name), ('alexandra_data', 'alexandra_memory'))
+        self.assertEqual((zed.table_name, zed.memory.table_name), ('zed_prime_data', 'zed_prime_memory'))
+        self.assertIn('Zed Prime', zed.openai_llm.generate_system_prompt())
+        self.assertNotIn('Zed Prime', alexandra.openai_llm.generate_system_prompt())
+        self.assertEqual(zed.response_cache.persona, 'Zed Prime')
+
+    def test_response_limits_are_per_persona(self):
+        busy = self.host.add_persona(self.character_file('Busy', rate_limit=2))
+        idle = self.host.add_persona(self.character_file('Idle', rate_limit=2))
+        for _ in range(2):
+            self.assertEqual(busy.rate_limiter.reserve('response'), 0.0)
+        self.assertGreater(busy.rate_limiter.reserve('response'), 0.0)
+        self.assertEqual(idle.rate_limiter.reserve('response'), 0.0)
+
+    def test_duplicate_persona_is_rejected(self):
+        path = self.character_file('Alexandra')
+        self.host.add_persona(path)
+        with self.assertRaises(ValueError):
+            self.host.add_persona(path)
+
+        self.host.add_persona(self.character_file('Ada L'))
+        # A different name that maps to the same tables would share the first persona's memory
+        with self.assertRaises(ValueError):
+            self.host.add_persona(self.character_file('Ada-L'))
+        self.assertEqual(sorted(self.host.personas()), ['Ada L', 'Alexandra'])
+
+    def test_extra_personas_cost_little_memory(self):
+        paths = [self.character_file(f"Persona {index}") for index in range(11)]
+        self.host.add_persona(paths[0])
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for path in paths[1:]:
+                self.host.add_persona(path)
+            per_persona = (tracemalloc.get_traced_memory()[0] - before) / (len(paths) - 1)
+        finally:
+            tracemalloc.stop()
+        self.assertLess(per_persona, 256 * 1024)
+
+if __name__ == '__main__':
+    unittest.main()
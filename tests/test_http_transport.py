@@ -0,0 +1,135 @@
+# tests/test_http_transport.py
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+from utils.http_transport import HTTPTransport
+from utils.openai_utils import OpenAILLM
+
+def completion(content: str) -> dict:
+    return {
+        'id': 'chatcmpl-test',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': 'gpt-4',
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+    }
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections alive between requests
+    lock = threading.Lock()
+    connections = 0
+    authorizations = []
+
+    def setup(self):
+        super().setup()
+        with _StandInHandler.lock:
+            _StandInHandler.connections += 1
+
+    def _respond(self, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond({'path': self.path})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with _StandInHandler.lock:
+            _StandInHandler.authorizations.append(self.headers.get('Authorization'))
+        if self.path.startswith('/slow'):
+            time.sleep(1.0)
+        self._respond(completion('Hello from the stand-in.'))
+
+    def log_message(self, format, *args):
+        pass
+
+class TestHTTPTransport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _StandInHandler.connections = 0
+        _StandInHandler.authorizations = []
+        self.transport = HTTPTransport(pool_maxsize=4, read_timeout=5.0)
+        config = SimpleNamespace(openai_api_key='test-key', openai_api_base='')
+        patcher = mock.patch('utils.openai_utils.Config', return_value=config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.transport.close()
+
+    def llm(self, api_base: str) -> OpenAILLM:
+        return OpenAILLM(llm_settings={'model': 'gpt-4'}, character_profile={'name': 'Alexandra'},
+                         transport=self.transport, api_base=api_base)
+
+    def test_session_survives_client_close(self):
+        session = self.transport.session
+        for index in range(5):
+            response = session.get(f"{self.base_url}/item/{index}", timeout=self.transport.timeout)
+            self.assertEqual(response.json(), {'path': f"/item/{index}"})
+            session.close()  # tweepy closes its session after every request
+        self.assertIs(self.transport.session, session)
+        self.assertEqual(_StandInHandler.connections, 1)
+
+    def test_openai_requests_reuse_connection(self):
+        llm = self.llm(f"{self.base_url}/v1")
+        replies = [llm.generate_response("Hi") for _ in range(3)]
+        self.assertEqual(replies, ['Hello from the stand-in.'] * 3)
+        self.assertEqual(_StandInHandler.authorizations, ['Bearer test-key'] * 3)
+        self.assertEqual(_StandInHandler.connections, 1)
+
+    def test_async_openai_requests_reuse_connection(self):
+        llm = self.llm(f"{self.base_url}/v1")
+
+        async def run():
+            replies = [await llm.agenerate_response("Hi") for _ in range(3)]
+            await self.transport.aclose()
+            return replies
+
+        self.assertEqual(asyncio.run(run()), ['Hello from the stand-in.'] * 3)
+        self.assertEqual(_StandInHandler.connections, 1)
+
+    def test_each_event_loop_gets_its_own_session_and_none_is_leaked(self):
+        first = asyncio.run(self.transport.aiohttp_session())
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        second = loop.run_until_complete(self.transport.aiohttp_session())
+        self.assertIsNot(first, second)
+        self.assertIs(loop.run_until_complete(self.transport.aiohttp_session()), second)
+        # The session of the loop asyncio.run closed is closed once another loop asks for one
+        self.assertTrue(first.closed)
+
+        self.assertFalse(second.closed)
+        self.transport.close()
+        self.assertTrue(second.closed)
+
+    def test_read_timeout_returns_fallback(self):
+        self.transport.read_timeout = 0.2
+        llm = self.llm(f"{self.base_url}/slow/v1")
+        started = time.monotonic()
+        self.assertTrue(llm.is_fallback_response(llm.generate_response("Hi")))
+        self.assertLess(time.monotonic() - started, 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
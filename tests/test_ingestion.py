@@ -0,0 +1,143 @@
+# tests/test_ingestion.py
+
+import shutil
+import tempfile
+import unittest
+from typing import List
+import numpy as np
+from utils.ingestion import IncrementalIngestor, content_hash
+from utils.lance_db_utils import LanceDBUtils
+
+SOURCE_A = 'https://example.com/a'
+SOURCE_B = 'https://example.com/b'
+
+def document(source: str, text: str):
+    from langchain.docstore.document import Document
+    return Document(page_content=text, metadata={'source': source})
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.texts: List[str] = []
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        self.texts.extend(texts)
+        return np.array([[len(text), text.count(' '), 1.0] for text in texts], dtype=np.float32)
+
+class TestIncrementalIngestor(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_utils = LanceDBUtils(db_path=self.tmp_dir)
+        self.embeddings = CountingEmbeddings()
+        # Each paragraph of the test documents is one chunk
+        self.ingestor = IncrementalIngestor(self.db_utils, self.embeddings, 'corpus', chunk_size=40, chunk_overlap=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def chunks(self, source: str) -> List[str]:
+        rows = self.db_utils.read_columns('corpus', ['text'], where=f"source = '{source}'")
+        return sorted(row['text'] for row in rows)
+
+    def ingest(self, pages):
+        return self.ingestor.ingest([SOURCE_A, SOURCE_B], [document(source, text) for source, text in pages])
+
+    def test_unchanged_sources_are_skipped(self):
+        pages = [(SOURCE_A, 'Qubits hold superpositions.\n\nGates rotate qubits.'), (SOURCE_B, 'Entanglement links qubits.')]
+        first = self.ingest(pages)
+        self.assertEqual((first['sources_changed'], first['chunks_added']), (2, 3))
+
+        self.embeddings.texts.clear()
+        second = self.ingest(pages)
+        self.assertEqual((second['sources_unchanged'], second['sources_changed'], second['chunks_added']), (2, 0, 0))
+        self.assertEqual(self.embeddings.texts, [])
+        self.assertEqual(self.chunks(SOURCE_A), ['Gates rotate qubits.', 'Qubits hold superpositions.'])
+
+    def test_changed_chunks_are_reembedded_and_stale_chunks_deleted(self):
+        self.ingest([(SOURCE_A, 'Qubits hold superpositions.\n\nGates rotate qubits.'), (SOURCE_B, 'Entanglement links qubits.')])
+
+        self.embeddings.texts.clear()
+        stats = self.ingest([(SOURCE_A, 'Qubits hold superpositions.\n\nMeasurement collapses states.'),
+                             (SOURCE_B, 'Entanglement links qubits.')])
+        self.assertEqual(self.embeddings.texts, ['Measurement collapses states.'])
+        self.assertEqual({key: stats[key] for key in ('sources_changed', 'chunks_added', 'chunks_deleted', 'chunks_kept')},
+                         {'sources_changed': 1, 'chunks_added': 1, 'chunks_deleted': 1, 'chunks_kept': 1})
+        self.assertEqual(self.chunks(SOURCE_A), ['Measurement collapses states.', 'Qubits hold superpositions.'])
+        self.assertEqual(self.chunks(SOURCE_B), ['Entanglement links qubits.'])
+
+    def test_removed_sources_are_cleaned_up(self):
+        self.ingest([(SOURCE_A, 'Qubits hold superpositions.'), (SOURCE_B, 'Entanglement links qubits.')])
+
+        stats = self.ingestor.ingest([SOURCE_A], [document(SOURCE_A, 'Qubits hold superpositions.')])
+        self.assertEqual(stats['sources_removed'], 1)
+        self.assertEqual(self.chunks(SOURCE_B), [])
+        self.assertEqual(set(self.ingestor._load_manifest()), {SOURCE_A})
+
+    def test_manifest_round_trip(self):
+        self.ingest([(SOURCE_A, 'Qubits hold superpositions.'), (SOURCE_B, 'Entanglement links qubits.')])
+        expected = {SOURCE_A: content_hash('Qubits hold superpositions.'), SOURCE_B: content_hash('Entanglement links qubits.')}
+        self.assertEqual(self.ingestor._load_manifest(), expected)
+
+        # A fresh ingestor over the same database picks up where the last run left off
+        reopened = IncrementalIngestor(LanceDBUtils(db_path=self.tmp_dir), self.embeddings, 'corpus', chunk_size=40, chunk_overlap=0)
+        self.assertEqual(reopened._load_manifest(), expected)
+        self.ingest([(SOURCE_A, 'Gates rotate qubits.'), (SOURCE_B, 'Entanglement links qubits.')])
+        self.assertEqual(self.ingestor._load_manifest()[SOURCE_A], content_hash('Gates rotate qubits.'))
+        self.assertEqual(len(self.db_utils.read_columns('corpus_sources', ['source'])), 2)
+
+    def test_documents_are_streamed_through_bounded_batches(self):
+        sources = [f"https://example.com/{index}" for index in range(4)]
+        pulled = []
+        batches = []
+
+        def documents():
+            for index, source in enumerate(sources):
+                pulled.append(source)
+                yield document(source, '\n\n'.join(f"Fact {index}-{paragraph} about qubits." for paragraph in range(3)))
+
+        def embed(texts):
+            # Which sources the loader had produced when this batch was embedded
+            batches.append((len(texts), len(pulled)))
+            return self.embeddings(texts)
+
+        ingestor = IncrementalIngestor(self.db_utils, embed, 'corpus', chunk_size=40, chunk_overlap=0, batch_size=2)
+        stats = ingestor.ingest(sources, documents())
+
+        self.assertEqual(stats['chunks_added'], 12)
+        self.assertEqual([size for size, _ in batches], [2] * 6)
+        # Embedding starts before the loader is drained; a source is complete once the next one
+        # starts, so the loader is never more than one source ahead
+        self.assertLess(batches[0][1], len(sources))
+        self.assertEqual([sources_read for _, sources_read in batches], [2, 3, 3, 4, 4, 4])
+        self.assertEqual((stats['stages']['embed']['items'], stats['stages']['insert']['items']), (12, 12))
+        self.assertEqual(len(self.db_utils.read_columns('corpus', ['id'])), 12)
+
+    def test_legacy_tables_are_migrated_in_place(self):
+        # Rows as the clear-and-reload ingestion wrote them, numbered by position
+        legacy = [{'id': 0, 'text': 'Old qubit notes.', 'source': SOURCE_A, 'embedding': np.array([1.0, 2.0, 3.0], dtype=np.float32)},
+                  {'id': 1, 'text': 'Old entanglement notes.', 'source': SOURCE_B, 'embedding': np.array([4.0, 5.0, 6.0], dtype=np.float32)}]
+        self.db_utils.create_table('corpus', data=legacy)
+
+        self.ingestor._migrate_legacy_table()
+        # The legacy rows stay searchable until their replacements are written
+        self.assertEqual(self.db_utils.read_columns('corpus', ['id', 'chunk_hash']), [{'id': '0', 'chunk_hash': ''}, {'id': '1', 'chunk_hash': ''}])
+        self.assertEqual(self.ingestor._load_manifest(), {SOURCE_A: '', SOURCE_B: ''})
+
+        stats = self.ingest([(SOURCE_A, 'Qubits hold superpositions.'), (SOURCE_B, 'Entanglement links qubits.')])
+        self.assertEqual((stats['sources_changed'], stats['chunks_added'], stats['chunks_deleted']), (2, 2, 2))
+        self.assertEqual(self.chunks(SOURCE_A), ['Qubits hold superpositions.'])
+        self.assertEqual(self.chunks(SOURCE_B), ['Entanglement links qubits.'])
+
+    def test_interrupted_migration_resumes(self):
+        legacy = [{'id': 0, 'text': 'Old qubit notes.', 'source': SOURCE_A, 'embedding': np.array([1.0, 2.0, 3.0], dtype=np.float32)}]
+        table = self.db_utils.create_table('corpus', data=legacy)
+        # Stopped after the integer ids were copied and dropped, before the copy was renamed
+        table.add_columns({'legacy_id': 'CAST(id AS STRING)'})
+        table.drop_columns(['id'])
+
+        stats = self.ingest([(SOURCE_A, 'Qubits hold superpositions.'), (SOURCE_B, 'Entanglement links qubits.')])
+        self.assertEqual((stats['chunks_added'], stats['chunks_deleted']), (2, 1))
+        self.assertNotIn('legacy_id', table.schema.names)
+        self.assertEqual(self.chunks(SOURCE_A), ['Qubits hold superpositions.'])
+
+if __name__ == '__main__':
+    unittest.main()
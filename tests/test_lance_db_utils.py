@@ -0,0 +1,131 @@
+# tests/test_lance_db_utils.py
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from utils.lance_db_utils import LanceDBUtils
+
+def rows(start: int, count: int) -> list:
+    return [{'id': str(index), 'text': f"chunk {index}", 'embedding': np.array([index, 1.0, 0.0, 0.0], dtype=np.float32)}
+            for index in range(start, start + count)]
+
+def random_rows(start: int, count: int, dimension: int = 8) -> list:
+    vectors = np.random.default_rng(start).standard_normal((count, dimension)).astype(np.float32)
+    return [{'id': str(start + offset), 'text': f"chunk {start + offset}", 'embedding': vector} for offset, vector in enumerate(vectors)]
+
+class TestLanceDBUtils(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_utils = LanceDBUtils(db_path=self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_table_handles_are_opened_once_and_reused(self):
+        LanceDBUtils(db_path=self.tmp_dir).create_table('corpus', data=rows(0, 2))
+
+        with mock.patch.object(self.db_utils.db, 'open_table', wraps=self.db_utils.db.open_table) as open_table:
+            handles = [self.db_utils.get_table('corpus') for _ in range(3)]
+        self.assertEqual(open_table.call_count, 1)
+        self.assertTrue(all(handle is handles[0] for handle in handles))
+
+    def test_concurrent_first_use_shares_one_handle(self):
+        LanceDBUtils(db_path=self.tmp_dir).create_table('corpus', data=rows(0, 2))
+        barrier = threading.Barrier(8)
+        handles = []
+
+        def open_and_write(start: int) -> None:
+            barrier.wait()
+            handles.append(self.db_utils.get_table('corpus'))
+            self.db_utils.add_data('corpus', rows(start, 5))
+
+        with mock.patch.object(self.db_utils.db, 'open_table', wraps=self.db_utils.db.open_table) as open_table:
+            threads = [threading.Thread(target=open_and_write, args=(100 + 5 * index,)) for index in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(open_table.call_count, 1)
+        self.assertEqual(len({id(handle) for handle in handles}), 1)
+        self.assertEqual(self.db_utils.get_table('corpus').count_rows(), 2 + 8 * 5)
+
+    def test_tables_created_by_another_process_are_found(self):
+        self.assertIsNone(self.db_utils.get_table('corpus'))
+
+        LanceDBUtils(db_path=self.tmp_dir).create_table('corpus', data=rows(0, 2))
+        self.assertIsNotNone(self.db_utils.get_table('corpus'))
+        self.assertEqual(len(self.db_utils.read_columns('corpus', ['id'])), 2)
+
+    def test_index_is_built_at_the_row_threshold_and_rebuilt_after_enough_writes(self):
+        db_utils = LanceDBUtils(db_path=self.tmp_dir, index_min_rows=300, index_rebuild_fraction=0.2)
+        db_utils.add_data('corpus', random_rows(0, 299))
+        self.assertFalse(db_utils.ensure_index('corpus'))
+        self.assertFalse(db_utils.has_index('corpus'))
+
+        db_utils.add_data('corpus', random_rows(299, 1))
+        self.assertTrue(db_utils.ensure_index('corpus'))
+        self.assertTrue(db_utils.has_index('corpus'))
+        self.assertFalse(db_utils.ensure_index('corpus'))
+
+        # A rebuild waits until a fifth of the 300 indexed rows changed
+        db_utils.add_data('corpus', random_rows(300, 40))
+        db_utils.delete_where('corpus', "id = '0'")
+        self.assertEqual(db_utils._index_state['corpus'], {'indexed_rows': 300, 'changed_rows': 41})
+        self.assertFalse(db_utils.ensure_index('corpus'))
+        db_utils.add_data('corpus', random_rows(340, 19))
+        self.assertTrue(db_utils.ensure_index('corpus'))
+        self.assertEqual(db_utils._index_state['corpus'], {'indexed_rows': 358, 'changed_rows': 0})
+
+    def test_missing_index_is_looked_up_again_after_the_ttl(self):
+        db_utils = LanceDBUtils(db_path=self.tmp_dir, index_check_ttl=60)
+        db_utils.add_data('corpus', random_rows(0, 300))
+        self.assertFalse(db_utils.has_index('corpus'))
+
+        # Another process indexes the table
+        LanceDBUtils(db_path=self.tmp_dir, index_min_rows=300).ensure_index('corpus')
+        with mock.patch.object(db_utils, 'indexed_columns', wraps=db_utils.indexed_columns) as indexed_columns:
+            self.assertFalse(db_utils.has_index('corpus'))
+            self.assertEqual(indexed_columns.call_count, 0)
+
+            later = time.monotonic() + 61
+            with mock.patch('utils.lance_db_utils.time.monotonic', return_value=later):
+                self.assertTrue(db_utils.has_index('corpus'))
+        self.assertEqual(indexed_columns.call_count, 1)
+        self.assertEqual(db_utils.search('corpus', random_rows(0, 1)[0]['embedding'], top_k=3).to_list()[0]['id'], '0')
+
+    def test_batched_retrieval_keeps_the_query_order(self):
+        topics = ['qubits', 'poetry', 'weather', 'football']
+        self.db_utils.add_data('corpus', [
+            {'id': topic, 'text': f"notes on {topic}", 'embedding': np.eye(4, dtype=np.float32)[index]}
+            for index, topic in enumerate(topics)
+        ])
+        embedded = []
+
+        def embed(texts):
+            embedded.append(list(texts))
+            return [np.eye(4, dtype=np.float32)[topics.index(text)] for text in texts]
+
+        search_texts = self.db_utils.search_texts
+
+        def slow_first_searches(table_name, query_embedding, *args):
+            # Earlier queries finish last, so the results complete out of order
+            time.sleep(0.05 * (4 - int(np.argmax(query_embedding))))
+            if np.argmax(query_embedding) == 2:
+                raise RuntimeError('search failed')
+            return search_texts(table_name, query_embedding, *args)
+
+        queries = ['football', 'qubits', 'weather', 'poetry', 'qubits']
+        with mock.patch.object(self.db_utils, 'search_texts', side_effect=slow_first_searches):
+            results = self.db_utils.retrieve_relevant_info_batch('corpus', queries, embed, top_k=1)
+        self.assertEqual(results, [['notes on football'], ['notes on qubits'], [], ['notes on poetry'], ['notes on qubits']])
+        self.assertEqual(embedded, [queries])
+
+        self.assertEqual(self.db_utils.retrieve_relevant_info_batch('missing', queries, embed), [[]] * 5)
+        self.assertEqual(self.db_utils.retrieve_relevant_info_batch('corpus', [], embed), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+# tests/test_memory.py
+
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from typing import List
+from unittest import mock
+from utils.lance_db_utils import LanceDBUtils
+from utils.context_assembler import ContextAssembler
+from utils.memory import DEFAULT_USER, Memory
+from utils.memory_compactor import MemoryCompactor
+
+TOPICS = ['quantum', 'poetry', 'weather', 'football']
+
+def topic_embeddings(texts: List[str]) -> List[List[float]]:
+    # One axis per topic, so similarity between texts is the overlap of their topics
+    return [[1.0 if topic in text.lower() else 0.0 for topic in TOPICS] + [0.1] for text in texts]
+
+class TestMemory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_utils = LanceDBUtils(db_path=self.tmp_dir)
+        self.memory = Memory(self.db_utils, topic_embeddings, table_name='memory', max_history=10, flush_batch_size=4)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_recall_merges_relevant_history_with_the_latest_turns(self):
+        self.memory.add_interaction('Explain quantum tunnelling', 'Particles cross barriers.')
+        for index in range(6):
+            self.memory.add_interaction(f'Will the weather hold, day {index}?', 'Sunny.')
+        self.memory.add_interaction('Any good poetry?', 'Try Szymborska.')
+
+        turns = self.memory.recall('Tell me more about quantum computers', k=1, recent=2)
+        self.assertEqual([turn['user_query'] for turn in turns],
+                         ['Explain quantum tunnelling', 'Will the weather hold, day 5?', 'Any good poetry?'])
+        # Interactions still buffered are recalled as well as the flushed ones
+        self.memory.add_interaction('What about football?', 'Goal!')
+        self.memory.add_interaction('And poetry again?', 'Rilke.')
+        turns = self.memory.recall('football scores', k=1, recent=0)
+        self.assertEqual([turn['user_query'] for turn in turns], ['What about football?'])
+
+    def test_older_interactions_decay(self):
+        now = datetime.utcnow()
+        self.db_utils.add_data('memory', [
+            {'id': str(age), 'timestamp': (now - timedelta(hours=age)).isoformat(timespec='microseconds'),
+             'user_query': f'quantum question from {age} hours ago', 'bot_response': 'An answer.',
+             'embedding': topic_embeddings(['quantum'])[0]}
+            for age in (500, 5, 200)
+        ])
+        turns = self.memory.recall('quantum', k=2, recent=0)
+        self.assertEqual([turn['user_query'] for turn in turns],
+                         ['quantum question from 200 hours ago', 'quantum question from 5 hours ago'])
+        self.assertEqual(self.memory.recall('football', k=2, recent=0), [])
+
+    def test_users_have_separate_bounded_memories(self):
+        memory = Memory(self.db_utils, topic_embeddings, table_name='users', max_history=3, flush_batch_size=2,
+                        retention=4, max_cached_users=2)
+        for index in range(8):
+            memory.add_interaction(f'quantum question {index}', 'An answer.', user_id='ada')
+        memory.add_interaction('poetry please', 'A sonnet.', user_id='bob')
+        memory.add_interaction('weather today?', 'Rain.', user_id='cy')
+        memory.flush()
+
+        # cy evicted ada's ring, so ada's turns are read back from the table
+        self.assertEqual(list(memory._users), ['bob', 'cy'])
+        self.assertEqual([turn['user_query'] for turn in memory.get_recent_turns(5, user_id='ada')],
+                         ['quantum question 5', 'quantum question 6', 'quantum question 7'])
+        self.assertEqual(list(memory._users), ['cy', 'ada'])
+        self.assertEqual([turn['user_query'] for turn in memory.recall('quantum', k=3, recent=0, user_id='bob')], [])
+        self.assertEqual([turn['user_query'] for turn in memory.get_recent_turns(5, user_id='bob')], ['poetry please'])
+
+        stored = self.db_utils.read_columns('users', ['user_query'], where="user_id = 'ada'")
+        self.assertLessEqual(len(stored), 4 + 1)
+        self.assertIn({'user_query': 'quantum question 7'}, stored)
+        self.assertIn(['user_id'], self.db_utils.indexed_columns(self.db_utils.get_table('users')))
+
+    def test_ring_and_table_stay_within_their_bounds(self):
+        memory = Memory(self.db_utils, topic_embeddings, table_name='bounded', max_history=3, flush_batch_size=4, retention=5)
+        for index in range(3):
+            memory.add_interaction(f'question {index}', 'An answer.')
+        # Buffered until a full batch is written
+        self.assertEqual(self.db_utils.read_columns('bounded', ['id']), [])
+        memory.add_interaction('question 3', 'An answer.')
+        self.assertEqual(len(self.db_utils.read_columns('bounded', ['id'])), 4)
+
+        for index in range(4, 14):
+            memory.add_interaction(f'question {index}', 'An answer.')
+        memory.flush()
+        # Recent turns come from the ring alone, which holds only the newest max_history
+        with mock.patch.object(self.db_utils, 'read_columns', side_effect=AssertionError('table read')):
+            turns = memory.get_recent_turns(10)
+        self.assertEqual([turn['user_query'] for turn in turns], ['question 11', 'question 12', 'question 13'])
+        self.assertEqual(len(memory._users[DEFAULT_USER]['recent']), 3)
+
+        # Flushes prune the table back to the retention once it exceeds it by more than the slack
+        stored = [row['user_query'] for row in self.db_utils.read_columns('bounded', ['user_query'])]
+        self.assertLessEqual(len(stored), 5 + 1)
+        self.assertGreaterEqual(len(stored), 5)
+        self.assertIn('question 13', stored)
+        self.assertNotIn('question 0', stored)
+
+    def test_failing_writes_keep_a_bounded_backlog(self):
+        memory = Memory(self.db_utils, topic_embeddings, table_name='broken', flush_batch_size=2, max_pending=4)
+        with mock.patch.object(memory, '_ensure_schema', side_effect=RuntimeError('schema')):
+            for index in range(10):
+                memory.add_interaction(f'question {index}', 'An answer.')
+        self.assertEqual([row['user_query'] for row in memory._pending], [f'question {index}' for index in range(6, 10)])
+        memory.flush()
+        self.assertEqual(memory._pending, [])
+        self.assertEqual(len(self.db_utils.read_columns('broken', ['id'])), 4)
+
+    def test_failing_prune_does_not_lose_the_interaction(self):
+        memory = Memory(self.db_utils, topic_embeddings, table_name='pruned', flush_batch_size=1)
+        for index in range(4):
+            memory.add_interaction(f'quantum question {index}', 'An answer.', user_id='ada')
+
+        # A cold user over retention is pruned when first loaded
+        cold = Memory(self.db_utils, topic_embeddings, table_name='pruned', max_history=1, flush_batch_size=1, retention=2)
+        with mock.patch.object(self.db_utils, 'delete_where', side_effect=RuntimeError('delete')):
+            cold.add_interaction('quantum question 4', 'An answer.', user_id='ada')
+            turns = cold.recall('quantum', k=1, recent=1, user_id='ada')
+        self.assertEqual(turns[-1]['user_query'], 'quantum question 4')
+        self.assertIn({'user_query': 'quantum question 4'}, self.db_utils.read_columns('pruned', ['user_query']))
+
+    def test_compaction_replaces_old_interactions_with_a_summary(self):
+        memory = Memory(self.db_utils, topic_embeddings, table_name='compacted', max_history=2, flush_batch_size=50)
+        for index in range(13):
+            topic = 'quantum' if index < 3 else 'weather'
+            memory.add_interaction(f'A long question about {topic}, number {index}', f'A long answer about {topic}. ' * 5, user_id='ada')
+        memory.flush()
+        summaries = []
+
+        def summarize(turns, previous_summary):
+            summaries.append(previous_summary)
+            text = ' '.join([previous_summary or ''] + [turn['user_query'] for turn in turns])
+            return f"Ada asked about {' and '.join(topic for topic in TOPICS if topic in text)}."
+
+        compactor = MemoryCompactor(memory, summarize, keep_recent=4, batch_size=3, max_summaries=2)
+        self.assertGreater(compactor.run_once(), 0)
+
+        # Two summaries are kept, the newest carrying the gist of the earlier ones
+        self.assertEqual(summaries, [None, 'Ada asked about quantum.', 'Ada asked about quantum and weather.'])
+        stored = self.db_utils.read_columns('compacted', ['kind', 'bot_response'], where="user_id = 'ada'")
+        self.assertEqual(sorted(row['bot_response'] for row in stored if row['kind'] == 'summary'),
+                         ['Ada asked about quantum and weather.'] * 2)
+        self.assertEqual(len(stored), 4 + 2)
+        self.assertEqual(compactor.stats()['interactions_compacted'], 9)
+
+        turns = memory.recall('quantum', k=1, recent=1, user_id='ada')
+        self.assertEqual(turns[0]['kind'], 'summary')
+        messages = ContextAssembler(max_prompt_tokens=1024).assemble('System.', 'More quantum?', turns=turns)
+        self.assertIn('Summary of earlier conversation: Ada asked about quantum and weather.', [message['content'] for message in messages])
+
+if __name__ == '__main__':
+    unittest.main()
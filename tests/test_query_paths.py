@@ -0,0 +1,188 @@
+# tests/test_query_paths.py
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from typing import List
+from unittest import mock
+import numpy as np
+from bots.host import BotHost
+from bots.xbot import XBot
+from utils.config import Config
+from utils.openai_utils import OpenAILLM
+
+SENTENCES = [f"Sentence {index} explains one more idea about quantum computers and their qubits in plain words. " for index in range(8)]
+
+def topic_embeddings(texts: List[str]) -> np.ndarray:
+    return np.array([[1.0 if word in text.lower() else 0.0 for word in ('quantum', 'poetry', 'weather')] + [0.1] for text in texts],
+                    dtype=np.float32)
+
+def chunk(content: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(delta={'content': content})])
+
+def completion(content: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message={'content': content})])
+
+class FakeTwitter:
+    def __init__(self):
+        self.tweets: List[str] = []
+        self.direct_messages: List[tuple] = []
+        self.lock = threading.Lock()
+        self.down = False
+
+    def post_tweet(self, message, in_reply_to_status_id=None):
+        if self.down:
+            return None
+        with self.lock:
+            self.tweets.append(message)
+            return len(self.tweets)
+
+    async def apost_tweet(self, message, in_reply_to_status_id=None):
+        return self.post_tweet(message, in_reply_to_status_id)
+
+    async def asend_direct_message(self, user_id, message):
+        self.direct_messages.append((user_id, message))
+        return True
+
+class TestQueryPaths(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        environment = {
+            'DB_PATH': os.path.join(self.tmp_dir, 'lancedb'),
+            'EMBEDDING_CACHE_PATH': '',
+            'RATE_LIMIT_STATE_PATH': '',
+        }
+        for patcher in (mock.patch.dict(os.environ, environment), mock.patch.object(Config, '_instance', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.host = BotHost()
+        self.host.embedding_fn = topic_embeddings
+        self.twitter = FakeTwitter()
+        self.llm = OpenAILLM(character_profile={'name': 'Alexandra'})
+        self.bot = XBot(host=self.host, openai_llm=self.llm, twitter=self.twitter, table_name='corpus')
+
+    def tearDown(self):
+        self.bot.close()
+        self.host.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_streamed_tweets_are_posted_before_generation_ends(self):
+        tweets_while_generating = []
+
+        def stream(**kwargs):
+            for sentence in SENTENCES:
+                tweets_while_generating.append(len(self.twitter.tweets))
+                yield chunk(sentence)
+
+        with mock.patch.object(self.llm, '_create', side_effect=lambda **kwargs: stream(**kwargs)):
+            response = self.bot.process_query('Explain quantum computers', stream=True)
+
+        self.assertEqual(response, ''.join(SENTENCES).strip())
+        self.assertGreater(len(self.twitter.tweets), 1)
+        # The first tweets went out while the rest of the response was still being generated
+        self.assertGreater(tweets_while_generating[-1], 0)
+        self.assertEqual(self.bot.response_cache.lookup(topic_embeddings(['Explain quantum computers'])[0]), response)
+
+    def test_interrupted_stream_is_posted_but_not_cached_or_remembered(self):
+        def stream(**kwargs):
+            for sentence in SENTENCES[:4]:
+                yield chunk(sentence)
+            raise ConnectionError('connection reset')
+
+        with mock.patch.object(self.llm, '_create', side_effect=lambda **kwargs: stream(**kwargs)):
+            response = self.bot.process_query('Explain quantum computers', stream=True)
+
+        self.assertEqual(response, ''.join(SENTENCES[:4]).strip())
+        # Everything received before the failure is still posted
+        posted = ' '.join(self.twitter.tweets)
+        self.assertIn('Sentence 3 explains', posted)
+        self.assertNotIn('Sentence 4', posted)
+        self.assertIsNone(self.bot.response_cache.lookup(topic_embeddings(['Explain quantum computers'])[0]))
+        self.assertEqual(self.bot.memory.get_recent_turns(5), [])
+
+    def test_interrupted_async_stream_is_not_cached_or_remembered(self):
+        async def stream():
+            for sentence in SENTENCES[:4]:
+                yield chunk(sentence)
+            raise ConnectionError('connection reset')
+
+        async def acreate(**kwargs):
+            return stream()
+
+        with mock.patch.object(self.llm, '_acreate', side_effect=acreate):
+            response = asyncio.run(self.bot.aprocess_query('Explain quantum computers', stream=True))
+
+        self.assertEqual(response, ''.join(SENTENCES[:4]).strip())
+        self.assertIn('Sentence 3 explains', ' '.join(self.twitter.tweets))
+        self.assertIsNone(self.bot.response_cache.lookup(topic_embeddings(['Explain quantum computers'])[0]))
+        self.assertEqual(self.bot.memory.get_recent_turns(5), [])
+
+    def test_undelivered_response_is_raised_for_a_retry(self):
+        self.twitter.down = True
+        with mock.patch.object(self.llm, '_create', return_value=completion('Qubits can hold superpositions.')):
+            with self.assertRaises(RuntimeError):
+                self.bot.process_query('Explain qubits', stream=False, raise_errors=True)
+            # Not remembered until it is delivered; by default the failure is only logged
+            self.assertEqual(self.bot.memory.get_recent_turns(5), [])
+            self.assertEqual(self.bot.process_query('Explain qubits', stream=False), 'Qubits can hold superpositions.')
+
+    def test_failed_generation_is_raised_for_a_retry(self):
+        with mock.patch.object(self.llm, '_create', side_effect=ConnectionError('refused')):
+            with self.assertRaises(RuntimeError):
+                self.bot.process_query('Explain qubits', stream=False, raise_errors=True)
+        self.assertEqual(self.twitter.tweets, [])
+        self.assertEqual(self.bot.memory.get_recent_turns(5), [])
+
+    def test_async_queries_overlap_their_network_waits(self):
+        async def acreate(**kwargs):
+            await asyncio.sleep(0.3)
+            return completion('Qubits can hold superpositions.')
+
+        async def run():
+            started = time.monotonic()
+            responses = await asyncio.gather(*(
+                self.bot.aprocess_query(f'Question {index} about quantum computers', stream=False, user_id=f'user-{index}')
+                for index in range(4)
+            ))
+            return responses, time.monotonic() - started
+
+        with mock.patch.object(self.llm, '_acreate', side_effect=acreate):
+            responses, elapsed = asyncio.run(run())
+
+        self.assertEqual(responses, ['Qubits can hold superpositions.'] * 4)
+        # Four completions of 0.3 seconds each would take 1.2 seconds one after the other
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(len(self.twitter.tweets), 4)
+        self.assertTrue(all('Qubits can hold superpositions.' in tweet for tweet in self.twitter.tweets))
+        for index in range(4):
+            self.assertEqual(self.bot.memory.get_recent_turns(5, user_id=f'user-{index}'),
+                             [{'user_query': f'Question {index} about quantum computers', 'bot_response': 'Qubits can hold superpositions.'}])
+        self.assertEqual(self.bot.response_cache.lookup(topic_embeddings(['Question 0 about quantum computers'])[0]),
+                         'Qubits can hold superpositions.')
+
+    def test_async_direct_message_and_failure(self):
+        async def acreate(**kwargs):
+            return completion('Entangled qubits share one state.')
+
+        with mock.patch.object(self.llm, '_acreate', side_effect=acreate):
+            response = asyncio.run(self.bot.aprocess_query('What is entanglement?', recipient_id=42))
+        self.assertEqual(self.twitter.direct_messages, [(42, response)])
+        self.assertEqual(self.twitter.tweets, [])
+        self.assertEqual(self.bot.memory.get_recent_turns(5, user_id='42')[-1]['bot_response'], response)
+
+        with mock.patch.object(self.llm, '_acreate', side_effect=ConnectionError('refused')):
+            self.assertTrue(self.llm.is_fallback_response(asyncio.run(self.bot.aprocess_query('Why?', stream=False, use_cache=False))))
+            with self.assertRaises(RuntimeError):
+                asyncio.run(self.bot.aprocess_query('Why?', stream=False, use_cache=False, raise_errors=True))
+
+    def test_failure_before_any_text_yields_the_fallback(self):
+        with mock.patch.object(self.llm, '_create', side_effect=ConnectionError('refused')):
+            self.assertEqual(list(self.llm.stream_response([])), [self.llm._fallback_response()])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# tests/test_rate_limiter.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from utils.rate_limiter import RateLimiter, RetryPolicy
+
+NOW = 1_700_000_000.0
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.now = NOW
+        patcher = mock.patch('utils.rate_limiter.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_bursts_up_to_capacity_then_refills(self):
+        limiter = RateLimiter({'tweet': (3, 30)})
+        self.assertEqual([limiter.reserve('tweet') for _ in range(3)], [0.0, 0.0, 0.0])
+        # One token refills every 10 seconds; each caller past the burst is given the next free slot
+        self.assertAlmostEqual(limiter.reserve('tweet'), 10.0)
+        self.assertAlmostEqual(limiter.reserve('tweet'), 20.0)
+
+        self.now += 60
+        self.assertEqual(limiter.reserve('tweet'), 0.0)
+        self.assertEqual(limiter.reserve('unlimited'), 0.0)
+
+    def test_sqlite_store_is_shared_between_limiters(self):
+        path = os.path.join(self.tmp_dir, 'rate_limits.sqlite')
+        first, second = RateLimiter({'tweet': (2, 20)}, db_path=path), RateLimiter({'tweet': (2, 20)}, db_path=path)
+        other = RateLimiter({'tweet': (2, 20)}, db_path=path, namespace='Zed')
+        try:
+            self.assertEqual(first.reserve('tweet'), 0.0)
+            self.assertEqual(second.reserve('tweet'), 0.0)
+            self.assertAlmostEqual(first.reserve('tweet'), 10.0)
+            self.assertEqual(other.reserve('tweet'), 0.0)
+        finally:
+            for limiter in (first, second, other):
+                limiter.close()
+
+    def test_rate_limit_headers_block_the_endpoint_until_reset(self):
+        limiter = RateLimiter({'mentions': (75, 900)})
+        self.assertIsNone(limiter.observe('mentions', {'x-rate-limit-remaining': '3', 'x-rate-limit-reset': str(NOW + 600)}))
+        self.assertEqual(limiter.reserve('mentions'), 0.0)
+
+        self.assertEqual(limiter.observe('mentions', {'x-rate-limit-remaining': '0', 'x-rate-limit-reset': str(NOW + 600)}), NOW + 600)
+        self.assertAlmostEqual(limiter.reserve('mentions'), 600.0)
+        # An earlier reset does not shorten the block
+        limiter.block_until('mentions', NOW + 60)
+        self.assertAlmostEqual(limiter.reserve('mentions'), 600.0)
+
+        self.now += 601
+        self.assertEqual(limiter.reserve('mentions'), 0.0)
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_exponential_backoff_is_capped_and_bounded_by_attempts(self):
+        policy = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=3.0)
+        with mock.patch('utils.rate_limiter.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual([policy.backoff(attempt) for attempt in range(4)], [1.0, 2.0, 3.0, None])
+
+    def test_other_strategies(self):
+        self.assertIsNone(RetryPolicy('fail_gracefully').backoff(0))
+        policy = RetryPolicy('retry', max_attempts=3, base_delay=2.0)
+        self.assertTrue(all(1.0 <= policy.backoff(attempt) <= 3.0 for attempt in range(2)))
+        self.assertIsNone(policy.backoff(2))
+        self.assertEqual(RetryPolicy('unknown').strategy, 'retry_with_exponential_backoff')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# tests/test_response_cache.py
+
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from bots.xbot import XBot
+from utils.lance_db_utils import LanceDBUtils
+from utils.response_cache import SemanticResponseCache
+
+def vector(*values: float) -> np.ndarray:
+    return np.array(values, dtype=np.float32)
+
+class TestSemanticResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_utils = LanceDBUtils(db_path=self.tmp_dir)
+        self.cache = SemanticResponseCache(self.db_utils, persona='Alexandra', similarity_threshold=0.95, candidates=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_similar_queries_hit_and_others_miss(self):
+        self.cache.store('What is quantum computing?', vector(1.0, 0.0, 0.0), 'Qubits.')
+        self.assertEqual(self.cache.lookup(vector(0.99, 0.05, 0.0)), 'Qubits.')
+        self.assertIsNone(self.cache.lookup(vector(0.0, 1.0, 0.0)))
+        self.assertEqual({key: self.cache.stats()[key] for key in ('hits', 'misses', 'stores')}, {'hits': 1, 'misses': 1, 'stores': 1})
+
+    def test_expired_entries_are_ignored(self):
+        self.cache.store('What is quantum computing?', vector(1.0, 0.0, 0.0), 'Qubits.')
+        with mock.patch('utils.response_cache.time.time', return_value=time.time() + self.cache.ttl_seconds + 1):
+            self.assertIsNone(self.cache.lookup(vector(1.0, 0.0, 0.0)))
+
+    def test_personas_do_not_see_each_others_responses(self):
+        other = SemanticResponseCache(self.db_utils, persona='Zed', candidates=2)
+        # More of Zed's entries sit nearer the query than the candidates considered per lookup
+        for index in range(5):
+            other.store(f'Quantum question {index}', vector(1.0, 0.001 * index, 0.0), f'Zed answer {index}.')
+        self.cache.store('What is quantum computing?', vector(0.98, 0.0, 0.2), 'Qubits.')
+
+        with mock.patch.object(self.db_utils, 'search', wraps=self.db_utils.search) as search:
+            self.assertEqual(self.cache.lookup(vector(1.0, 0.0, 0.0)), 'Qubits.')
+        self.assertTrue(search.call_args.kwargs['prefilter'])
+        self.assertEqual(other.lookup(vector(0.98, 0.0, 0.2)), 'Zed answer 0.')
+
+    def test_fallback_responses_are_not_cached(self):
+        bot = XBot.__new__(XBot)
+        bot.response_cache = self.cache
+        bot.openai_llm = mock.Mock()
+        bot.openai_llm.is_fallback_response.side_effect = lambda response: response.startswith("I'm sorry")
+
+        bot._cache_response('What is quantum computing?', vector(1.0, 0.0, 0.0), "I'm sorry, try again later.", True)
+        self.assertIsNone(self.cache.lookup(vector(1.0, 0.0, 0.0)))
+        bot._cache_response('What is quantum computing?', vector(1.0, 0.0, 0.0), 'Qubits.', True)
+        self.assertEqual(self.cache.lookup(vector(1.0, 0.0, 0.0)), 'Qubits.')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,14 @@
+# tests/test_startup.py
+
+import unittest
+from benchmarks.startup_bench import cold_start
+
+class TestLazyStartup(unittest.TestCase):
+    def test_construction_loads_no_heavy_dependencies(self):
+        # Runs without any credentials in the environment: nothing is validated, connected,
+        # authenticated or loaded until it is first used
+        report = cold_start(runs=1)
+        self.assertEqual(report['loaded'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# tests/test_system_prompt.py
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from utils import system_prompt
+from utils.system_prompt import SystemPromptCache
+
+class TestSystemPromptCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'character.json')
+        self.write({'name': 'Alexandra', 'description': 'A futurist.'})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, profile, mtime_ns=None):
+        with open(self.path, 'w') as file:
+            file.write(profile if isinstance(profile, str) else json.dumps(profile))
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_prompt_is_recompiled_only_when_the_file_changes(self):
+        cache = SystemPromptCache(character_config_path=self.path)
+        with mock.patch.object(system_prompt, 'render_system_prompt', wraps=system_prompt.render_system_prompt) as render:
+            first = cache.get()
+            self.assertIs(cache.get(), first)
+            self.assertTrue(first.text.startswith('You are Alexandra.'))
+
+            # Touched but not edited: the content hash is unchanged
+            os.utime(self.path, ns=(1_000_000_000, 1_000_000_000))
+            self.assertIs(cache.get(), first)
+            self.assertEqual(render.call_count, 1)
+
+            # Edited: the stat and the content hash both change
+            self.write({'name': 'Beatrice', 'description': 'A futurist.'}, mtime_ns=2_000_000_000)
+            second = cache.get()
+            self.assertEqual(render.call_count, 2)
+        self.assertTrue(second.text.startswith('You are Beatrice.'))
+        self.assertNotEqual(second.source_hash, first.source_hash)
+        self.assertGreater(second.token_count, 0)
+
+    def test_unreadable_file_keeps_the_last_good_prompt(self):
+        cache = SystemPromptCache(character_config_path=self.path, character_profile={'name': 'Fallback'})
+        good = cache.get()
+        self.write('{not json', mtime_ns=3_000_000_000)
+        self.assertEqual(cache.get(), good)
+
+        missing = SystemPromptCache(character_config_path=os.path.join(self.tmp_dir, 'missing.json'),
+                                    character_profile={'name': 'Fallback'})
+        self.assertTrue(missing.get().text.startswith('You are Fallback.'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# tests/test_tweet_splitter.py
+
+import random
+import unicodedata
+import unittest
+import regex
+from utils.tweet_splitter import URL_PATTERN, TweetSegmenter, weighted_length
+
+WORDS = [
+    'quantum', 'computing', 'réseau', 'naïve', 'Straße', 'данные', 'αλγόριθμος', 'مرحبا', 'नमस्ते',
+    '機械学習', '量子', '인공지능', 'été', 'ǟ', '👍🏽', '👩‍💻', '🇯🇵', '1️⃣', '😊',
+    'https://example.com/path?q=1', 'www.example.org', 'x' * 300, '漢' * 200,
+]
+PUNCTUATION = ['', '', '', ',', '.', '!', '?', '…', '。', '."']
+
+def random_text(rng: random.Random, words: int) -> str:
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice(WORDS) + rng.choice(PUNCTUATION))
+        parts.append(rng.choice([' ', ' ', ' ', '  ', '\n']))
+    return ''.join(parts)
+
+def clusters(text: str):
+    return regex.findall(r'\X', ''.join(unicodedata.normalize('NFC', text).split()))
+
+class TestTweetSegmenter(unittest.TestCase):
+    def test_weighted_length(self):
+        self.assertEqual(weighted_length('hello'), 5)
+        self.assertEqual(weighted_length('漢字'), 4)
+        self.assertEqual(weighted_length('👩‍💻'), 2)
+        self.assertEqual(weighted_length('see https://example.com/a/very/long/path/that/keeps/going'), 4 + 23)
+
+    def test_prefers_sentence_boundaries(self):
+        text = 'First sentence is here. ' * 6 + 'Second part runs on and on without stopping ' * 4
+        tweets = TweetSegmenter(140).split(text)
+        self.assertTrue(tweets[0].endswith('here.'))
+
+    def test_random_multilingual_text(self):
+        rng = random.Random(16)
+        for _ in range(200):
+            text = random_text(rng, rng.randint(0, 120))
+            limit = rng.choice([40, 80, 140, 280])
+            prefix = rng.choice(['', '😊 '])
+            suffix = rng.choice(['', '#AI', '#機械学習'])
+            tweets = TweetSegmenter(limit, prefix=prefix, suffix=suffix).split(text)
+            bodies = [tweet[len(prefix):len(tweet) - (len(suffix) + 1 if suffix else 0)] for tweet in tweets]
+
+            # Every tweet fits, nothing is lost or reordered, and no grapheme cluster is split
+            for tweet in tweets:
+                self.assertLessEqual(weighted_length(tweet), limit, tweet)
+            self.assertEqual(clusters(text), [cluster for body in bodies for cluster in clusters(body)])
+            # URLs are never split
+            for url in URL_PATTERN.findall(text):
+                self.assertTrue(any(url in body for body in bodies), url)
+
+    def test_incremental_feed_matches_split(self):
+        rng = random.Random(61)
+        for _ in range(100):
+            text = random_text(rng, rng.randint(0, 80))
+            segmenter = TweetSegmenter(rng.choice([80, 280]), prefix='😊 ')
+            streamed = []
+            position = 0
+            while position < len(text):
+                size = rng.randint(1, 12)
+                streamed.extend(segmenter.feed(text[position:position + size]))
+                position += size
+            streamed.extend(segmenter.flush())
+            self.assertEqual(streamed, segmenter.split(text))
+
+    def test_thread_numbering(self):
+        rng = random.Random(7)
+        for _ in range(30):
+            text = random_text(rng, rng.randint(20, 300))
+            tweets = TweetSegmenter(140, numbering=True).split(text)
+            if len(tweets) == 1:
+                self.assertNotRegex(tweets[0], r' 1/1$')
+                continue
+            for index, tweet in enumerate(tweets, start=1):
+                self.assertTrue(tweet.endswith(f" {index}/{len(tweets)}"), tweet)
+                self.assertLessEqual(weighted_length(tweet), 140)
+
+if __name__ == '__main__':
+    unittest.main()
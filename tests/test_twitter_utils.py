@@ -0,0 +1,54 @@
+# tests/test_twitter_utils.py
+
+import unittest
+from types import SimpleNamespace
+import tweepy
+from utils.rate_limiter import RateLimiter, RetryPolicy
+from utils.twitter_utils import TWITTER_RATE_LIMITS, TwitterAPI
+
+BOT_USER_ID = 1
+
+def status(status_id: int, user_id: int = 7) -> SimpleNamespace:
+    return SimpleNamespace(id=status_id, full_text=f"mention {status_id}", user=SimpleNamespace(id=user_id, screen_name='someone'))
+
+class FakeTimeline:
+    def __init__(self, statuses, fail_from_call=None):
+        # Newest first, as the API returns them
+        self.statuses = sorted(statuses, key=lambda item: item.id, reverse=True)
+        self.fail_from_call = fail_from_call
+        self.calls = []
+
+    def mentions_timeline(self, since_id=None, max_id=None, count=20, tweet_mode=None):
+        self.calls.append({'since_id': since_id, 'max_id': max_id, 'count': count})
+        if self.fail_from_call is not None and len(self.calls) >= self.fail_from_call:
+            raise tweepy.TweepyException('connection reset')
+        return [item for item in self.statuses
+                if (since_id is None or item.id > since_id) and (max_id is None or item.id <= max_id)][:count]
+
+class TestTwitterAPI(unittest.TestCase):
+    def client(self, timeline: FakeTimeline) -> TwitterAPI:
+        twitter = TwitterAPI(rate_limiter=RateLimiter(TWITTER_RATE_LIMITS), retry_policy=RetryPolicy('fail_gracefully'))
+        twitter._api = timeline
+        twitter._user_id = BOT_USER_ID
+        return twitter
+
+    def test_mentions_are_paged_back_to_the_cursor(self):
+        timeline = FakeTimeline([status(status_id) for status_id in range(1, 451)] + [status(451, user_id=BOT_USER_ID)])
+        mentions = self.client(timeline).get_mentions(since_id=100, count=200)
+
+        self.assertEqual([mention['id'] for mention in mentions], list(range(101, 451)))
+        self.assertEqual([call['max_id'] for call in timeline.calls], [None, 251, 100])
+
+    def test_first_poll_fetches_one_page(self):
+        timeline = FakeTimeline([status(status_id) for status_id in range(1, 451)])
+        mentions = self.client(timeline).get_mentions(count=200)
+
+        self.assertEqual([mention['id'] for mention in mentions], list(range(251, 451)))
+        self.assertEqual(len(timeline.calls), 1)
+
+    def test_failed_page_returns_nothing_so_the_cursor_stays(self):
+        timeline = FakeTimeline([status(status_id) for status_id in range(1, 451)], fail_from_call=2)
+        self.assertEqual(self.client(timeline).get_mentions(since_id=100, count=200), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# tests/test_url_loader.py
+
+import re
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.url_loader import ConcurrentURLLoader
+
+def strip_tags(html: str) -> str:
+    return re.sub(r'<[^>]+>', '', html).strip()
+
+def failing_parse(html: str) -> str:
+    if 'broken' in html:
+        raise ValueError('unparseable page')
+    return strip_tags(html)
+
+class _PageHandler(BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        tracked = self.path.startswith('/limited')
+        if tracked:
+            with _PageHandler.lock:
+                _PageHandler.active += 1
+                _PageHandler.peak = max(_PageHandler.peak, _PageHandler.active)
+        time.sleep(1.0 if self.path.startswith('/slow') else 0.05)
+        if tracked:
+            # Leave the active window before responding so the client cannot observe a stale count
+            with _PageHandler.lock:
+                _PageHandler.active -= 1
+
+        if self.path.startswith('/missing'):
+            self.send_error(404)
+            return
+        body = f"<html><body><p>content of {self.path}</p></body></html>".encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+class TestConcurrentURLLoader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _PageHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_load_returns_documents_in_url_order(self):
+        urls = [f"{self.base_url}/page/{i}" for i in range(6)]
+        loader = ConcurrentURLLoader(urls, fetch_workers=4, parse_workers=0, parse_fn=strip_tags)
+        documents = loader.load()
+        self.assertEqual([doc.metadata['source'] for doc in documents], urls)
+        self.assertEqual(documents[2].page_content, 'content of /page/2')
+        self.assertEqual(loader.failures, {})
+
+    def test_failures_are_isolated_per_url(self):
+        urls = [f"{self.base_url}/page/ok", f"{self.base_url}/missing", f"{self.base_url}/slow", f"{self.base_url}/broken"]
+        loader = ConcurrentURLLoader(urls, fetch_workers=4, parse_workers=0, timeout=0.3, parse_fn=failing_parse)
+        documents = loader.load()
+        self.assertEqual([doc.metadata['source'] for doc in documents], urls[:1])
+        self.assertEqual(set(loader.failures), set(urls[1:]))
+
+    def test_per_host_limit_caps_concurrent_requests(self):
+        urls = [f"{self.base_url}/limited/{i}" for i in range(10)]
+        loader = ConcurrentURLLoader(urls, fetch_workers=8, parse_workers=0, per_host_limit=2, parse_fn=strip_tags)
+        self.assertEqual(len(loader.load()), 10)
+        self.assertLessEqual(_PageHandler.peak, 2)
+
+    def test_process_pool_parsing(self):
+        urls = [f"{self.base_url}/page/{i}" for i in range(4)] + [f"{self.base_url}/broken"]
+        loader = ConcurrentURLLoader(urls, fetch_workers=4, parse_workers=2, parse_fn=failing_parse)
+        documents = loader.load()
+        self.assertEqual([doc.page_content for doc in documents], [f"content of /page/{i}" for i in range(4)])
+        self.assertIn('parse failed', loader.failures[f"{self.base_url}/broken"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+# tests/test_worker.py
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from bots.worker import MentionWorker
+from utils.rate_limiter import RateLimiter
+
+class FakeTwitterClient:
+    def __init__(self):
+        self.mentions = []
+        self.direct_messages = []
+
+    def get_mentions(self, since_id=None):
+        return [item for item in self.mentions if since_id is None or item['id'] > since_id]
+
+    def get_direct_messages(self, since_id=None):
+        return [item for item in self.direct_messages if since_id is None or item['id'] > since_id]
+
+class FakeBot:
+    def __init__(self, delay: float = 0.0, fail_on=None):
+        self.delay = delay
+        # Number of times each query fails before it is answered
+        self.fail_on = dict(fail_on or {})
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def process_query(self, user_query, recipient_id=None, in_reply_to_status_id=None, user_id=None, raise_errors=False,
+                      rate_limit_reserved=False):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls.append({'query': user_query, 'recipient_id': recipient_id, 'in_reply_to_status_id': in_reply_to_status_id,
+                               'user_id': user_id, 'rate_limit_reserved': rate_limit_reserved, 'time': time.monotonic()})
+            failures_left = self.fail_on.get(user_query, 0)
+            self.fail_on[user_query] = failures_left - 1
+        if failures_left > 0 and raise_errors:
+            raise RuntimeError('generation failed')
+        return 'response'
+
+def mention(item_id: int) -> dict:
+    return {'id': item_id, 'text': f"mention {item_id}", 'user_id': 7, 'screen_name': 'someone'}
+
+class TestMentionWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp_dir, 'worker_state.json')
+        self.twitter = FakeTwitterClient()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_worker(self, bot, expected_calls, num_workers=3, **kwargs):
+        worker = MentionWorker(bot, twitter=self.twitter, num_workers=num_workers, poll_interval=0.05, state_path=self.state_path,
+                               retry_delay=0.01, **kwargs)
+        worker.start()
+        deadline = time.monotonic() + 5
+        while len(bot.calls) < expected_calls and time.monotonic() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.2)
+        worker.stop(timeout=5)
+        return worker
+
+    def test_routes_mentions_and_direct_messages(self):
+        self.twitter.mentions = [mention(10)]
+        self.twitter.direct_messages = [{'id': 20, 'text': 'hello', 'user_id': 99, 'screen_name': 'friend'}]
+        bot = FakeBot()
+        self.run_worker(bot, expected_calls=2)
+        calls = {call['query']: call for call in bot.calls}
+        self.assertEqual(calls['mention 10']['in_reply_to_status_id'], 10)
+        self.assertEqual(calls['hello']['recipient_id'], 99)
+        self.assertEqual((calls['mention 10']['user_id'], calls['hello']['user_id']), ('7', '99'))
+
+    def test_items_are_processed_once_across_polls(self):
+        self.twitter.mentions = [mention(i) for i in range(1, 21)]
+        bot = FakeBot(delay=0.01)
+        worker = self.run_worker(bot, expected_calls=20)
+        self.assertEqual(sorted(call['in_reply_to_status_id'] for call in bot.calls), list(range(1, 21)))
+        self.assertEqual(worker.processed, 20)
+
+    def test_restart_resumes_from_persisted_cursor(self):
+        self.twitter.mentions = [mention(i) for i in range(1, 6)]
+        self.run_worker(FakeBot(), expected_calls=5)
+
+        self.twitter.mentions.append(mention(6))
+        bot = FakeBot()
+        self.run_worker(bot, expected_calls=1)
+        self.assertEqual([call['in_reply_to_status_id'] for call in bot.calls], [6])
+
+    def test_failed_items_do_not_block_the_cursor(self):
+        self.twitter.mentions = [mention(1), mention(2)]
+        bot = FakeBot(fail_on={'mention 1': 10})
+        worker = self.run_worker(bot, expected_calls=1 + 3, max_attempts=3)
+        # Given up on after three attempts, and not picked up again by later polls
+        self.assertEqual([call['query'] for call in bot.calls].count('mention 1'), 3)
+        self.assertEqual((worker.processed, worker.failed), (1, 1))
+        self.assertEqual(worker.cursors.since_id('mentions'), 2)
+
+    def test_transient_failures_are_retried(self):
+        self.twitter.mentions = [mention(1)]
+        bot = FakeBot(fail_on={'mention 1': 2})
+        worker = self.run_worker(bot, expected_calls=3, max_attempts=3)
+        self.assertEqual(len(bot.calls), 3)
+        self.assertEqual((worker.processed, worker.failed), (1, 0))
+        self.assertEqual(worker.cursors.since_id('mentions'), 1)
+
+    def test_stop_during_retry_backoff_leaves_the_item_for_the_next_run(self):
+        self.twitter.mentions = [mention(1), mention(2)]
+        bot = FakeBot(fail_on={'mention 1': 1})
+        worker = MentionWorker(bot, twitter=self.twitter, num_workers=1, poll_interval=0.05, state_path=self.state_path,
+                               retry_delay=60)
+        worker.start()
+        time.sleep(0.2)
+        started = time.monotonic()
+        worker.stop(timeout=5)
+        self.assertLess(time.monotonic() - started, 2)
+        # The single worker went on to the next item while the first one waited for its retry
+        self.assertEqual((worker.processed, worker.failed), (1, 0))
+        self.assertFalse(worker.cursors.since_id('mentions'))
+
+        bot = FakeBot()
+        self.run_worker(bot, expected_calls=1)
+        self.assertEqual([call['in_reply_to_status_id'] for call in bot.calls], [1])
+
+    def test_rate_limited_items_wait_without_holding_a_worker(self):
+        self.twitter.mentions = [mention(1), mention(2), mention(3)]
+        bot = FakeBot()
+        # One response per 0.3 seconds, and no burst beyond the first
+        bot.rate_limiter = RateLimiter({'response': (1, 0.3)})
+        worker = self.run_worker(bot, expected_calls=3, num_workers=1)
+        self.assertEqual(worker.processed, 3)
+        self.assertTrue(all(call['rate_limit_reserved'] for call in bot.calls))
+        times = [call['time'] for call in bot.calls]
+        self.assertGreater(min(later - earlier for earlier, later in zip(times, times[1:])), 0.25)
+
+        # A slot far in the future does not hold up stopping; the item is left for the next run
+        self.twitter.mentions.append(mention(4))
+        bot.rate_limiter = RateLimiter({'response': (1, 60)})
+        bot.rate_limiter.reserve('response')
+        worker = MentionWorker(bot, twitter=self.twitter, num_workers=1, poll_interval=0.05, state_path=self.state_path)
+        worker.start()
+        time.sleep(0.3)
+        started = time.monotonic()
+        worker.stop(timeout=5)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(len(bot.calls), 3)
+        self.assertEqual(worker.cursors.since_id('mentions'), 3)
+
+    def test_stop_leaves_unstarted_items_for_the_next_run(self):
+        self.twitter.mentions = [mention(i) for i in range(1, 11)]
+        bot = FakeBot(delay=0.3)
+        worker = MentionWorker(bot, twitter=self.twitter, num_workers=1, poll_interval=0.05, state_path=self.state_path)
+        worker.start()
+        time.sleep(0.1)
+        worker.stop(timeout=5)
+        handled = {call['in_reply_to_status_id'] for call in bot.calls}
+        self.assertLess(len(handled), 10)
+
+        bot = FakeBot()
+        self.run_worker(bot, expected_calls=10 - len(handled))
+        resumed = {call['in_reply_to_status_id'] for call in bot.calls}
+        self.assertEqual(handled | resumed, set(range(1, 11)))
+        self.assertFalse(handled & resumed)
+
+if __name__ == '__main__':
+    unittest.main()
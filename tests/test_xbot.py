@@ -1,12 +1,31 @@
 # tests/test_xbot.py
 
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 from bots.xbot import XBot
+from utils.config import Config
 
 class TestXBot(unittest.TestCase):
     def setUp(self):
+        # The database, embedding cache and rate-limit state are written to a scratch directory
+        self.tmp_dir = tempfile.mkdtemp()
+        environment = {
+            'DB_PATH': os.path.join(self.tmp_dir, 'lancedb'),
+            'EMBEDDING_CACHE_PATH': os.path.join(self.tmp_dir, 'embedding_cache.sqlite'),
+            'RATE_LIMIT_STATE_PATH': os.path.join(self.tmp_dir, 'rate_limits.sqlite'),
+        }
+        for patcher in (mock.patch.dict(os.environ, environment), mock.patch.object(Config, '_instance', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
         self.bot = XBot(config_path='config/xbot_character.json', table_name='test_xbot_data')
 
+    def tearDown(self):
+        self.bot.close()
+        shutil.rmtree(self.tmp_dir)
+
     def test_ingest_data(self):
         try:
             self.bot.ingest_data()
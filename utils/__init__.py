@@ -1,18 +1,35 @@
 # utils/__init__.py
 
-from .config import Config
-from .lance_db_utils import LanceDBUtils, LocalEmbeddings
-from .logger_config import setup_logging
-from .memory import Memory
-from .openai_utils import OpenAILLM
-from .twitter_utils import TwitterAPI
+import importlib
+from typing import Any
 
-__all__ = [
-    "Config",
-    "LanceDBUtils",
-    "LocalEmbeddings",
-    "setup_logging",
-    "Memory",
-    "OpenAILLM",
-    "TwitterAPI"
-]
+# Public names and the submodules defining them; submodules are imported on first access so that
+# importing one utility does not pull in the heavy dependencies of all the others
+_EXPORTS = {
+    "Config": ".config",
+    "EmbeddingBatcher": ".embedding_batcher",
+    "EmbeddingCache": ".embedding_cache",
+    "ONNXBackend": ".embedding_backends",
+    "SentenceTransformerBackend": ".embedding_backends",
+    "HTTPTransport": ".http_transport",
+    "IncrementalIngestor": ".ingestion",
+    "LanceDBUtils": ".lance_db_utils",
+    "LocalEmbeddings": ".lance_db_utils",
+    "setup_logging": ".logger_config",
+    "Memory": ".memory",
+    "MemoryCompactor": ".memory_compactor",
+    "OpenAILLM": ".openai_utils",
+    "RateLimiter": ".rate_limiter",
+    "SystemPromptCache": ".system_prompt",
+    "TwitterAPI": ".twitter_utils",
+    "ConcurrentURLLoader": ".url_loader"
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -7,6 +7,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Environment variables each component needs; a process only validates the components it uses
+REQUIRED_ENV_VARS = {
+    'openai': ['OPENAI_API_KEY'],
+    'twitter': ['TWITTER_API_KEY', 'TWITTER_API_SECRET_KEY', 'TWITTER_ACCESS_TOKEN', 'TWITTER_ACCESS_TOKEN_SECRET'],
+}
+
 class Config:
     _instance = None
 
@@ -18,10 +24,10 @@ class Config:
 
     def __init_config(self):
         load_dotenv()
-        self._validate_env_vars()
 
         # OpenAI
         self.openai_api_key: str = os.getenv('OPENAI_API_KEY')
+        self.openai_api_base: str = os.getenv('OPENAI_API_BASE', '')
 
         # Twitter
         self.twitter_api_key: str = os.getenv('TWITTER_API_KEY')
@@ -29,26 +35,57 @@ class Config:
         self.twitter_access_token: str = os.getenv('TWITTER_ACCESS_TOKEN')
         self.twitter_access_token_secret: str = os.getenv('TWITTER_ACCESS_TOKEN_SECRET')
 
+        # HTTP connection pools shared by the OpenAI and Twitter clients
+        self.http_pool_connections: int = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+        self.http_pool_maxsize: int = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+        self.http_connect_timeout: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+        self.http_read_timeout: float = float(os.getenv('HTTP_READ_TIMEOUT', '60'))
+
         # Database
         self.db_path: str = os.getenv('DB_PATH', 'my_lancedb')
 
+        # Vector index (IVF-PQ) settings for the corpus table
+        self.index_min_rows: int = int(os.getenv('INDEX_MIN_ROWS', '10000'))
+        self.index_rebuild_fraction: float = float(os.getenv('INDEX_REBUILD_FRACTION', '0.2'))
+        self.index_nprobes: int = int(os.getenv('INDEX_NPROBES', '20'))
+        self.index_refine_factor: int = int(os.getenv('INDEX_REFINE_FACTOR', '0'))
+        self.index_check_ttl: float = float(os.getenv('INDEX_CHECK_TTL', '60'))
+
         # Model configs
         self.embedding_model: str = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+
+        # Embedding backend: 'sentence-transformers' (PyTorch) or 'onnx' (ONNX Runtime, exported on first use)
+        self.embedding_backend: str = os.getenv('EMBEDDING_BACKEND', 'sentence-transformers')
+        self.embedding_onnx_cache_dir: str = os.getenv('EMBEDDING_ONNX_CACHE_DIR', 'onnx_models')
+        self.embedding_quantize: bool = os.getenv('EMBEDDING_QUANTIZE', 'true').lower() in ('1', 'true', 'yes')
+        self.embedding_threads: int = int(os.getenv('EMBEDDING_THREADS', '0'))
+
+        # Micro-batching of concurrent embedding requests (set EMBEDDING_BATCH_WAIT_MS to 0 to embed each request on its own)
+        self.embedding_batch_wait_ms: float = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '2'))
+        self.embedding_batch_size: int = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+
+        # Embedding cache, kept next to the database by default (set EMBEDDING_CACHE_PATH to an empty
+        # value to keep the cache in memory only)
+        self.embedding_cache_path: str = os.getenv('EMBEDDING_CACHE_PATH', os.path.join(self.db_path, 'embedding_cache.sqlite'))
+        self.embedding_cache_size: int = int(os.getenv('EMBEDDING_CACHE_SIZE', '10000'))
+
+        # Rate-limit state shared by all bot processes, kept next to the database by default (set to an
+        # empty value to keep it per process)
+        self.rate_limit_state_path: str = os.getenv('RATE_LIMIT_STATE_PATH', os.path.join(self.db_path, 'rate_limits.sqlite'))
         self.llm_model: str = os.getenv('LLM_MODEL', 'gpt-4')  # Updated to GPT-4
 
         # Character configuration
         self.character_config_path: str = os.getenv('CHARACTER_CONFIG_PATH', 'config/xbot_character.json')
 
-    def _validate_env_vars(self) -> None:
-        required_vars = [
-            'OPENAI_API_KEY',
-            'TWITTER_API_KEY',
-            'TWITTER_API_SECRET_KEY',
-            'TWITTER_ACCESS_TOKEN',
-            'TWITTER_ACCESS_TOKEN_SECRET',
-            'CHARACTER_CONFIG_PATH'
-        ]
+    def require(self, *components: str) -> None:
+        """
+        Check that the environment variables needed by some components are set.
 
+        :param components: Component names in REQUIRED_ENV_VARS; all of them if none are given.
+        :raises EnvironmentError: If any of the variables is missing.
+        """
+        names = components or tuple(REQUIRED_ENV_VARS)
+        required_vars = [var for name in names for var in REQUIRED_ENV_VARS[name]]
         missing_vars = [var for var in required_vars if not os.getenv(var)]
         if missing_vars:
             raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}. Please set them in the .env file.")
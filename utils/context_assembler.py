@@ -0,0 +1,141 @@
+# utils/context_assembler.py
+
+import logging
+import re
+from typing import Dict, List, Optional
+from utils.tokenizer import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Tokens the chat format adds around every message and once to prime the reply
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+class ContextAssembler:
+    def __init__(self, model: str = 'gpt-4', max_prompt_tokens: int = 2048, context_share: float = 0.6,
+                 min_chunk_tokens: int = 32):
+        """
+        Initialize an assembler that packs a prompt into a fixed token budget.
+
+        Parts are added by priority: the persona prompt and the user query always go in (the
+        query is truncated if it alone would overflow), then retrieved chunks in rank order up
+        to ``context_share`` of what is left, then conversation turns from newest to oldest,
+        and finally more chunks if budget remains. Duplicate chunks are dropped, and the last
+        chunk that fits is truncated rather than skipped when enough room is left for it.
+
+        :param model: Model whose tokenizer measures the parts.
+        :param max_prompt_tokens: Token budget of the whole prompt.
+        :param context_share: Share of the free budget reserved for retrieved chunks before history.
+        :param min_chunk_tokens: Smallest truncated chunk worth including.
+        """
+        self.model = model
+        self.max_prompt_tokens = max_prompt_tokens
+        self.context_share = min(1.0, max(0.0, context_share))
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def _tokens(self, text: str) -> int:
+        return count_tokens(text, self.model) + MESSAGE_OVERHEAD_TOKENS
+
+    def dedupe(self, chunks: List[str]) -> List[str]:
+        """
+        Drop empty chunks, repeats and chunks contained in a higher-ranked one.
+
+        :param chunks: Retrieved chunks in rank order.
+        :return: Unique chunks in rank order.
+        """
+        unique: List[str] = []
+        seen: List[str] = []
+        for chunk in chunks:
+            normalized = _normalize(chunk)
+            if not normalized or any(normalized in kept for kept in seen):
+                continue
+            unique.append(chunk)
+            seen.append(normalized)
+        return unique
+
+    def _pack_chunks(self, chunks: List[str], budget: int, selected: List[str], truncate: bool) -> int:
+        # Add chunks after those already selected, in rank order, until one does not fit
+        used = 0
+        for chunk in chunks[len(selected):]:
+            cost = count_tokens(chunk, self.model) + 1  # Newline separator
+            if used + cost <= budget:
+                selected.append(chunk)
+                used += cost
+                continue
+            room = budget - used - 1
+            if truncate and room >= self.min_chunk_tokens:
+                selected.append(truncate_to_tokens(chunk, room, self.model))
+                used = budget
+            break
+        return used
+
+    def assemble(self, system_prompt: str, user_query: str, chunks: Optional[List[str]] = None,
+                 turns: Optional[List[Dict[str, str]]] = None, system_prompt_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for a query within the token budget.
+
+        :param system_prompt: The persona system prompt.
+        :param user_query: The user's query string.
+        :param chunks: Retrieved chunks in rank order.
+        :param turns: Recent interactions (user_query, bot_response), oldest first; a turn with
+            kind 'summary' carries the summary of earlier interactions instead.
+        :param system_prompt_tokens: Precomputed token count of the system prompt.
+        :return: Chat messages: persona, retrieved context, history turns, then the query.
+        """
+        if system_prompt_tokens is None:
+            system_prompt_tokens = count_tokens(system_prompt, self.model)
+        free = self.max_prompt_tokens - REPLY_PRIMING_TOKENS - system_prompt_tokens - MESSAGE_OVERHEAD_TOKENS
+
+        query_tokens = self._tokens(user_query)
+        if query_tokens > free:
+            if free > MESSAGE_OVERHEAD_TOKENS:
+                user_query = truncate_to_tokens(user_query, free - MESSAGE_OVERHEAD_TOKENS, self.model)
+                query_tokens = self._tokens(user_query)
+            else:
+                logger.warning(f"System prompt ({system_prompt_tokens} tokens) leaves no room in the {self.max_prompt_tokens}-token budget.")
+        free = max(0, free - query_tokens)
+
+        header = "Relevant information:\n"
+        chunks = self.dedupe(chunks or [])
+        context_budget = free - self._tokens(header) if chunks else 0
+        selected: List[str] = []
+        used = self._pack_chunks(chunks, int(context_budget * self.context_share), selected, truncate=False)
+
+        history_budget = max(0, context_budget - used) if chunks else free
+        history: List[Dict[str, str]] = []
+        for turn in reversed(turns or []):
+            if turn.get('kind') == 'summary':
+                pair = [{"role": "system", "content": f"Summary of earlier conversation: {turn['summary']}"}]
+            else:
+                pair = [
+                    {"role": "user", "content": turn['user_query']},
+                    {"role": "assistant", "content": turn['bot_response']}
+                ]
+            cost = sum(self._tokens(message['content']) for message in pair)
+            if cost > history_budget:
+                break
+            history[:0] = pair
+            history_budget -= cost
+
+        if chunks and len(selected) < len(chunks):
+            self._pack_chunks(chunks, history_budget, selected, truncate=True)
+
+        messages = [{"role": "system", "content": system_prompt}]
+        if selected:
+            messages.append({"role": "system", "content": header + '\n'.join(selected)})
+        messages.extend(history)
+        messages.append({"role": "user", "content": user_query})
+        logger.debug(f"Assembled prompt with {len(selected)}/{len(chunks)} chunks and {len(history) // 2}/{len(turns or [])} turns.")
+        return messages
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Count the prompt tokens of chat messages.
+
+        :param messages: Chat messages.
+        :return: Number of prompt tokens, including the chat format overhead.
+        """
+        return sum(self._tokens(message['content']) for message in messages) + REPLY_PRIMING_TOKENS
@@ -0,0 +1,255 @@
+# utils/embedding_backends.py
+
+import json
+import logging
+import os
+import re
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from utils.lazy_import import lazy_import
+
+onnxruntime = lazy_import('onnxruntime')
+sentence_transformers = lazy_import('sentence_transformers')
+tokenizers = lazy_import('tokenizers')
+
+logger = logging.getLogger(__name__)
+
+# Inputs a transformer encoder may take, in the order of its forward() arguments
+ENCODER_INPUTS = ['input_ids', 'attention_mask', 'token_type_ids']
+
+class SentenceTransformerBackend:
+    def __init__(self, model_name: str, batch_size: int = 32):
+        """
+        Initialize the PyTorch sentence-transformers backend, which loads the model on first use.
+
+        :param model_name: Name of the sentence-transformers model.
+        :param batch_size: Number of texts encoded per forward pass.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        # Vectors of this backend are the reference, so they are cached under the plain model name
+        self.cache_key = model_name
+        self._model: Optional[Any] = None
+        self._lock = Lock()
+
+    @property
+    def model(self) -> Any:
+        """
+        Return the sentence-transformers model, loading it on first use.
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    try:
+                        self._model = sentence_transformers.SentenceTransformer(self.model_name, device='cpu')
+                        logger.info(f"Loaded embedding model: {self.model_name}")
+                    except Exception as e:
+                        logger.error(f"Failed to load embedding model '{self.model_name}': {e}")
+                        raise
+        return self._model
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a list of texts.
+
+        :param texts: List of text strings.
+        :return: Array of shape (len(texts), dimension).
+        """
+        return self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+
+class ONNXBackend:
+    def __init__(self, model_name: str, cache_dir: str = 'onnx_models', quantize: bool = True,
+                 num_threads: int = 0, batch_size: int = 32):
+        """
+        Initialize the ONNX Runtime backend, which exports and loads the model on first use.
+
+        The first use of a model exports its transformer to ONNX (with torch and transformers,
+        the dependencies of sentence-transformers) and, if ``quantize`` is set, writes an int8
+        copy with dynamically quantized weights. Both files, the tokenizer and the pooling
+        settings are cached in ``cache_dir``, so later processes only need onnxruntime and
+        tokenizers. Pooling and normalization follow the sentence-transformers model, so vectors
+        stay comparable with those of the PyTorch backend.
+
+        :param model_name: Name of the sentence-transformers model.
+        :param cache_dir: Directory holding the exported models, one subdirectory per model.
+        :param quantize: Whether to run the int8 model rather than the float32 one.
+        :param num_threads: Threads used by ONNX Runtime for one batch (0 lets it decide).
+        :param batch_size: Number of texts encoded per session run.
+        """
+        self.model_name = model_name
+        self.model_dir = os.path.join(cache_dir, re.sub(r'[^0-9a-zA-Z._-]+', '__', model_name))
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.cache_key = f"{model_name}#onnx-int8" if quantize else f"{model_name}#onnx"
+        self._session: Optional[Any] = None
+        self._tokenizer: Optional[Any] = None
+        self._settings: Dict[str, Any] = {}
+        self._lock = Lock()
+
+    @property
+    def model_path(self) -> str:
+        """
+        Return the path of the ONNX model this backend runs.
+        """
+        return os.path.join(self.model_dir, 'model.int8.onnx' if self.quantize else 'model.onnx')
+
+    def _export(self) -> None:
+        """
+        Export the transformer of the sentence-transformers model to ONNX, with its tokenizer
+        and pooling settings.
+
+        The settings file is written last, so its presence marks a complete export.
+        """
+        import torch
+
+        model = sentence_transformers.SentenceTransformer(self.model_name, device='cpu')
+        transformer = model[0]
+        pooling = next((module for module in model if isinstance(module, sentence_transformers.models.Pooling)), None)
+        pooling_mode = pooling.get_pooling_mode_str() if pooling is not None else 'mean'
+        if pooling_mode not in ('mean', 'cls'):
+            raise ValueError(f"Pooling mode '{pooling_mode}' of '{self.model_name}' is not supported by the ONNX backend.")
+
+        os.makedirs(self.model_dir, exist_ok=True)
+        transformer.tokenizer.save_pretrained(self.model_dir)
+        sample = transformer.tokenizer(['Exporting the embedding model.'], return_tensors='pt')
+        input_names = [name for name in ENCODER_INPUTS if name in sample]
+        partial_path = os.path.join(self.model_dir, 'model.onnx.partial')
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer.auto_model.eval(),
+                tuple(sample[name] for name in input_names),
+                partial_path,
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes={name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']},
+                opset_version=14,
+                do_constant_folding=True
+            )
+        os.replace(partial_path, os.path.join(self.model_dir, 'model.onnx'))
+
+        settings = {
+            'model_name': self.model_name,
+            'max_seq_length': model.max_seq_length,
+            'pad_token': transformer.tokenizer.pad_token,
+            'pooling': pooling_mode,
+            'normalize': any(isinstance(module, sentence_transformers.models.Normalize) for module in model),
+        }
+        with open(os.path.join(self.model_dir, 'settings.json'), 'w') as file:
+            json.dump(settings, file)
+        logger.info(f"Exported embedding model '{self.model_name}' to ONNX in {self.model_dir}.")
+
+    def _quantize(self) -> None:
+        """
+        Write the int8 copy of the exported model, quantizing the weights of its matrix products.
+        """
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        partial_path = os.path.join(self.model_dir, 'model.int8.onnx.partial')
+        quantize_dynamic(os.path.join(self.model_dir, 'model.onnx'), partial_path, weight_type=QuantType.QInt8)
+        os.replace(partial_path, os.path.join(self.model_dir, 'model.int8.onnx'))
+        logger.info(f"Quantized embedding model '{self.model_name}' to int8.")
+
+    def _load(self) -> Tuple[Any, Any, Dict[str, Any]]:
+        """
+        Return the inference session, tokenizer and settings, exporting the model on first use.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    try:
+                        settings_path = os.path.join(self.model_dir, 'settings.json')
+                        if not os.path.exists(settings_path):
+                            self._export()
+                        if not os.path.exists(self.model_path):
+                            self._quantize()
+                        with open(settings_path, 'r') as file:
+                            settings = json.load(file)
+
+                        tokenizer = tokenizers.Tokenizer.from_file(os.path.join(self.model_dir, 'tokenizer.json'))
+                        tokenizer.enable_truncation(max_length=settings['max_seq_length'])
+                        tokenizer.enable_padding(pad_id=tokenizer.token_to_id(settings['pad_token']), pad_token=settings['pad_token'])
+
+                        options = onnxruntime.SessionOptions()
+                        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+                        options.intra_op_num_threads = self.num_threads
+                        options.inter_op_num_threads = 1
+                        session = onnxruntime.InferenceSession(self.model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+                        self._tokenizer, self._settings = tokenizer, settings
+                        self._session = session
+                        logger.info(f"Loaded ONNX embedding model: {self.model_path}")
+                    except Exception as e:
+                        logger.error(f"Failed to load ONNX embedding model '{self.model_name}': {e}")
+                        raise
+        return self._session, self._tokenizer, self._settings
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a list of texts.
+
+        Texts are batched by length, so short texts are not padded to the length of long ones.
+
+        :param texts: List of text strings.
+        :return: Float32 array of shape (len(texts), dimension).
+        """
+        session, tokenizer, settings = self._load()
+        input_names = {model_input.name for model_input in session.get_inputs()}
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        embeddings: Optional[np.ndarray] = None
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encodings = tokenizer.encode_batch([texts[index] for index in batch])
+            mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            feeds = {
+                'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                'attention_mask': mask,
+                'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+            }
+            hidden = session.run(['last_hidden_state'], {name: feeds[name] for name in input_names})[0]
+            pooled = pool(hidden, mask, settings['pooling'], settings['normalize'])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            embeddings[batch] = pooled
+        return embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32)
+
+def pool(hidden: np.ndarray, attention_mask: np.ndarray, mode: str = 'mean', normalize: bool = True) -> np.ndarray:
+    """
+    Reduce token embeddings to one vector per text, as the sentence-transformers Pooling and
+    Normalize modules do.
+
+    :param hidden: Token embeddings of shape (batch, sequence, dimension).
+    :param attention_mask: Mask of shape (batch, sequence), 0 for padding.
+    :param mode: 'mean' for the mean of the unmasked tokens, 'cls' for the first token.
+    :param normalize: Whether to scale the vectors to unit length.
+    :return: Float32 array of shape (batch, dimension).
+    """
+    if mode == 'cls':
+        pooled = hidden[:, 0]
+    else:
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled.astype(np.float32, copy=False)
+
+# Backends selectable by name (EMBEDDING_BACKEND)
+EMBEDDING_BACKENDS = {
+    'sentence-transformers': SentenceTransformerBackend,
+    'onnx': ONNXBackend,
+}
+
+def create_backend(name: str, model_name: str, **options: Any) -> Any:
+    """
+    Create an embedding backend by name.
+
+    :param name: A key of EMBEDDING_BACKENDS.
+    :param model_name: Name of the sentence-transformers model.
+    :param options: Keyword arguments of the backend's constructor.
+    :return: The backend, which loads its model on first use.
+    :raises ValueError: If the backend name is unknown.
+    """
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}'; expected one of: {', '.join(EMBEDDING_BACKENDS)}.")
+    return EMBEDDING_BACKENDS[name](model_name, **options)
@@ -0,0 +1,211 @@
+# utils/embedding_batcher.py
+
+import asyncio
+import bisect
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DELAY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 250]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+class Histogram:
+    def __init__(self, bounds: List[float]):
+        """
+        Initialize a histogram counting observations into fixed buckets.
+
+        :param bounds: Ascending upper bounds of the buckets; larger values fall in an overflow bucket.
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Record one observation.
+
+        :param value: The observed value.
+        """
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile as the upper bound of the bucket holding it.
+
+        :param q: Quantile between 0 and 1.
+        :return: The bucket bound (the largest observation for the overflow bucket), or 0 if empty.
+        """
+        with self._lock:
+            rank = q * self.count
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if count and seen >= rank:
+                    return self.bounds[index] if index < len(self.bounds) else self.max
+            return 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return the counts per bucket (keyed by upper bound) and summary statistics.
+        """
+        buckets = {f"le_{bound:g}": count for bound, count in zip(self.bounds + [float('inf')], self.counts)}
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 3),
+            'buckets': buckets
+        }
+
+class EmbeddingBatcher:
+    def __init__(self, embedding_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        """
+        Initialize an executor coalescing concurrent embedding requests into batched model calls.
+
+        Requests are queued to a single thread, which waits up to ``max_wait_ms`` after the
+        first queued request for others to join it (or until ``max_batch_size`` texts are
+        waiting), embeds all their texts in one call and resolves each request's future with
+        its rows. Under concurrent load this replaces many single-text forward passes with a few
+        batched ones. A request of ``max_batch_size`` texts or more is embedded right away in
+        the caller's thread.
+
+        The batcher is a drop-in embedding function: calling it blocks the calling thread until
+        the texts are embedded, and ``aembed`` awaits them without blocking the event loop.
+
+        :param embedding_fn: Embedding function run on each batch, e.g. LocalEmbeddings.
+        :param max_batch_size: Texts that end the wait for more requests.
+        :param max_wait_ms: Milliseconds the first request of a batch waits for others.
+        """
+        self.embedding_fn = embedding_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.queue_delay_ms = Histogram(QUEUE_DELAY_BUCKETS_MS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Queue texts for embedding.
+
+        :param texts: List of text strings.
+        :return: Future resolving to a float32 array with one embedding per text.
+        """
+        future: Future = Future()
+        if len(texts) < self.max_batch_size:
+            # Checked and queued under the lock close() takes, so no request lands behind its sentinel
+            with self._lock:
+                if not self._closed:
+                    if self._thread is None:
+                        self._thread = threading.Thread(target=self._run_loop, name='xbot-embedding-batcher', daemon=True)
+                        self._thread.start()
+                    self._queue.put({'texts': texts, 'future': future, 'enqueued': time.perf_counter()})
+                    return future
+        try:
+            future.set_result(self.embedding_fn(texts))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, batched with the requests of other threads.
+
+        :param texts: List of text strings.
+        :return: Float32 array with one embedding per text.
+        """
+        return self.submit(texts).result()
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, batched with other requests, without blocking the event loop.
+
+        :param texts: List of text strings.
+        :return: Float32 array with one embedding per text.
+        """
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _run_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            size = len(first['texts'])
+            deadline = first['enqueued'] + self.max_wait_ms / 1000
+            while size < self.max_batch_size:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                size += len(request['texts'])
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        Embed the texts of a batch of requests in one call and resolve their futures.
+        """
+        texts = [text for request in batch for text in request['texts']]
+        started = time.perf_counter()
+        for request in batch:
+            self.queue_delay_ms.observe((started - request['enqueued']) * 1000)
+        self.batch_size.observe(len(texts))
+        try:
+            vectors = self.embedding_fn(texts)
+        except Exception as e:
+            logger.error(f"Error embedding a batch of {len(texts)} texts from {len(batch)} requests: {e}")
+            for request in batch:
+                request['future'].set_exception(e)
+            return
+        offset = 0
+        for request in batch:
+            request['future'].set_result(vectors[offset:offset + len(request['texts'])])
+            offset += len(request['texts'])
+        logger.debug(f"Embedded {len(texts)} texts from {len(batch)} requests in one batch.")
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Embed the requests still queued and stop the batching thread; later requests are
+        embedded in the caller's thread.
+
+        :param timeout: Seconds to wait for the thread.
+        """
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the queue delay (in milliseconds) and batch size (in texts) histograms.
+        """
+        return {
+            'batches': self.batch_size.count,
+            'requests': self.queue_delay_ms.count,
+            'queue_delay_ms': self.queue_delay_ms.as_dict(),
+            'batch_size': self.batch_size.as_dict()
+        }
@@ -0,0 +1,176 @@
+# utils/embedding_cache.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int = 10000, db_path: Optional[str] = None):
+        """
+        Initialize a two-tier embedding cache.
+
+        Vectors are keyed by (model name, SHA-256 of the text). The first tier is an in-memory LRU;
+        the optional second tier is a SQLite file that survives restarts, so re-embedding an
+        unchanged corpus is served from disk.
+
+        :param max_entries: Maximum number of vectors held in the in-memory LRU.
+        :param db_path: Optional path of the SQLite file backing the persistent tier.
+        """
+        self.max_entries = max(0, max_entries)
+        self.db_path = db_path
+        self._lru: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "model TEXT NOT NULL, text_hash TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+                    "PRIMARY KEY (model, text_hash))"
+                )
+                self._conn.commit()
+                logger.info(f"Opened persistent embedding cache at {db_path}.")
+            except Exception as e:
+                logger.warning(f"Persistent embedding cache disabled, could not open '{db_path}': {e}")
+                self._conn = None
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """
+        Return the content hash used as the cache key for a text.
+
+        :param text: The text to hash.
+        :return: Hex-encoded SHA-256 digest.
+        """
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, model_name: str, text_hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up vectors for a batch of text hashes, consulting memory first and then disk.
+
+        :param model_name: Name of the embedding model.
+        :param text_hashes: Content hashes to look up.
+        :return: Mapping of text hash to vector for every hash that was found.
+        """
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        with self._lock:
+            for text_hash in text_hashes:
+                key = (model_name, text_hash)
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[text_hash] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.append(text_hash)
+
+        if missing and self._conn is not None:
+            from_disk = self._read_disk(model_name, missing)
+            with self._lock:
+                self.disk_hits += len(from_disk)
+                for text_hash, vector in from_disk.items():
+                    self._remember((model_name, text_hash), vector)
+            found.update(from_disk)
+
+        with self._lock:
+            self.misses += len(text_hashes) - len(found)
+        return found
+
+    def put_many(self, model_name: str, vectors: Dict[str, np.ndarray]) -> None:
+        """
+        Store freshly computed vectors in both tiers.
+
+        :param model_name: Name of the embedding model.
+        :param vectors: Mapping of text hash to vector.
+        """
+        if not vectors:
+            return
+        with self._lock:
+            for text_hash, vector in vectors.items():
+                # Own the row: a view would keep the caller's whole batch array alive in the LRU
+                self._remember((model_name, text_hash), vector.copy())
+        if self._conn is None:
+            return
+        rows = [
+            (model_name, text_hash, int(vector.shape[-1]), np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+            for text_hash, vector in vectors.items()
+        ]
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)", rows
+                )
+                self._conn.commit()
+        except Exception as e:
+            logger.warning(f"Failed to persist {len(rows)} embeddings: {e}")
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        if self.max_entries == 0:
+            return
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, model_name: str, text_hashes: List[str], chunk_size: int = 500) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        try:
+            for start in range(0, len(text_hashes), chunk_size):
+                chunk = text_hashes[start:start + chunk_size]
+                placeholders = ','.join('?' * len(chunk))
+                with self._lock:
+                    rows = self._conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model_name, *chunk]
+                    ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Failed to read embeddings from persistent cache: {e}")
+        return found
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return cache counters.
+
+        :return: Dictionary with hits per tier, misses, evictions, hit rate and current size.
+        """
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hit_rate,
+                'size': len(self._lru),
+            }
+
+    def close(self) -> None:
+        """
+        Close the persistent tier.
+        """
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,152 @@
+# utils/http_transport.py
+
+import asyncio
+import logging
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from utils.lazy_import import lazy_import
+
+aiohttp = lazy_import('aiohttp')
+
+logger = logging.getLogger(__name__)
+
+class PooledSession(requests.Session):
+    """
+    A requests session whose connection pool survives ``close()``.
+
+    Clients such as tweepy close their session after every request, which drops every
+    keep-alive connection; a shared session ignores that and is only torn down by ``shutdown``.
+    """
+
+    def close(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        super().close()
+
+class HTTPTransport:
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, max_retries: int = 2, keepalive_timeout: float = 30.0):
+        """
+        Initialize a transport of keep-alive connection pools shared by the OpenAI and Twitter clients.
+
+        Blocking requests go through one requests session with a pooled adapter per scheme, and
+        asynchronous requests through one aiohttp session per event loop, so TLS handshakes and
+        connection setup are paid once per host rather than once per request.
+
+        :param pool_connections: Number of hosts whose connection pools are kept.
+        :param pool_maxsize: Maximum number of kept-alive connections per host (and in total
+            for asynchronous requests).
+        :param connect_timeout: Seconds to wait for a connection to be established.
+        :param read_timeout: Seconds to wait for the server between bytes of a response.
+        :param max_retries: Retries of failed connection attempts (requests are never re-sent).
+        :param keepalive_timeout: Seconds an idle asynchronous connection is kept open.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.keepalive_timeout = keepalive_timeout
+        self._lock = Lock()
+        self._session: Optional[PooledSession] = None
+        self._aiohttp_sessions: Dict[asyncio.AbstractEventLoop, 'aiohttp.ClientSession'] = {}
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """
+        Return the (connect, read) timeout passed with every request.
+        """
+        return (self.connect_timeout, self.read_timeout)
+
+    @property
+    def session(self) -> PooledSession:
+        """
+        Return the shared requests session, creating it on first use.
+        """
+        with self._lock:
+            if self._session is None:
+                session = PooledSession()
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    max_retries=self.max_retries
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    async def aiohttp_session(self) -> 'aiohttp.ClientSession':
+        """
+        Return the aiohttp session of the running event loop, creating it on first use.
+
+        A session is bound to the loop it was created in, so each loop gets its own. The sessions
+        of loops that have since closed (for example after ``asyncio.run`` has finished) are
+        closed here, and close() closes the rest.
+
+        :return: The shared aiohttp session.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            stale = [other for other in self._aiohttp_sessions if other.is_closed()]
+            finished = [self._aiohttp_sessions.pop(other) for other in stale]
+            session = self._aiohttp_sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=self.pool_maxsize, keepalive_timeout=self.keepalive_timeout)
+                session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(connect=self.connect_timeout, sock_read=self.read_timeout)
+                )
+                self._aiohttp_sessions[loop] = session
+        for old_session in finished:
+            # Its loop has closed, so this only marks it closed and drops its connections
+            await old_session.close()
+        return session
+
+    def bind_openai(self) -> None:
+        """
+        Route the openai library's blocking requests in the calling thread through the shared session.
+
+        openai 0.27 has no public setting for its requests session and keeps one per thread, so
+        the shared session is installed in place of the calling thread's.
+        """
+        from openai import api_requestor
+        session = self.session
+        if getattr(api_requestor._thread_context, 'session', None) is not session:
+            api_requestor._thread_context.session = session
+
+    async def aclose(self) -> None:
+        """
+        Close the aiohttp session of the running event loop.
+        """
+        with self._lock:
+            session = self._aiohttp_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def close(self) -> None:
+        """
+        Close every pooled connection.
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.shutdown()
+                self._session = None
+            sessions: List[Tuple[asyncio.AbstractEventLoop, 'aiohttp.ClientSession']] = list(self._aiohttp_sessions.items())
+            self._aiohttp_sessions.clear()
+        for loop, session in sessions:
+            if session.closed:
+                continue
+            try:
+                if loop.is_running():
+                    # Owned by a loop in another thread: close it there
+                    asyncio.run_coroutine_threadsafe(session.close(), loop)
+                elif not loop.is_closed():
+                    loop.run_until_complete(session.close())
+                else:
+                    asyncio.run(session.close())
+            except Exception as e:
+                logger.debug(f"Could not close the aiohttp session: {e}")
@@ -0,0 +1,264 @@
+# utils/ingestion.py
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from utils.lance_db_utils import LanceDBUtils, quote_sql_literal
+from utils.lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+
+pa = lazy_import('pyarrow')
+
+logger = logging.getLogger(__name__)
+
+def content_hash(*parts: str) -> str:
+    """
+    Return the SHA-256 hex digest of the given text parts.
+
+    :param parts: Strings to hash; they are joined with a NUL separator.
+    :return: Hex-encoded digest.
+    """
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+class StageStats:
+    def __init__(self, name: str):
+        """
+        Initialize progress and throughput counters for one ingestion stage.
+
+        :param name: Name of the stage.
+        """
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def record(self, items: int, seconds: float) -> None:
+        """
+        Record work done by the stage.
+
+        :param items: Number of items the stage produced.
+        :param seconds: Time spent producing them.
+        """
+        self.items += items
+        self.seconds += seconds
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {'items': self.items, 'seconds': round(self.seconds, 3), 'per_second': round(self.throughput, 1)}
+
+class IncrementalIngestor:
+    def __init__(self, db_utils: LanceDBUtils, embedding_fn: Callable[[List[str]], List[List[float]]], table_name: str,
+                 chunk_size: int = 500, chunk_overlap: int = 50, batch_size: int = 256, delete_batch_size: int = 500):
+        """
+        Initialize content-addressed ingestion into a corpus table.
+
+        A manifest table (``<table_name>_sources``) records a content hash per source, and every
+        corpus row carries the hash of its chunk. On each run only sources whose content changed
+        are re-split and re-embedded; new chunks are inserted before stale ones are deleted, so
+        the live table stays queryable for the whole run.
+
+        Ingestion streams: documents are pulled from the loader one source at a time, and new
+        chunks are embedded and inserted in batches of ``batch_size``, so peak memory does not
+        grow with the size of the corpus.
+
+        :param db_utils: Instance of LanceDBUtils for database operations.
+        :param embedding_fn: Embedding function used for new chunks.
+        :param table_name: Name of the corpus table.
+        :param chunk_size: Chunk size passed to the text splitter.
+        :param chunk_overlap: Chunk overlap passed to the text splitter.
+        :param batch_size: Number of chunks embedded and inserted per batch.
+        :param delete_batch_size: Maximum number of chunk hashes per delete predicate.
+        """
+        self.db_utils = db_utils
+        self.embedding_fn = embedding_fn
+        self.table_name = table_name
+        self.manifest_table_name = f"{table_name}_sources"
+        self.batch_size = max(1, batch_size)
+        self.delete_batch_size = delete_batch_size
+        self.stages: Dict[str, StageStats] = {}
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def _migrate_legacy_table(self) -> None:
+        """
+        Convert, in place, a corpus table written by the old clear-and-reload ingestion, which has no chunk hashes.
+
+        Its rows get an empty chunk hash and their sources an empty hash in the manifest, so the
+        run re-indexes every source like a changed one: new chunks are inserted before the
+        legacy rows are deleted, and the table stays queryable throughout. Legacy sources no
+        longer configured are removed like any other. The old positional integer ids are
+        converted to strings, the type of the chunk hashes now used as ids.
+
+        Every step only changes columns, and the chunk hash column is added last, so a
+        migration interrupted at any point resumes on the next run.
+        """
+        table = self.db_utils.get_table(self.table_name)
+        if table is None or 'chunk_hash' in table.schema.names:
+            return
+        logger.info(f"Table '{self.table_name}' predates incremental ingestion; migrating it in place.")
+        sources = {row['source'] for row in self.db_utils.read_columns(self.table_name, ['source'])}
+        # The manifest goes first, so an interrupted migration is simply redone on the next run
+        self._update_manifest({source: '' for source in sources}, [])
+        schema = table.schema
+        if 'id' in schema.names and not pa.types.is_string(schema.field('id').type):
+            if 'legacy_id' not in schema.names:
+                table.add_columns({'legacy_id': 'CAST(id AS STRING)'})
+            table.drop_columns(['id'])
+        if 'id' not in table.schema.names:
+            if 'legacy_id' in table.schema.names:
+                table.alter_columns({'path': 'legacy_id', 'rename': 'id'})
+            else:
+                table.add_columns({'id': "''"})
+        table.add_columns({'chunk_hash': "''"})
+
+    def _load_manifest(self) -> Dict[str, str]:
+        rows = self.db_utils.read_columns(self.manifest_table_name, ['source', 'source_hash'])
+        return {row['source']: row['source_hash'] for row in rows}
+
+    def _existing_chunk_hashes(self, source: str) -> Set[str]:
+        rows = self.db_utils.read_columns(self.table_name, ['chunk_hash'], where=f"source = {quote_sql_literal(source)}")
+        return {row['chunk_hash'] for row in rows}
+
+    def _delete_chunks(self, source: str, chunk_hashes: Iterable[str]) -> None:
+        hashes = list(chunk_hashes)
+        for start in range(0, len(hashes), self.delete_batch_size):
+            batch = ', '.join(quote_sql_literal(chunk_hash) for chunk_hash in hashes[start:start + self.delete_batch_size])
+            self.db_utils.delete_where(
+                self.table_name, f"source = {quote_sql_literal(source)} AND chunk_hash IN ({batch})"
+            )
+
+    def _update_manifest(self, source_hashes: Dict[str, str], removed: Iterable[str]) -> None:
+        sources = list(source_hashes) + list(removed)
+        if not sources:
+            return
+        ingested_at = datetime.utcnow().isoformat(timespec='microseconds')
+        rows = [
+            {'source': source, 'source_hash': source_hash, 'ingested_at': ingested_at}
+            for source, source_hash in source_hashes.items()
+        ]
+        # Write the new entries before removing the old ones so a crash never loses a source's hash
+        self.db_utils.add_data(self.manifest_table_name, rows)
+        for start in range(0, len(sources), self.delete_batch_size):
+            batch = ', '.join(quote_sql_literal(source) for source in sources[start:start + self.delete_batch_size])
+            self.db_utils.delete_where(
+                self.manifest_table_name, f"source IN ({batch}) AND ingested_at < {quote_sql_literal(ingested_at)}"
+            )
+
+    def _timed(self, documents: Iterable['Document']) -> Iterator['Document']:
+        load = self.stages['load']
+        iterator = iter(documents)
+        while True:
+            started = time.perf_counter()
+            doc = next(iterator, None)
+            load.record(0 if doc is None else 1, time.perf_counter() - started)
+            if doc is None:
+                return
+            yield doc
+
+    def _sources(self, documents: Iterable['Document']) -> Iterator[Tuple[str, List['Document']]]:
+        """
+        Group consecutive documents by source, timing how long the loader takes to produce them.
+        """
+        current: Optional[str] = None
+        group: List['Document'] = []
+        for doc in self._timed(documents):
+            source = doc.metadata.get('source', 'unknown')
+            if group and source != current:
+                yield current, group
+                group = []
+            current = source
+            group.append(doc)
+        if group:
+            yield current, group
+
+    def _write_batch(self, rows: List[Dict[str, Any]], deferred_deletes: List[Tuple[str, Set[str]]]) -> None:
+        """
+        Embed and insert one batch of new chunks, then delete chunks they supersede.
+        """
+        if rows:
+            started = time.perf_counter()
+            embeddings = self.embedding_fn([row['text'] for row in rows])
+            self.stages['embed'].record(len(rows), time.perf_counter() - started)
+
+            started = time.perf_counter()
+            self.db_utils.add_data(self.table_name, rows, embeddings=embeddings)
+            self.stages['insert'].record(len(rows), time.perf_counter() - started)
+            logger.info(
+                f"Ingested {self.stages['insert'].items} chunks into '{self.table_name}' "
+                f"({self.stages['embed'].throughput:.1f} embeds/s, {self.stages['insert'].throughput:.1f} inserts/s)."
+            )
+        # Every source queued here has all of its new chunks in this batch or an earlier one
+        for source, stale in deferred_deletes:
+            self._delete_chunks(source, stale)
+        deferred_deletes.clear()
+
+    def ingest(self, urls: List[str], documents: Iterable['Document'], full_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Bring the corpus table in line with the given documents.
+
+        :param urls: The configured source URLs; indexed sources not in this list are removed.
+        :param documents: Loaded documents, consumed lazily; sources that failed to load are left untouched.
+        :param full_refresh: Re-split every source even if its content hash is unchanged.
+        :return: Counters describing what changed, with per-stage progress under 'stages'.
+        """
+        stats: Dict[str, Any] = {
+            'sources_unchanged': 0, 'sources_changed': 0, 'sources_removed': 0,
+            'chunks_added': 0, 'chunks_deleted': 0, 'chunks_kept': 0,
+        }
+        self.stages = {name: StageStats(name) for name in ('load', 'split', 'embed', 'insert')}
+        self._migrate_legacy_table()
+        manifest = self._load_manifest()
+
+        pending: List[Dict[str, Any]] = []
+        deferred_deletes: List[Tuple[str, Set[str]]] = []
+        changed_hashes: Dict[str, str] = {}
+        for source, docs in self._sources(documents):
+            source_hash = content_hash(*(doc.page_content for doc in docs))
+            if not full_refresh and manifest.get(source) == source_hash:
+                stats['sources_unchanged'] += 1
+                continue
+
+            started = time.perf_counter()
+            chunks: "OrderedDict[str, str]" = OrderedDict()
+            for chunk in self.text_splitter.split_documents(docs):
+                chunks.setdefault(content_hash(source, chunk.page_content), chunk.page_content)
+            self.stages['split'].record(len(chunks), time.perf_counter() - started)
+
+            existing = self._existing_chunk_hashes(source)
+            added = 0
+            for chunk_hash, text in chunks.items():
+                if chunk_hash in existing:
+                    continue
+                pending.append({'id': chunk_hash, 'text': text, 'source': source, 'chunk_hash': chunk_hash})
+                added += 1
+                if len(pending) >= self.batch_size:
+                    self._write_batch(pending, deferred_deletes)
+                    pending = []
+            stale = existing.difference(chunks)
+            deferred_deletes.append((source, stale))
+            changed_hashes[source] = source_hash
+
+            stats['sources_changed'] += 1
+            stats['chunks_added'] += added
+            stats['chunks_deleted'] += len(stale)
+            stats['chunks_kept'] += len(chunks) - added
+            logger.debug(f"Re-indexed '{source}': {added} added, {len(stale)} deleted.")
+        self._write_batch(pending, deferred_deletes)
+
+        configured = set(urls)
+        removed = [source for source in manifest if source not in configured]
+        for source in removed:
+            self.db_utils.delete_where(self.table_name, f"source = {quote_sql_literal(source)}")
+        stats['sources_removed'] = len(removed)
+
+        self._update_manifest(changed_hashes, removed)
+        stats['stages'] = {name: stage.as_dict() for name, stage in self.stages.items()}
+        logger.info(f"Incremental ingestion into '{self.table_name}' finished: {stats}")
+        return stats
@@ -1,93 +1,569 @@
 # utils/lance_db_utils.py
 
-import lancedb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, RLock
+from typing import List, Dict, Any, Callable, Optional, Set, Tuple, Union
 import logging
+import math
+import time
+import numpy as np
+from utils.embedding_backends import create_backend
+from utils.embedding_cache import EmbeddingCache
+from utils.lazy_import import lazy_import
+
+lancedb = lazy_import('lancedb')
+lancedb_index = lazy_import('lancedb.index')
+pa = lazy_import('pyarrow')
 
 logger = logging.getLogger(__name__)
 
+def quote_sql_literal(value: str) -> str:
+    """
+    Quote a string for use as a literal in a LanceDB SQL predicate.
+
+    :param value: The raw string value.
+    :return: The single-quoted, escaped literal.
+    """
+    return "'" + value.replace("'", "''") + "'"
+
+def as_embedding_array(vectors: Any) -> np.ndarray:
+    """
+    Return vectors as one C-contiguous float32 array, without copying if they already are.
+
+    :param vectors: A 2-D array, or a sequence of vectors (lists or 1-D arrays).
+    :return: Array with one row per vector.
+    """
+    array = np.ascontiguousarray(vectors, dtype=np.float32)
+    return array.reshape(0, 0) if array.ndim == 1 and not array.size else array
+
+def rows_to_arrow(rows: List[Dict[str, Any]], embeddings: Optional[Any] = None, column: str = 'embedding') -> Any:
+    """
+    Build an Arrow table from rows, with the embeddings as a float32 FixedSizeList column.
+
+    The buffer of a contiguous float32 array is handed to Arrow as is, so the vectors are
+    written without being copied or boxed into Python floats.
+
+    :param rows: Rows as dicts with the same keys.
+    :param embeddings: One vector per row; by default the rows' own ``column`` values, if any.
+    :param column: Name of the embedding column.
+    :return: A pyarrow Table.
+    """
+    names = list(rows[0])
+    if embeddings is None and column in rows[0]:
+        embeddings = [row[column] for row in rows]
+    if embeddings is not None and column not in names:
+        names.append(column)
+    columns = {}
+    for name in names:
+        if name == column and embeddings is not None:
+            array = as_embedding_array(embeddings)
+            columns[name] = pa.FixedSizeListArray.from_arrays(pa.array(array.reshape(-1)), array.shape[1])
+        else:
+            columns[name] = pa.array([row.get(name) for row in rows])
+    return pa.table(columns)
+
+def embedding_matrix(table: Any, column: str = 'embedding') -> np.ndarray:
+    """
+    View the embedding column of an Arrow table as a 2-D float32 array.
+
+    :param table: A pyarrow Table, e.g. a search result read with ``to_arrow()``.
+    :param column: Name of the embedding column.
+    :return: Array with one row per table row; a view of Arrow's buffer when the column is a
+        single float32 FixedSizeList chunk.
+    """
+    chunks = table.column(column).chunks
+    if not chunks:
+        return as_embedding_array([])
+    vectors = chunks[0] if len(chunks) == 1 else pa.concat_arrays(chunks)
+    values = vectors.flatten().to_numpy(zero_copy_only=False)
+    dimension = vectors.type.list_size if pa.types.is_fixed_size_list(vectors.type) else (len(values) // len(vectors) if len(vectors) else 0)
+    return as_embedding_array(values.reshape(len(vectors), dimension))
+
 class LanceDBUtils:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, index_min_rows: int = 10000, index_rebuild_fraction: float = 0.2,
+                 nprobes: int = 20, refine_factor: Optional[int] = None, search_workers: int = 8,
+                 index_check_ttl: float = 60.0):
         """
-        Initialize the LanceDB connection.
+        Initialize the LanceDB connection, which is opened on first use.
+
+        Open table handles are cached per table name, so several query workers and a background
+        ingester can share one connection without reopening tables. Registry access is guarded by
+        a lock and writes are serialized per table.
+
+        Vector search on a table is brute force until ensure_index() builds an IVF-PQ index, which
+        it does once the table holds ``index_min_rows`` rows, and again after writes have changed
+        ``index_rebuild_fraction`` of the indexed rows.
 
         :param db_path: The directory path where the database is stored.
+        :param index_min_rows: Row count at which a table gets an ANN index.
+        :param index_rebuild_fraction: Fraction of changed rows that triggers an index rebuild.
+        :param nprobes: Default number of IVF partitions probed per indexed query.
+        :param refine_factor: Default refine factor for indexed queries (None disables re-ranking).
+        :param search_workers: Number of threads running the searches of a batched retrieval.
+        :param index_check_ttl: Seconds a table found without an index is trusted to still lack
+            one; after that the next search lists its indices again, picking up an index built by
+            another process.
         """
-        try:
-            self.db = lancedb.connect(db_path)
-            logger.info(f"Connected to LanceDB at {db_path}.")
-            self.table = None
-        except Exception as e:
-            logger.error(f"Failed to connect to LanceDB at {db_path}: {e}")
-            raise
+        self.db_path = db_path
+        self._db: Optional[Any] = None
+        self._connect_lock = Lock()
+        self._tables: Dict[str, Any] = {}
+        self._table_names: Optional[Set[str]] = None
+        self._registry_lock = RLock()
+        self._write_locks: Dict[str, Lock] = {}
+        self.index_min_rows = index_min_rows
+        self.index_rebuild_fraction = index_rebuild_fraction
+        self.nprobes = nprobes
+        self.refine_factor = refine_factor
+        self._index_state: Dict[str, Dict[str, int]] = {}
+        self.index_check_ttl = index_check_ttl
+        # Table name -> monotonic time at which it was last found without an index
+        self._unindexed: Dict[str, float] = {}
+        self._scalar_index_state: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._scalar_index_failed: Set[Tuple[str, str]] = set()
+        self.search_workers = max(1, search_workers)
+        self._search_pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def db(self) -> Any:
+        """
+        Return the LanceDB connection, connecting on first use.
+        """
+        if self._db is None:
+            with self._connect_lock:
+                if self._db is None:
+                    try:
+                        self._db = lancedb.connect(self.db_path)
+                        logger.info(f"Connected to LanceDB at {self.db_path}.")
+                    except Exception as e:
+                        logger.error(f"Failed to connect to LanceDB at {self.db_path}: {e}")
+                        raise
+        return self._db
+
+    def _known_table_names(self, refresh: bool = False) -> Set[str]:
+        """
+        Return the table names in the database, listing them only once per connection.
+
+        :param refresh: Whether to list them again, picking up tables created by other processes.
+        """
+        if self._table_names is None or refresh:
+            names: Set[str] = set()
+            page_token = None
+            while True:
+                page = self.db.list_tables(page_token=page_token)
+                names.update(page.tables)
+                page_token = page.page_token
+                if not page_token:
+                    break
+            self._table_names = names
+        return self._table_names
+
+    def _write_lock(self, table_name: str) -> Lock:
+        with self._registry_lock:
+            return self._write_locks.setdefault(table_name, Lock())
+
+    def get_table(self, table_name: str) -> Optional[Any]:
+        """
+        Return the cached handle for a table, opening it on first use.
 
-    def create_table(self, table_name: str) -> Any:
+        A table missing from the cached table list is looked up again before it is reported
+        missing, so tables created by another process are found.
+
+        :param table_name: Name of the table.
+        :return: The table object, or None if the table does not exist yet.
+        """
+        table = self._tables.get(table_name)
+        if table is not None:
+            return table
+        with self._registry_lock:
+            table = self._tables.get(table_name)
+            if table is None and (table_name in self._known_table_names() or table_name in self._known_table_names(refresh=True)):
+                table = self.db.open_table(table_name)
+                self._tables[table_name] = table
+                logger.info(f"Opened existing table: {table_name}")
+            return table
+
+    def create_table(self, table_name: str, data: Optional[Any] = None, schema: Optional[Any] = None) -> Optional[Any]:
         """
         Create a new table in the database or open it if it already exists.
 
+        LanceDB needs either data or a schema to create a table. Without either, a missing table
+        is created by the first add_data() call instead.
+
         :param table_name: Name of the table to create or open.
-        :return: The table object.
+        :param data: Optional initial rows (list of dicts or Arrow table) for a new table.
+        :param schema: Optional schema for a new table.
+        :return: The table object, or None if creation is deferred to the first write.
         """
         try:
-            if table_name not in self.db.table_names():
-                self.table = self.db.create_table(table_name)
-                logger.info(f"Created new table: {table_name}")
-            else:
-                self.table = self.db.open_table(table_name)
-                logger.info(f"Opened existing table: {table_name}")
-            return self.table
+            table = self.get_table(table_name)
+            if table is not None or (data is None and schema is None):
+                return table
+            with self._registry_lock:
+                table = self._tables.get(table_name)
+                if table is None:
+                    table = self.db.create_table(table_name, data=data, schema=schema)
+                    self._tables[table_name] = table
+                    self._known_table_names().add(table_name)
+                    logger.info(f"Created new table: {table_name}")
+            return table
         except Exception as e:
             logger.error(f"Error creating or opening table '{table_name}': {e}")
             raise
 
+    def drop_table(self, table_name: str) -> None:
+        """
+        Drop a table and forget its cached handle.
+
+        :param table_name: Name of the table to drop.
+        """
+        with self._registry_lock:
+            if table_name not in self._known_table_names() and table_name not in self._known_table_names(refresh=True):
+                return
+            self.db.drop_table(table_name)
+            self._tables.pop(table_name, None)
+            self._unindexed.pop(table_name, None)
+            self._known_table_names().discard(table_name)
+            logger.info(f"Dropped table: {table_name}")
+
+    def read_columns(self, table_name: str, columns: List[str], where: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Read selected columns of a table without loading the rest (in particular the embeddings).
+
+        :param table_name: Name of the table to read.
+        :param columns: Columns to project.
+        :param where: Optional SQL filter.
+        :return: List of rows as dicts, or an empty list if the table does not exist.
+        """
+        table = self.get_table(table_name)
+        if table is None:
+            return []
+        return table.to_lance().to_table(columns=columns, filter=where).to_pylist()
+
     def clear_table(self, table_name: str) -> None:
         """
         Clear all data from the specified table.
 
         :param table_name: Name of the table to clear.
         """
+        self.delete_where(table_name, 'true')
+
+    def delete_where(self, table_name: str, predicate: str) -> None:
+        """
+        Delete the rows of a table that match a SQL predicate.
+
+        :param table_name: Name of the table.
+        :param predicate: SQL filter selecting the rows to delete.
+        """
+        table = self.get_table(table_name)
+        if table is None:
+            return
         try:
-            table = self.create_table(table_name)
-            table.delete()  # Assuming LanceDB has a delete method to clear table data
-            logger.debug(f"Cleared all data from table '{table_name}'.")
+            with self._write_lock(table_name):
+                if table_name in self._index_state or any(key[0] == table_name for key in self._scalar_index_state):
+                    rows_before = table.count_rows()
+                    table.delete(predicate)
+                    self._note_changes(table_name, rows_before - table.count_rows())
+                else:
+                    table.delete(predicate)
+            logger.debug(f"Deleted rows matching '{predicate}' from table '{table_name}'.")
         except Exception as e:
-            logger.warning(f"Could not clear table '{table_name}' data: {e}")
+            logger.warning(f"Could not delete rows from table '{table_name}': {e}")
 
-    def add_data(self, data: List[Dict[str, Any]], embedding_fn: Optional[Callable[[List[str]], List[List[float]]]] = None) -> None:
+    def add_data(self, table_name: str, data: List[Dict[str, Any]], embedding_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 embeddings: Optional[np.ndarray] = None) -> None:
         """
-        Add data to the table.
+        Add data to a table, creating the table on the first write if needed.
 
+        The rows are written as one Arrow table whose embedding column wraps the float32 array
+        of the embeddings, rather than as per-row lists of Python floats.
+
+        :param table_name: Name of the table to write to.
         :param data: Data to add (list of dicts).
         :param embedding_fn: Optional embedding function to generate embeddings.
+        :param embeddings: Optional embeddings of the rows, one per row, in place of an
+            ``embedding`` value in each row.
         """
-        if not self.table:
-            raise ValueError("Table is not initialized. Call create_table() first.")
+        if not data:
+            return
         try:
             if embedding_fn:
-                texts = [item['text'] for item in data]
-                embeddings = embedding_fn(texts)
-                for item, embedding in zip(data, embeddings):
-                    item['embedding'] = embedding
-            self.table.insert(data)
-            logger.debug("Added data to table.")
+                embeddings = embedding_fn([item['text'] for item in data])
+            batch = rows_to_arrow(data, embeddings)
+            with self._write_lock(table_name):
+                table = self.get_table(table_name)
+                if table is None:
+                    self.create_table(table_name, data=batch)
+                else:
+                    table.add(batch)
+                self._note_changes(table_name, len(data))
+            logger.debug(f"Added {len(data)} rows to table '{table_name}'.")
         except Exception as e:
-            logger.error(f"Failed to add data to table: {e}")
+            logger.error(f"Failed to add data to table '{table_name}': {e}")
             raise
 
-    def retrieve_relevant_info(self, query_text: str, embedding_fn: Callable[[List[str]], List[List[float]]], top_k: int = 5) -> List[str]:
+    def _note_changes(self, table_name: str, rows: int) -> None:
+        state = self._index_state.get(table_name)
+        if state is not None:
+            state['changed_rows'] += rows
+        for (indexed_table, _), scalar_state in self._scalar_index_state.items():
+            if indexed_table == table_name:
+                scalar_state['changed_rows'] += rows
+
+    @staticmethod
+    def indexed_columns(table: Any) -> List[List[str]]:
+        """
+        Return the columns covered by each index of a table.
+
+        :param table: LanceDB table.
+        :return: One list of column names per index.
+        """
+        return [list(index.columns) for index in table.list_indices()]
+
+    def has_index(self, table_name: str, column: str = 'embedding') -> bool:
+        """
+        Check whether a table has a vector index on the given column.
+
+        :param table_name: Name of the table.
+        :param column: Vector column name.
+        :return: True if an index covers the column.
+        """
+        if table_name in self._index_state:
+            return True
+        checked_at = self._unindexed.get(table_name)
+        if checked_at is not None and time.monotonic() - checked_at < self.index_check_ttl:
+            return False
+        table = self.get_table(table_name)
+        if table is None:
+            return False
+        try:
+            if checked_at is not None:
+                # The cached handle only sees the version it opened; move it to the latest one
+                table.checkout_latest()
+            indexed = self.indexed_columns(table)
+        except Exception as e:
+            logger.debug(f"Could not list indices of table '{table_name}': {e}")
+            return False
+        if any(column in columns for columns in indexed):
+            # An index built by an earlier process: treat the current contents as indexed
+            self._index_state[table_name] = {'indexed_rows': table.count_rows(), 'changed_rows': 0}
+            return True
+        self._unindexed[table_name] = time.monotonic()
+        return False
+
+    def build_index(self, table_name: str, num_partitions: Optional[int] = None, num_sub_vectors: Optional[int] = None,
+                    metric: str = 'L2', column: str = 'embedding') -> None:
+        """
+        Build (or replace) an IVF-PQ index on a table's vector column.
+
+        :param table_name: Name of the table.
+        :param num_partitions: Number of IVF partitions; defaults to roughly sqrt(rows).
+        :param num_sub_vectors: Number of PQ sub-vectors; defaults to the largest divisor of the
+            dimension that keeps at least 4 dimensions per sub-vector (at most 96).
+        :param metric: Distance metric of the index.
+        :param column: Vector column name.
+        """
+        table = self.get_table(table_name)
+        if table is None:
+            raise ValueError(f"Table '{table_name}' does not exist.")
+        with self._write_lock(table_name):
+            rows = table.count_rows()
+            dimension = table.schema.field(column).type.list_size
+            if num_partitions is None:
+                num_partitions = max(1, min(4096, int(math.sqrt(rows))))
+            if num_sub_vectors is None:
+                num_sub_vectors = next(n for n in range(min(96, max(1, dimension // 4)), 0, -1) if dimension % n == 0)
+            started = time.perf_counter()
+            table.create_index(
+                column,
+                config=lancedb_index.IvfPq(distance_type=metric.lower(), num_partitions=num_partitions, num_sub_vectors=num_sub_vectors),
+                replace=True
+            )
+            self._index_state[table_name] = {'indexed_rows': rows, 'changed_rows': 0}
+            self._unindexed.pop(table_name, None)
+        logger.info(
+            f"Built IVF-PQ index on '{table_name}' ({rows} rows, {num_partitions} partitions, "
+            f"{num_sub_vectors} sub-vectors) in {time.perf_counter() - started:.1f}s."
+        )
+
+    def ensure_index(self, table_name: str, force: bool = False) -> bool:
+        """
+        Build the table's ANN index once it is large enough, and rebuild it after enough writes.
+
+        :param table_name: Name of the table.
+        :param force: Rebuild the index regardless of the thresholds.
+        :return: True if an index was built or rebuilt.
+        """
+        table = self.get_table(table_name)
+        if table is None:
+            return False
+        try:
+            rows = table.count_rows()
+            if not force and rows < self.index_min_rows:
+                logger.debug(f"Table '{table_name}' has {rows} rows; below the {self.index_min_rows}-row index threshold.")
+                return False
+            if not force and self.has_index(table_name):
+                state = self._index_state[table_name]
+                if state['changed_rows'] < self.index_rebuild_fraction * max(1, state['indexed_rows']):
+                    return False
+                logger.info(f"{state['changed_rows']} rows of '{table_name}' changed since indexing; rebuilding index.")
+            self.build_index(table_name)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to build index for table '{table_name}': {e}")
+            return False
+
+    def ensure_scalar_index(self, table_name: str, column: str) -> bool:
+        """
+        Build a scalar (B-tree) index on a column used in equality filters, and rebuild it after enough writes.
+
+        Rows written after the index was built are still found (by scanning them), so the index
+        is only rebuilt once ``index_rebuild_fraction`` of the indexed rows changed.
+
+        :param table_name: Name of the table.
+        :param column: Column to index.
+        :return: True if an index was built or rebuilt.
+        """
+        key = (table_name, column)
+        table = self.get_table(table_name)
+        if table is None or key in self._scalar_index_failed:
+            return False
+        try:
+            state = self._scalar_index_state.get(key)
+            if state is None:
+                if [column] in self.indexed_columns(table):
+                    # An index built by an earlier process: treat the current contents as indexed
+                    self._scalar_index_state[key] = {'indexed_rows': table.count_rows(), 'changed_rows': 0}
+                    return False
+            elif state['changed_rows'] < self.index_rebuild_fraction * max(1, state['indexed_rows']):
+                return False
+            with self._write_lock(table_name):
+                rows = table.count_rows()
+                table.create_index(column, config=lancedb_index.BTree(), replace=True)
+                self._scalar_index_state[key] = {'indexed_rows': rows, 'changed_rows': 0}
+            logger.info(f"Built scalar index on '{table_name}.{column}' ({rows} rows).")
+            return True
+        except Exception as e:
+            self._scalar_index_failed.add(key)
+            logger.warning(f"Could not build a scalar index on '{table_name}.{column}'; filters on it will scan: {e}")
+            return False
+
+    def search(self, table_name: str, query_embedding: List[float], top_k: int = 5, nprobes: Optional[int] = None,
+               refine_factor: Optional[int] = None, where: Optional[str] = None, prefilter: bool = False) -> Any:
+        """
+        Build a vector query against a table, applying index parameters when the table is indexed.
+
+        :param table_name: Name of the table to search.
+        :param query_embedding: Query vector.
+        :param top_k: Number of results.
+        :param nprobes: IVF partitions to probe; defaults to the instance setting.
+        :param refine_factor: Candidates re-ranked with exact distances, as a multiple of top_k;
+            defaults to the instance setting.
+        :param where: Optional SQL filter.
+        :param prefilter: Apply the filter before the vector search, so ``top_k`` matching rows
+            are returned even if they are not among the nearest rows of the whole table.
+        :return: The LanceDB query builder, or None if the table does not exist.
+        """
+        table = self.get_table(table_name)
+        if table is None:
+            return None
+        query = table.search(query_embedding, "embedding").limit(top_k)
+        if where:
+            query = query.where(where, prefilter=prefilter)
+        if self.has_index(table_name):
+            query = query.nprobes(nprobes or self.nprobes)
+            refine_factor = refine_factor or self.refine_factor
+            if refine_factor:
+                query = query.refine_factor(refine_factor)
+        return query
+
+    def search_texts(self, table_name: str, query_embedding: List[float], top_k: int = 5, nprobes: Optional[int] = None,
+                     refine_factor: Optional[int] = None) -> List[str]:
+        """
+        Return the texts of the rows nearest to a query vector, reading only the text column.
+
+        :param table_name: Name of the table to search.
+        :param query_embedding: Query vector.
+        :param top_k: Number of results.
+        :param nprobes: Optional IVF partitions to probe when the table is indexed.
+        :param refine_factor: Optional refine factor when the table is indexed.
+        :return: The texts, nearest first.
+        """
+        query = self.search(table_name, query_embedding, top_k, nprobes, refine_factor)
+        if query is None:
+            return []
+        return query.select(['text', '_distance']).to_arrow().column('text').to_pylist()
+
+    def retrieve_relevant_info_batch(self, table_name: str, query_texts: List[str], embedding_fn: Callable[[List[str]], List[List[float]]],
+                                     top_k: int = 5, nprobes: Optional[int] = None, refine_factor: Optional[int] = None,
+                                     query_embeddings: Optional[List[List[float]]] = None) -> List[List[str]]:
+        """
+        Retrieve relevant information for several queries at once.
+
+        All queries are embedded in a single call and their vector searches run concurrently on a
+        shared thread pool.
+
+        :param table_name: Name of the table to search.
+        :param query_texts: The query texts.
+        :param embedding_fn: Embedding function to generate the query embeddings.
+        :param top_k: Number of relevant results to retrieve per query.
+        :param nprobes: Optional IVF partitions to probe when the table is indexed.
+        :param refine_factor: Optional refine factor when the table is indexed.
+        :param query_embeddings: Embeddings of the queries if already computed.
+        :return: One list of relevant text snippets per query, in the order of ``query_texts``.
+        """
+        if not query_texts:
+            return []
+        try:
+            if self.get_table(table_name) is None:
+                logger.warning(f"Table '{table_name}' does not exist yet.")
+                return [[] for _ in query_texts]
+            if query_embeddings is None:
+                query_embeddings = embedding_fn(query_texts)
+        except Exception as e:
+            logger.error(f"Error embedding queries: {e}")
+            return [[] for _ in query_texts]
+
+        def search_one(query_embedding: List[float]) -> List[str]:
+            try:
+                return self.search_texts(table_name, query_embedding, top_k, nprobes, refine_factor)
+            except Exception as e:
+                logger.error(f"Error retrieving relevant information: {e}")
+                return []
+
+        relevant_texts = list(self._get_search_pool().map(search_one, query_embeddings))
+        logger.debug(f"Retrieved relevant texts for {len(query_texts)} queries.")
+        return relevant_texts
+
+    def _get_search_pool(self) -> ThreadPoolExecutor:
+        if self._search_pool is None:
+            with self._registry_lock:
+                if self._search_pool is None:
+                    self._search_pool = ThreadPoolExecutor(max_workers=self.search_workers, thread_name_prefix='lancedb-search')
+        return self._search_pool
+
+    def retrieve_relevant_info(self, table_name: str, query_text: str, embedding_fn: Callable[[List[str]], List[List[float]]], top_k: int = 5,
+                               nprobes: Optional[int] = None, refine_factor: Optional[int] = None,
+                               query_embedding: Optional[List[float]] = None) -> List[str]:
         """
         Retrieve relevant information from LanceDB based on a query text.
 
+        :param table_name: Name of the table to search.
         :param query_text: The user's query text.
         :param embedding_fn: Embedding function to generate the query embedding.
         :param top_k: Number of relevant results to retrieve.
+        :param nprobes: Optional IVF partitions to probe when the table is indexed.
+        :param refine_factor: Optional refine factor when the table is indexed.
+        :param query_embedding: Embedding of the query if already computed.
         :return: List of relevant text snippets.
         """
         try:
-            query_embedding = embedding_fn([query_text])[0]
-            results = self.table.search(query_embedding, "embedding").limit(top_k).to_df()
-            relevant_texts = results['text'].tolist()
+            if self.get_table(table_name) is None:
+                logger.warning(f"Table '{table_name}' does not exist yet.")
+                return []
+            if query_embedding is None:
+                query_embedding = embedding_fn([query_text])[0]
+            relevant_texts = self.search_texts(table_name, query_embedding, top_k, nprobes, refine_factor)
             logger.debug(f"Retrieved {len(relevant_texts)} relevant texts for query '{query_text}'.")
             return relevant_texts
         except Exception as e:
@@ -95,30 +571,56 @@ class LanceDBUtils:
             return []
 
 class LocalEmbeddings:
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, cache: Optional[EmbeddingCache] = None, backend: Union[str, Any] = 'sentence-transformers',
+                 onnx_cache_dir: str = 'onnx_models', quantize: bool = True, num_threads: int = 0):
         """
-        Initialize the local embedding model.
+        Initialize the local embedding model, which is loaded on first use.
+
+        The model runs on a pluggable backend: 'sentence-transformers' (PyTorch) or 'onnx'
+        (ONNX Runtime, optionally int8-quantized, which is several times faster on CPU). Each
+        backend caches its vectors under its own key, so switching backends never mixes vectors.
 
         :param model_name: Name of the embedding model to use.
+        :param cache: Optional embedding cache; only texts missing from it are sent to the model.
+        :param backend: Backend name, or a backend object with ``encode(texts)`` and ``cache_key``.
+        :param onnx_cache_dir: Directory of the exported ONNX models (onnx backend).
+        :param quantize: Whether to run the int8-quantized model (onnx backend).
+        :param num_threads: Threads per batch, 0 for the runtime's default (onnx backend).
         """
-        try:
-            self.model = SentenceTransformer(model_name)
-            logger.info(f"Loaded embedding model: {model_name}")
-        except Exception as e:
-            logger.error(f"Failed to load embedding model '{model_name}': {e}")
-            raise
+        self.model_name = model_name
+        self.cache = cache
+        if isinstance(backend, str):
+            options = {'cache_dir': onnx_cache_dir, 'quantize': quantize, 'num_threads': num_threads} if backend == 'onnx' else {}
+            backend = create_backend(backend, model_name, **options)
+        self.backend = backend
 
-    def __call__(self, texts: List[str]) -> List[List[float]]:
+    def __call__(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for a list of texts.
 
         :param texts: List of text strings.
-        :return: List of embeddings.
+        :return: C-contiguous float32 array with one embedding per row.
         """
         try:
-            embeddings = self.model.encode(texts, convert_to_numpy=True).tolist()
-            logger.debug(f"Generated embeddings for {len(texts)} texts.")
-            return embeddings
+            if self.cache is None:
+                embeddings = as_embedding_array(self.backend.encode(texts))
+                logger.debug(f"Generated embeddings for {len(texts)} texts.")
+                return embeddings
+
+            hashes = [EmbeddingCache.hash_text(text) for text in texts]
+            vectors = self.cache.get_many(self.backend.cache_key, list(dict.fromkeys(hashes)))
+
+            # Encode each distinct missing text once, in a single batched call
+            missing = {text_hash: text for text_hash, text in zip(hashes, texts) if text_hash not in vectors}
+            if missing:
+                encoded = as_embedding_array(self.backend.encode(list(missing.values())))
+                computed = dict(zip(missing.keys(), encoded))
+                self.cache.put_many(self.backend.cache_key, computed)
+                vectors.update(computed)
+            logger.debug(f"Generated embeddings for {len(texts)} texts ({len(missing)} cache misses).")
+            if not hashes:
+                return as_embedding_array([])
+            return np.stack([vectors[text_hash] for text_hash in hashes])
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise
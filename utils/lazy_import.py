@@ -0,0 +1,32 @@
+# utils/lazy_import.py
+
+import importlib
+import sys
+import types
+from typing import Any
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is only imported when one of its attributes is first used.
+
+    The import goes through importlib, so it is thread-safe, and the module's namespace is then
+    copied onto the stand-in so later lookups cost no more than on the real module.
+    """
+
+    def __getattr__(self, attr: str) -> Any:
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Return a module that is imported on first attribute access.
+
+    Heavy dependencies (openai, tweepy, lancedb, sentence-transformers, aiohttp) are bound with
+    this at module level, so importing XBot costs nothing until a component actually uses them.
+
+    :param name: Absolute module name.
+    :return: The module itself if it is already imported, otherwise a LazyModule (a missing
+        module raises ModuleNotFoundError on first use).
+    """
+    return sys.modules.get(name) or LazyModule(name)
@@ -1,28 +1,125 @@
 # utils/memory.py
 
 import logging
+from collections import OrderedDict, deque
 from datetime import datetime
+from itertools import islice
+from threading import RLock
 from uuid import uuid4
-from typing import List
-from utils.lance_db_utils import LanceDBUtils, LocalEmbeddings
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from utils.lance_db_utils import LanceDBUtils, LocalEmbeddings, as_embedding_array, embedding_matrix, quote_sql_literal
 
 logger = logging.getLogger(__name__)
 
+# Conversation id of interactions recorded without one
+DEFAULT_USER = 'anonymous'
+
+# Kinds of memory rows: raw interactions, and summaries that compaction rolls them into
+INTERACTION = 'interaction'
+SUMMARY = 'summary'
+
+# Columns added since the first memory tables, with the value given to existing rows
+ADDED_COLUMNS = {'user_id': DEFAULT_USER, 'kind': INTERACTION}
+
 class Memory:
-    def __init__(self, db_utils: LanceDBUtils, embedding_fn: LocalEmbeddings, table_name: str = 'conversation_memory', max_history: int = 50):
+    def __init__(self, db_utils: LanceDBUtils, embedding_fn: LocalEmbeddings, table_name: str = 'conversation_memory',
+                 max_history: int = 50, flush_batch_size: int = 16, retention: int = 500,
+                 half_life_hours: float = 72.0, max_cached_users: int = 1024, max_pending: int = 1024):
         """
         Initialize the Memory system using LanceDB.
 
+        Memory is partitioned by user (or conversation) id, stored in the ``user_id`` column of
+        the table, which gets a scalar index so a user's rows are found without scanning the
+        others. Each user's recent interactions are served from a bounded in-process ring, warmed
+        from LanceDB on first use; the rings of at most ``max_cached_users`` users are held, and
+        the least recently used one is evicted to make room. New interactions are written
+        through to LanceDB in batches.
+
+        Each user keeps up to ``retention`` interactions in the table, embedded, and recall()
+        finds the ones relevant to a query by vector search within that user's rows, weighting
+        similarity by an exponential decay of their age. Lookups therefore cost O(retention)
+        for one user, however many users the table holds. Old interactions can be rolled into
+        summary rows by compact_user() (see MemoryCompactor), which recall() searches alongside
+        the raw interactions.
+
         :param db_utils: Instance of LanceDBUtils for database operations.
         :param embedding_fn: Instance of LocalEmbeddings for generating embeddings.
         :param table_name: Name of the table to store conversation histories.
-        :param max_history: Maximum number of interactions to retain.
+        :param max_history: Number of recent interactions held in a user's ring.
+        :param flush_batch_size: Number of pending interactions buffered before they are inserted into LanceDB.
+        :param retention: Maximum number of interactions kept in the table per user.
+        :param half_life_hours: Age at which a recalled interaction's score is halved.
+        :param max_cached_users: Number of users whose rings are held in memory.
+        :param max_pending: Number of unwritten interactions kept for retry while LanceDB writes
+            fail; the oldest beyond it are dropped.
         """
         self.db_utils = db_utils
         self.embedding_fn = embedding_fn
         self.table_name = table_name
         self.max_history = max_history
-        self.table = self.db_utils.create_table(self.table_name)
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.retention = max(max_history, retention)
+        self.half_life_hours = half_life_hours
+        self.max_cached_users = max(1, max_cached_users)
+        self.max_pending = max(self.flush_batch_size, max_pending)
+        self.character_name = 'Alexandra'
+
+        self._lock = RLock()
+        # user id -> {'recent': ring of the newest interactions, 'stored': rows in the table}
+        self._users: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending: List[Dict[str, Any]] = []
+        self._flushing: List[Dict[str, Any]] = []
+        self._schema_checked = False
+        # Called after each flush with the stored interaction counts of the users written
+        self.flush_listeners: List[Callable[[Dict[str, int]], None]] = []
+
+    def _user_filter(self, user_id: str, kind: Optional[str] = None) -> str:
+        predicate = f"user_id = {quote_sql_literal(user_id)}"
+        return f"{predicate} AND kind = {quote_sql_literal(kind)}" if kind else predicate
+
+    def _user(self, user_id: str) -> Dict[str, Any]:
+        """
+        Return a user's cache entry, warming it from LanceDB on first use and evicting the least
+        recently used user if the cache is full.
+        """
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                return entry
+
+        # Read outside the lock so a cold user does not stall everyone else
+        try:
+            self._ensure_schema()
+            rows = self.db_utils.read_columns(self.table_name, ['id', 'timestamp', 'user_query', 'bot_response'],
+                                              where=self._user_filter(user_id, INTERACTION))
+        except Exception as e:
+            logger.debug(f"No existing interactions loaded for user '{user_id}' from '{self.table_name}': {e}")
+            rows = []
+        stored = len(rows)
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                # Interactions not yet visible in the table are taken from the write buffers
+                known = {row['id'] for row in rows}
+                rows += [row for row in self._flushing + self._pending if row['user_id'] == user_id and row['id'] not in known]
+                rows.sort(key=lambda row: row['timestamp'])
+                recent = deque((self._turn_row(row) for row in rows[-self.max_history:]), maxlen=self.max_history)
+                entry = {'recent': recent, 'stored': stored}
+                self._users[user_id] = entry
+                while len(self._users) > self.max_cached_users:
+                    self._users.popitem(last=False)
+                logger.debug(f"Loaded {len(recent)} recent interactions of user '{user_id}' into memory.")
+            self._users.move_to_end(user_id)
+        if stored > self.retention:
+            self.prune_memory(user_id)
+        return entry
+
+    @staticmethod
+    def _turn_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: row[key] for key in ('id', 'timestamp', 'user_query', 'bot_response')}
 
     def set_character_name(self, name: str) -> None:
         """
@@ -32,61 +129,283 @@ class Memory:
         """
         self.character_name = name
 
-    def add_interaction(self, user_query: str, bot_response: str) -> None:
+    def add_interaction(self, user_query: str, bot_response: str, user_id: str = DEFAULT_USER) -> None:
         """
         Add a user query and bot response to the memory.
 
         :param user_query: The user's input.
         :param bot_response: Alexandra's response.
+        :param user_id: Id of the user or conversation the interaction belongs to.
         """
         try:
             interaction = {
                 'id': str(uuid4()),
-                'timestamp': datetime.utcnow().isoformat(),
+                'user_id': user_id,
+                'kind': INTERACTION,
+                'timestamp': datetime.utcnow().isoformat(timespec='microseconds'),
                 'user_query': user_query,
                 'bot_response': bot_response
             }
             # Generate embedding based on the combined interaction
             combined_text = f"User: {user_query}\n{self.character_name}: {bot_response}"
-            interaction['embedding'] = self.embedding_fn([combined_text])[0]
+            embedding = self.embedding_fn([combined_text])[0]
 
-            self.db_utils.add_data([interaction], embedding_fn=None)  # Embedding already added
+            entry = self._user(user_id)
+            with self._lock:
+                entry['recent'].append(self._turn_row(interaction))
+                self._pending.append(dict(interaction, embedding=embedding))
+                should_flush = len(self._pending) >= self.flush_batch_size
             logger.debug(f"Added interaction to memory: {interaction['id']}")
 
-            # Prune memory if exceeding max_history
-            self.prune_memory()
+            if should_flush:
+                self.flush()
         except Exception as e:
             logger.error(f"Error adding interaction to memory: {e}")
 
-    def prune_memory(self) -> None:
+    def _ensure_schema(self) -> None:
+        """
+        Add the columns missing from a memory table written by an earlier version.
+        """
+        if self._schema_checked:
+            return
+        table = self.db_utils.get_table(self.table_name)
+        if table is not None:
+            for column, value in ADDED_COLUMNS.items():
+                if column not in table.schema.names:
+                    table.add_columns({column: quote_sql_literal(value)})
+                    logger.info(f"Added the {column} column to '{self.table_name}'; existing rows get '{value}'.")
+        self._schema_checked = True
+
+    def flush(self) -> None:
         """
-        Ensure the memory does not exceed the maximum history limit.
+        Write all pending interactions through to LanceDB in one batch and prune the users who
+        exceeded their retention.
         """
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._flushing.extend(batch)
+        if not batch:
+            return
         try:
-            df = self.table.to_df()
-            total_interactions = len(df)
-            if total_interactions > self.max_history:
-                num_to_remove = total_interactions - self.max_history
-                # Retrieve the oldest interactions
-                oldest = df.sort_values(by='timestamp').head(num_to_remove)
-                ids_to_remove = oldest['id'].tolist()
-                self.table.delete(ids_to_remove)
-                logger.debug(f"Pruned {num_to_remove} interactions from memory.")
+            self._ensure_schema()
+            self.db_utils.add_data(self.table_name, batch)
+            logger.debug(f"Flushed {len(batch)} interactions to '{self.table_name}'.")
         except Exception as e:
-            logger.error(f"Error pruning memory: {e}")
+            logger.error(f"Error flushing interactions to memory table: {e}")
+            with self._lock:
+                self._pending[:0] = batch
+                dropped = len(self._pending) - self.max_pending
+                if dropped > 0:
+                    del self._pending[:dropped]
+                self._forget_flushing(batch)
+            if dropped > 0:
+                logger.error(f"Dropped the {dropped} oldest unwritten interactions of '{self.table_name}' after repeated write failures.")
+            return
+
+        with self._lock:
+            self._forget_flushing(batch)
+            for row in batch:
+                entry = self._users.get(row['user_id'])
+                if entry is not None:
+                    entry['stored'] += 1
+            # A little slack keeps a user at the limit from being pruned on every flush
+            slack = max(1, self.retention // 10)
+            over_retention = [user_id for user_id in {row['user_id'] for row in batch}
+                              if user_id in self._users and self._users[user_id]['stored'] > self.retention + slack]
+            counts = {row['user_id']: self._users[row['user_id']]['stored'] for row in batch if row['user_id'] in self._users}
+        for user_id in over_retention:
+            self.prune_memory(user_id)
+        self.db_utils.ensure_scalar_index(self.table_name, 'user_id')
+        for listener in self.flush_listeners:
+            try:
+                listener(counts)
+            except Exception as e:
+                logger.error(f"Error in memory flush listener: {e}")
+
+    def _forget_flushing(self, batch: List[Dict[str, Any]]) -> None:
+        # Must be called with the lock held; concurrent flushes may finish in any order
+        ids = {row['id'] for row in batch}
+        self._flushing = [row for row in self._flushing if row['id'] not in ids]
+
+    def close(self) -> None:
+        """
+        Flush any buffered interactions before shutdown.
+        """
+        self.flush()
 
-    def get_recent_interactions(self, top_k: int = 5) -> str:
+    def prune_memory(self, user_id: str) -> None:
+        """
+        Ensure a user's raw interactions do not exceed the retention limit.
+
+        Only the user's timestamps are read to find the retention cutoff, so pruning is a single
+        predicate evaluated by LanceDB. A failure is logged and the user is pruned again later,
+        so it never fails the request that triggered it.
+
+        :param user_id: Id of the user or conversation.
+        """
+        where = self._user_filter(user_id, INTERACTION)
+        try:
+            timestamps = sorted(row['timestamp'] for row in self.db_utils.read_columns(self.table_name, ['timestamp'], where=where))
+            if len(timestamps) > self.retention:
+                cutoff = timestamps[-self.retention]
+                self.db_utils.delete_where(self.table_name, f"{where} AND timestamp < '{cutoff}'")
+                logger.debug(f"Pruned interactions of user '{user_id}' older than {cutoff} from memory.")
+        except Exception as e:
+            logger.error(f"Error pruning the memory of user '{user_id}': {e}")
+            return
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                entry['stored'] = min(len(timestamps), self.retention)
+
+    def recall(self, query: str, k: int = 3, recent: int = 2, query_embedding: Optional[List[float]] = None,
+               candidates: int = 4, min_similarity: float = 0.25, user_id: str = DEFAULT_USER) -> List[Dict[str, str]]:
+        """
+        Retrieve a user's past interactions relevant to a query, together with the latest ones.
+
+        The ``candidates * k`` nearest interactions and summaries of the user, found by a vector
+        search pre-filtered on the user_id index, are re-scored by cosine similarity times
+        ``0.5 ** (age / half_life_hours)``, and the ``k`` best are merged with the ``recent``
+        newest interactions, which are always kept for conversational continuity.
+
+        :param query: The user's query.
+        :param k: Number of interactions recalled by relevance.
+        :param recent: Number of newest interactions always included.
+        :param query_embedding: Embedding of the query if already computed.
+        :param candidates: Nearest interactions fetched per recalled one, as a multiple of ``k``.
+        :param min_similarity: Cosine similarity below which an interaction is never recalled.
+        :param user_id: Id of the user or conversation.
+        :return: Interactions with user_query and bot_response, and summaries (with kind
+            'summary' and the summary text), oldest first.
+        """
+        entry = self._user(user_id)
+        with self._lock:
+            window = list(islice(reversed(entry['recent']), recent)) if recent > 0 else []
+            pending = [row for row in self._flushing + self._pending if row['user_id'] == user_id]
+        if k <= 0:
+            return [{'user_query': row['user_query'], 'bot_response': row['bot_response']} for row in reversed(window)]
+
+        try:
+            if query_embedding is None:
+                query_embedding = self.embedding_fn([query])[0]
+            rows = pending
+            vectors = [as_embedding_array([row['embedding'] for row in pending])] if pending else []
+            search = self.db_utils.search(self.table_name, query_embedding, top_k=candidates * k,
+                                          where=self._user_filter(user_id), prefilter=True)
+            if search is not None:
+                results = search.select(['id', 'kind', 'timestamp', 'user_query', 'bot_response', 'embedding', '_distance']).to_arrow()
+                if results.num_rows:
+                    rows = rows + results.drop(['embedding', '_distance']).to_pylist()
+                    vectors.append(embedding_matrix(results))
+        except Exception as e:
+            logger.error(f"Error recalling interactions: {e}")
+            rows, vectors = [], []
+
+        excluded = {row['id'] for row in window}
+        scored = {}
+        if rows:
+            vector = np.asarray(query_embedding, dtype=np.float32)
+            stored = np.concatenate(vectors)
+            similarities = stored @ vector / ((np.linalg.norm(stored, axis=1) * np.linalg.norm(vector)) + 1e-12)
+            now = datetime.utcnow()
+            for row, similarity in zip(rows, similarities.tolist()):
+                if row['id'] in excluded or row['id'] in scored or similarity < min_similarity:
+                    continue
+                age_hours = max(0.0, (now - datetime.fromisoformat(row['timestamp'])).total_seconds() / 3600)
+                scored[row['id']] = (similarity * 0.5 ** (age_hours / self.half_life_hours), row)
+        recalled = [row for _, row in sorted(scored.values(), key=lambda item: item[0], reverse=True)[:k]]
+
+        merged = sorted(recalled + window, key=lambda row: row['timestamp'])
+        logger.debug(f"Recalled {len(recalled)} relevant and {len(window)} recent interactions of user '{user_id}'.")
+        return [{'kind': SUMMARY, 'summary': row['bot_response']} if row.get('kind') == SUMMARY
+                else {'user_query': row['user_query'], 'bot_response': row['bot_response']} for row in merged]
+
+    def user_counts(self) -> Dict[str, int]:
+        """
+        Return the number of stored interactions of each user whose memory is cached.
+        """
+        with self._lock:
+            return {user_id: entry['stored'] for user_id, entry in self._users.items()}
+
+    def compact_user(self, user_id: str, summarize: Callable[[List[Dict[str, str]], Optional[str]], Optional[str]],
+                     keep_recent: int = 100, batch_size: int = 50, max_summaries: int = 50) -> Optional[Tuple[List[Dict[str, str]], str]]:
+        """
+        Roll a user's oldest interactions into a summary row, keeping the newest ones raw.
+
+        The ``batch_size`` oldest interactions beyond the ``keep_recent`` newest are summarized
+        together with the user's latest summary, so each summary carries the gist of everything
+        before it. The summary is embedded and stored in the table (with the timestamp of the
+        newest interaction it covers) before the interactions are deleted, so recall never
+        misses them; at most ``max_summaries`` summaries are kept per user.
+
+        :param user_id: Id of the user or conversation.
+        :param summarize: Function of the interactions and the previous summary (or None)
+            returning the new summary, or None if it could not be generated.
+        :param keep_recent: Number of newest interactions never compacted.
+        :param batch_size: Number of interactions rolled into one summary.
+        :param max_summaries: Maximum number of summaries kept per user.
+        :return: The compacted interactions and their summary, or None if nothing was compacted.
+        """
+        keep_recent = max(keep_recent, self.max_history)
+        self._ensure_schema()
+        rows = self.db_utils.read_columns(self.table_name, ['id', 'kind', 'timestamp', 'user_query', 'bot_response'],
+                                          where=self._user_filter(user_id))
+        interactions = sorted((row for row in rows if row['kind'] == INTERACTION), key=lambda row: row['timestamp'])
+        summaries = sorted((row for row in rows if row['kind'] == SUMMARY), key=lambda row: row['timestamp'])
+        if len(interactions) - keep_recent < batch_size:
+            return None
+
+        batch = interactions[:batch_size]
+        turns = [{'user_query': row['user_query'], 'bot_response': row['bot_response']} for row in batch]
+        summary = summarize(turns, summaries[-1]['bot_response'] if summaries else None)
+        if not summary:
+            return None
+
+        # The summary text is kept in bot_response, so summaries share the interactions' schema
+        self.db_utils.add_data(self.table_name, [{
+            'id': str(uuid4()),
+            'user_id': user_id,
+            'kind': SUMMARY,
+            'timestamp': batch[-1]['timestamp'],
+            'user_query': '',
+            'bot_response': summary,
+            'embedding': self.embedding_fn([summary])[0]
+        }])
+        doomed = [row['id'] for row in batch] + [row['id'] for row in summaries[:max(0, len(summaries) + 1 - max_summaries)]]
+        self.db_utils.delete_where(self.table_name, f"id IN ({', '.join(quote_sql_literal(row_id) for row_id in doomed)})")
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                entry['stored'] = max(0, entry['stored'] - len(batch))
+        logger.debug(f"Compacted {len(batch)} interactions of user '{user_id}' into a summary.")
+        return turns, summary
+
+    def get_recent_interactions(self, top_k: int = 5, user_id: str = DEFAULT_USER) -> str:
         """
         Retrieve the most recent interactions.
 
         :param top_k: Number of recent interactions to retrieve.
+        :param user_id: Id of the user or conversation.
         :return: Concatenated string of recent interactions.
         """
         try:
-            df = self.table.to_df().sort_values(by='timestamp', ascending=False).head(top_k)
-            interactions = [f"User: {row['user_query']}\n{self.character_name}: {row['bot_response']}" for _, row in df.iterrows()]
+            interactions = [f"User: {turn['user_query']}\n{self.character_name}: {turn['bot_response']}"
+                            for turn in self.get_recent_turns(top_k, user_id)]
             logger.debug(f"Retrieved {len(interactions)} recent interactions from memory.")
-            return '\n'.join(interactions[::-1])  # Reverse to maintain chronological order
+            return '\n'.join(interactions)
         except Exception as e:
             logger.error(f"Error retrieving recent interactions: {e}")
             return ""
+
+    def get_recent_turns(self, top_k: int = 5, user_id: str = DEFAULT_USER) -> List[Dict[str, str]]:
+        """
+        Retrieve the most recent interactions as structured turns.
+
+        :param top_k: Number of recent interactions to retrieve.
+        :param user_id: Id of the user or conversation.
+        :return: Interactions with user_query and bot_response, oldest first.
+        """
+        entry = self._user(user_id)
+        with self._lock:
+            recent = list(islice(reversed(entry['recent']), top_k))
+        return [{'user_query': row['user_query'], 'bot_response': row['bot_response']} for row in reversed(recent)]
@@ -0,0 +1,190 @@
+# utils/memory_compactor.py
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+from utils.context_assembler import MESSAGE_OVERHEAD_TOKENS
+from utils.memory import Memory
+from utils.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the long-term memory of {persona}'s conversation with one user. Write a concise summary "
+    "of the conversation so far, in the third person, keeping the user's facts, preferences, open questions "
+    "and anything {persona} promised. Reply with the summary only."
+)
+
+def llm_summarizer(openai_llm: Any, persona: str = 'Alexandra') -> Callable[[List[Dict[str, str]], Optional[str]], Optional[str]]:
+    """
+    Build a summarize function for Memory.compact_user backed by the bot's LLM.
+
+    :param openai_llm: OpenAILLM used to write the summaries.
+    :param persona: Name of the character the conversation is with.
+    :return: Function of the interactions and the previous summary returning the new summary,
+        or None when the LLM answered with a fallback response.
+    """
+    def summarize(turns: List[Dict[str, str]], previous_summary: Optional[str]) -> Optional[str]:
+        transcript = '\n'.join(f"User: {turn['user_query']}\n{persona}: {turn['bot_response']}" for turn in turns)
+        if previous_summary:
+            transcript = f"Summary so far: {previous_summary}\n\nLater conversation:\n{transcript}"
+        summary = openai_llm.generate_response(messages=[
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(persona=persona)},
+            {"role": "user", "content": transcript}
+        ]).strip()
+        return None if openai_llm.is_fallback_response(summary) else summary
+
+    return summarize
+
+class MemoryCompactor:
+    def __init__(self, memory: Memory, summarize: Callable[[List[Dict[str, str]], Optional[str]], Optional[str]],
+                 interval_seconds: float = 600.0, threshold: int = 200, keep_recent: int = 100, batch_size: int = 50,
+                 max_summaries: int = 50, model: str = 'gpt-4'):
+        """
+        Initialize a background job rolling old conversation memory into summaries.
+
+        The job runs in its own thread, off the request path: every ``interval_seconds`` it
+        compacts the users whose memory holds at least ``keep_recent + batch_size``
+        interactions, and it wakes up early for a user as soon as a flush takes their memory
+        past ``threshold`` interactions. Compaction keeps the prompt's history budget fixed
+        while long-term context survives in summaries that recall() can find.
+
+        :param memory: The memory to compact.
+        :param summarize: Function of interactions and the previous summary returning the new
+            summary (see llm_summarizer).
+        :param interval_seconds: Seconds between scheduled compaction runs.
+        :param threshold: Stored interactions of a user that trigger compaction right away.
+        :param keep_recent: Number of newest interactions of a user that stay raw.
+        :param batch_size: Number of interactions rolled into one summary.
+        :param max_summaries: Maximum number of summaries kept per user.
+        :param model: Model whose tokenizer measures the prompt tokens saved.
+        """
+        self.memory = memory
+        self.summarize = summarize
+        self.interval_seconds = interval_seconds
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self.batch_size = max(1, batch_size)
+        self.max_summaries = max(1, max_summaries)
+        self.model = model
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._requested: Set[str] = set()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.interactions_compacted = 0
+        self.summaries_written = 0
+        self.tokens_saved = 0
+
+    def _on_flush(self, counts: Dict[str, int]) -> None:
+        over = {user_id for user_id, stored in counts.items() if stored >= self.threshold}
+        if over:
+            with self._lock:
+                self._requested |= over
+            self._wakeup.set()
+
+    def _tokens(self, turns: List[Dict[str, str]], summary: str) -> int:
+        # Prompt tokens of the interactions as history messages, less those of the summary message
+        raw = sum(count_tokens(turn['user_query'], self.model) + count_tokens(turn['bot_response'], self.model)
+                  + 2 * MESSAGE_OVERHEAD_TOKENS for turn in turns)
+        return raw - count_tokens(summary, self.model) - MESSAGE_OVERHEAD_TOKENS
+
+    def compact(self, user_id: str) -> int:
+        """
+        Compact one user's memory until only ``keep_recent`` interactions (plus less than a
+        batch) are left raw.
+
+        :param user_id: Id of the user or conversation.
+        :return: Prompt tokens saved: the tokens of the compacted interactions as history,
+            less those of their summaries.
+        """
+        saved = 0
+        while not self._stop.is_set():
+            try:
+                compacted = self.memory.compact_user(user_id, self.summarize, self.keep_recent, self.batch_size, self.max_summaries)
+            except Exception as e:
+                logger.error(f"Error compacting the memory of user '{user_id}': {e}")
+                break
+            if compacted is None:
+                break
+            turns, summary = compacted
+            tokens = self._tokens(turns, summary)
+            saved += tokens
+            with self._lock:
+                self.interactions_compacted += len(turns)
+                self.summaries_written += 1
+                self.tokens_saved += tokens
+        if saved:
+            logger.info(f"Compacted the memory of user '{user_id}', saving {saved} prompt tokens.")
+        return saved
+
+    def run_once(self, user_ids: Optional[List[str]] = None) -> int:
+        """
+        Compact the given users, or every cached user with enough interactions to compact.
+
+        :param user_ids: Users to compact; by default those found by Memory.user_counts().
+        :return: Prompt tokens saved by this run.
+        """
+        if user_ids is None:
+            minimum = max(self.keep_recent, self.memory.max_history) + self.batch_size
+            user_ids = [user_id for user_id, stored in self.memory.user_counts().items() if stored >= minimum]
+        saved = sum(self.compact(user_id) for user_id in user_ids)
+        with self._lock:
+            self.runs += 1
+        return saved
+
+    def _run_loop(self) -> None:
+        while not self._stop.is_set():
+            triggered = self._wakeup.wait(self.interval_seconds)
+            if self._stop.is_set():
+                return
+            self._wakeup.clear()
+            with self._lock:
+                requested, self._requested = sorted(self._requested), set()
+            self.run_once(requested if triggered else None)
+
+    def start(self) -> None:
+        """
+        Start the compaction thread and listen for flushes crossing the threshold; does nothing
+        if the thread is already running.
+        """
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            if self._on_flush not in self.memory.flush_listeners:
+                self.memory.flush_listeners.append(self._on_flush)
+            self._thread = threading.Thread(target=self._run_loop, name='xbot-memory-compactor', daemon=True)
+            self._thread.start()
+        logger.info(f"Started memory compaction every {self.interval_seconds:.0f}s or past {self.threshold} interactions per user.")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the compaction thread, letting a compaction in progress finish its current batch.
+
+        :param timeout: Seconds to wait for the thread.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._on_flush in self.memory.flush_listeners:
+            self.memory.flush_listeners.remove(self._on_flush)
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the compaction counters.
+
+        :return: Dictionary with runs, interactions_compacted, summaries_written and tokens_saved.
+        """
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'interactions_compacted': self.interactions_compacted,
+                'summaries_written': self.summaries_written,
+                'tokens_saved': self.tokens_saved
+            }
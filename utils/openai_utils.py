@@ -1,147 +1,210 @@
 # utils/openai_utils.py
 
-import openai
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional
 from utils.config import Config
+from utils.http_transport import HTTPTransport
+from utils.lazy_import import lazy_import
+from utils.system_prompt import SystemPromptCache
+
+openai = lazy_import('openai')
 
 logger = logging.getLogger(__name__)
 
+class StreamInterruptedError(Exception):
+    """
+    Raised by a response stream that failed after yielding part of the response.
+    """
+
 class OpenAILLM:
-    def __init__(self, model: str = 'gpt-4', llm_settings: Optional[Dict[str, Any]] = None, character_profile: Optional[Dict[str, Any]] = None):
+    def __init__(self, model: str = 'gpt-4', llm_settings: Optional[Dict[str, Any]] = None, character_profile: Optional[Dict[str, Any]] = None,
+                 character_config_path: Optional[str] = None, transport: Optional[HTTPTransport] = None,
+                 api_base: Optional[str] = None):
         """
         Initialize the OpenAI LLM.
 
         :param model: The OpenAI model to use (default: gpt-4)
         :param llm_settings: Dictionary of LLM settings from configuration.
         :param character_profile: Dictionary containing the character's detailed profile.
+        :param character_config_path: Optional path of the character JSON file; the system prompt
+            is recompiled when it changes.
+        :param transport: Shared HTTP transport whose pooled connections carry the requests; a
+            private one is created if omitted.
+        :param api_base: Base URL of the API; the configured OPENAI_API_BASE or openai's default if omitted.
         """
         config = Config()
         self.api_key = config.openai_api_key
-        openai.api_key = self.api_key
+        self.api_base = api_base or config.openai_api_base or None
+        self.transport = transport or HTTPTransport()
         self.model = model
         self.llm_settings = llm_settings or {}
         self.character_profile = character_profile or {}
+        self.prompt_cache = SystemPromptCache(
+            character_config_path=character_config_path,
+            character_profile=self.character_profile,
+            model=self.llm_settings.get('model', self.model)
+        )
         logger.info(f"Initialized OpenAI LLM with model: {self.model}")
 
     def generate_system_prompt(self) -> str:
         """
-        Generate a comprehensive system prompt based on the character profile.
+        Return the system prompt compiled from the character profile.
+
+        The prompt is compiled once and only rebuilt when the character file changes.
 
         :return: The system prompt string.
         """
-        system_prompt = f"You are {self.character_profile.get('name', 'an AI assistant')}."
-        system_prompt += f" {self.character_profile.get('description', '')}\n\n"
-
-        # History
-        history = self.character_profile.get('history', {})
-        if history:
-            system_prompt += "### History\n"
-            system_prompt += f"Creation Date: {history.get('creation_date', 'Unknown')}.\n"
-            system_prompt += f"Creator: {history.get('creator', 'Unknown')}.\n"
-            system_prompt += f"Purpose: {history.get('purpose', 'Unknown')}.\n\n"
-
-        # Background
-        background = self.character_profile.get('background', {})
-        if background:
-            system_prompt += "### Background\n"
-            education = background.get('education', {})
-            if education:
-                system_prompt += "Education:\n"
-                for degree_level, details in education.items():
-                    system_prompt += f"- {degree_level.capitalize()}: {details.get('degree', 'Unknown')} from {details.get('institution', 'Unknown')} ({details.get('graduation_year', 'Unknown')}).\n"
-            experience = background.get('experience', '')
-            if experience:
-                system_prompt += f"\nExperience: {experience}\n\n"
-
-        # Life Story
-        life_story = self.character_profile.get('life_story', '')
-        if life_story:
-            system_prompt += "### Life Story\n"
-            system_prompt += f"{life_story}\n\n"
-
-        # Personal Anecdotes
-        anecdotes = self.character_profile.get('personal_anecdotes', [])
-        if anecdotes:
-            system_prompt += "### Personal Anecdotes\n"
-            for anecdote in anecdotes:
-                system_prompt += f"- {anecdote}\n"
-            system_prompt += "\n"
-
-        # Personality Traits
-        traits = self.character_profile.get('personality_traits', {})
-        active_traits = [trait.replace('_', ' ').capitalize() for trait, value in traits.items() if value]
-        if active_traits:
-            system_prompt += f"### Personality Traits\n{', '.join(active_traits)}.\n\n"
-
-        # Likes & Dislikes
-        likes = self.character_profile.get('likes', [])
-        dislikes = self.character_profile.get('dislikes', [])
-        if likes:
-            system_prompt += f"### Likes\n{', '.join(likes)}.\n\n"
-        if dislikes:
-            system_prompt += f"### Dislikes\n{', '.join(dislikes)}.\n\n"
-
-        # Things It Is Against
-        things_against = self.character_profile.get('things_it_is_against', [])
-        if things_against:
-            system_prompt += f"### Do Not Engage In\n{', '.join(things_against)}.\n\n"
-
-        # Communication Style & Tone
-        communication_style = self.character_profile.get('communication_style', '')
-        tone = self.character_profile.get('tone', '')
-        if communication_style:
-            system_prompt += f"### Communication Style\n{communication_style}.\n\n"
-        if tone:
-            system_prompt += f"### Tone\n{tone}.\n\n"
-
-        # Response Format
-        response_format = self.character_profile.get('response_format', {})
-        if response_format:
-            system_prompt += f"### Response Format\n"
-            for key, value in response_format.items():
-                system_prompt += f"- {key.replace('_', ' ').capitalize()}: {value}.\n"
-            system_prompt += "\n"
-
-        # Additional Instructions
-        additional_instructions = self.character_profile.get('additional_instructions', '')
-        if additional_instructions:
-            system_prompt += f"### Additional Instructions\n{additional_instructions}\n\n"
-
-        return system_prompt
-
-    def generate_response(self, user_query: str) -> str:
+        return self.prompt_cache.get().text
+
+    def system_prompt_tokens(self) -> int:
         """
-        Generate a response from the OpenAI LLM.
+        Return the precomputed token count of the system prompt.
 
-        :param user_query: The user's query string.
-        :return: The LLM's response text.
+        :return: Number of tokens in the system prompt.
         """
-        system_prompt = self.generate_system_prompt()
-        messages = [
-            {"role": "system", "content": system_prompt},
+        return self.prompt_cache.get().token_count
+
+    def _build_messages(self, user_query: Optional[str], messages: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        if messages is not None:
+            return messages
+        return [
+            {"role": "system", "content": self.generate_system_prompt()},
             {"role": "user", "content": user_query}
         ]
 
+    def _completion_kwargs(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return dict(
+            api_key=self.api_key,
+            api_base=self.api_base,
+            request_timeout=self.transport.timeout,
+            model=self.llm_settings.get('model', self.model),
+            messages=messages,
+            max_tokens=self.llm_settings.get('max_tokens', 150),
+            temperature=self.llm_settings.get('temperature', 0.7),
+            top_p=self.llm_settings.get('top_p', 0.9),
+            frequency_penalty=self.llm_settings.get('frequency_penalty', 0.0),
+            presence_penalty=self.llm_settings.get('presence_penalty', 0.6),
+            stop=self.llm_settings.get('stop_sequences', ["\n", " User:", f" {self.character_profile.get('name', 'Alexandra')}:"]),
+        )
+
+    def _require_api_key(self) -> None:
+        # Checked on the first request rather than at startup, so processes that never call the
+        # LLM (such as ingestion) need no OpenAI credentials
+        if not self.api_key:
+            Config().require('openai')
+
+    def _create(self, **kwargs: Any) -> Any:
+        self._require_api_key()
+        self.transport.bind_openai()
+        return openai.ChatCompletion.create(**kwargs)
+
+    async def _acreate(self, **kwargs: Any) -> Any:
+        self._require_api_key()
+        # openai reads its aiohttp session from a context variable when the request is made
+        token = openai.aiosession.set(await self.transport.aiohttp_session())
         try:
-            response = openai.ChatCompletion.create(
-                model=self.llm_settings.get('model', self.model),
-                messages=messages,
-                max_tokens=self.llm_settings.get('max_tokens', 150),
-                temperature=self.llm_settings.get('temperature', 0.7),
-                top_p=self.llm_settings.get('top_p', 0.9),
-                frequency_penalty=self.llm_settings.get('frequency_penalty', 0.0),
-                presence_penalty=self.llm_settings.get('presence_penalty', 0.6),
-                stop=self.llm_settings.get('stop_sequences', ["\n", " User:", f" {self.character_profile.get('name', 'Alexandra')}:"]),
-            )
+            return await openai.ChatCompletion.acreate(**kwargs)
+        finally:
+            openai.aiosession.reset(token)
+
+    def _fallback_responses(self) -> List[str]:
+        return self.llm_settings.get('fallback_responses', [
+            "I'm sorry, but I couldn't process your request at the moment.",
+            "Apologies, I'm having trouble understanding that. Could you please rephrase?",
+            "I'm here to help! Let's try a different question."
+        ])
+
+    def _fallback_response(self) -> str:
+        fallback_responses = self._fallback_responses()
+        return fallback_responses[0] if fallback_responses else "I'm sorry, but I couldn't process your request at the moment."
+
+    def is_fallback_response(self, response: str) -> bool:
+        """
+        Check whether a response is a canned fallback rather than a generated answer.
+
+        :param response: The response text.
+        :return: True if the response is one of the fallback responses.
+        """
+        return response in self._fallback_responses() or response == self._fallback_response()
+
+    def generate_response(self, user_query: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> str:
+        """
+        Generate a response from the OpenAI LLM.
+
+        :param user_query: The user's query string, used when no messages are given.
+        :param messages: Optional pre-built chat messages (system prompt included).
+        :return: The LLM's response text.
+        """
+        try:
+            response = self._create(**self._completion_kwargs(self._build_messages(user_query, messages)))
             reply = response.choices[0].message['content'].strip()
             logger.debug("Generated response from OpenAI.")
             return reply
         except Exception as e:
             logger.error(f"Error generating response from OpenAI: {e}")
-            fallback_responses = self.llm_settings.get('fallback_responses', [
-                "I'm sorry, but I couldn't process your request at the moment.",
-                "Apologies, I'm having trouble understanding that. Could you please rephrase?",
-                "I'm here to help! Let's try a different question."
-            ])
-            return fallback_responses[0] if fallback_responses else "I'm sorry, but I couldn't process your request at the moment."
+            return self._fallback_response()
+
+    async def agenerate_response(self, user_query: Optional[str] = None, messages: Optional[List[Dict[str, str]]] = None) -> str:
+        """
+        Generate a response from the OpenAI LLM without blocking the event loop.
+
+        :param user_query: The user's query string, used when no messages are given.
+        :param messages: Optional pre-built chat messages (system prompt included).
+        :return: The LLM's response text.
+        """
+        try:
+            response = await self._acreate(**self._completion_kwargs(self._build_messages(user_query, messages)))
+            reply = response.choices[0].message['content'].strip()
+            logger.debug("Generated response from OpenAI.")
+            return reply
+        except Exception as e:
+            logger.error(f"Error generating response from OpenAI: {e}")
+            return self._fallback_response()
+
+    def stream_response(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Generate a response from the OpenAI LLM, yielding text as it is produced.
+
+        If the request fails before any text arrives, the fallback response is yielded instead;
+        if it fails midway, StreamInterruptedError is raised after the text received so far, so
+        callers can tell a truncated response from a complete one.
+
+        :param messages: Chat messages (system prompt included).
+        :return: Iterator over pieces of the response text.
+        :raises StreamInterruptedError: If the stream failed after yielding part of the response.
+        """
+        produced = False
+        try:
+            for chunk in self._create(stream=True, **self._completion_kwargs(messages)):
+                content = chunk.choices[0].delta.get('content')
+                if content:
+                    produced = True
+                    yield content
+            logger.debug("Streamed response from OpenAI.")
+        except Exception as e:
+            logger.error(f"Error streaming response from OpenAI: {e}")
+            if produced:
+                raise StreamInterruptedError(str(e)) from e
+            yield self._fallback_response()
+
+    async def astream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Generate a response like stream_response, without blocking the event loop.
+
+        :param messages: Chat messages (system prompt included).
+        :return: Async iterator over pieces of the response text.
+        :raises StreamInterruptedError: If the stream failed after yielding part of the response.
+        """
+        produced = False
+        try:
+            async for chunk in await self._acreate(stream=True, **self._completion_kwargs(messages)):
+                content = chunk.choices[0].delta.get('content')
+                if content:
+                    produced = True
+                    yield content
+            logger.debug("Streamed response from OpenAI.")
+        except Exception as e:
+            logger.error(f"Error streaming response from OpenAI: {e}")
+            if produced:
+                raise StreamInterruptedError(str(e)) from e
+            yield self._fallback_response()
@@ -0,0 +1,246 @@
+# utils/rate_limiter.py
+
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bucket state: (tokens, updated_at, blocked_until), with times as Unix timestamps so that
+# several processes sharing one store agree on them.
+BucketState = Tuple[float, float, float]
+
+class MemoryBucketStore:
+    def __init__(self):
+        """
+        Initialize a bucket store local to this process.
+        """
+        self._buckets: Dict[str, BucketState] = {}
+        self._lock = Lock()
+
+    def update(self, key: str, fn: Callable[[Optional[BucketState]], Tuple[BucketState, Any]]) -> Any:
+        """
+        Atomically read, transform and write one bucket.
+
+        :param key: Bucket key.
+        :param fn: Function taking the current state (None if new) and returning (new state, result).
+        :return: The result returned by ``fn``.
+        """
+        with self._lock:
+            state, result = fn(self._buckets.get(key))
+            self._buckets[key] = state
+        return result
+
+    def close(self) -> None:
+        pass
+
+class SQLiteBucketStore:
+    def __init__(self, db_path: str):
+        """
+        Initialize a bucket store shared by every process using the same SQLite file.
+
+        Each update runs in an immediate transaction, so concurrent processes serialize on the
+        file lock for the duration of one read-modify-write.
+
+        :param db_path: Path of the SQLite file.
+        """
+        self.db_path = db_path
+        self._lock = Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, blocked_until REAL NOT NULL)"
+        )
+
+    def update(self, key: str, fn: Callable[[Optional[BucketState]], Tuple[BucketState, Any]]) -> Any:
+        """
+        Atomically read, transform and write one bucket.
+
+        :param key: Bucket key.
+        :param fn: Function taking the current state (None if new) and returning (new state, result).
+        :return: The result returned by ``fn``.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated_at, blocked_until FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                state, result = fn(tuple(row) if row else None)
+                self._conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (key, *state))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class RateLimiter:
+    def __init__(self, limits: Mapping[str, Tuple[float, float]], db_path: Optional[str] = None, namespace: str = ''):
+        """
+        Initialize token-bucket rate limiting per endpoint.
+
+        Each endpoint has a bucket holding up to ``capacity`` tokens that refills at
+        ``capacity / period`` tokens per second. A caller takes one token under a short lock and
+        is told how long to wait; tokens may go negative, which reserves a future slot for the
+        caller, so waiting never happens while the bucket is locked. A bucket can also be
+        blocked until a time reported by the API (its rate-limit reset).
+
+        :param limits: Mapping of endpoint to (capacity, period in seconds); a capacity of zero or
+            less disables limiting for that endpoint, as does an endpoint missing from the mapping.
+        :param db_path: Optional SQLite file holding bucket state, shared by all processes using it.
+        :param namespace: Prefix for bucket keys, separating limiters that share a file.
+        """
+        self.limits = dict(limits)
+        self.namespace = namespace
+        self.store = MemoryBucketStore()
+        if db_path:
+            try:
+                self.store = SQLiteBucketStore(db_path)
+                logger.info(f"Sharing rate-limit state through {db_path}.")
+            except Exception as e:
+                logger.warning(f"Shared rate-limit state disabled, could not open '{db_path}': {e}")
+
+    def _key(self, endpoint: str) -> str:
+        return f"{self.namespace}:{endpoint}" if self.namespace else endpoint
+
+    def reserve(self, endpoint: str, tokens: float = 1) -> float:
+        """
+        Take tokens from an endpoint's bucket without waiting.
+
+        :param endpoint: Endpoint name.
+        :param tokens: Number of tokens to take.
+        :return: Seconds the caller must wait before making the call.
+        """
+        capacity, period = self.limits.get(endpoint, (0, 0))
+        if capacity <= 0 or period <= 0:
+            return 0.0
+        rate = capacity / period
+
+        def take(state: Optional[BucketState]) -> Tuple[BucketState, float]:
+            now = time.time()
+            available, updated_at, blocked_until = state or (capacity, now, 0.0)
+            available = min(capacity, available + max(0.0, now - updated_at) * rate) - tokens
+            delay = max(-available / rate, blocked_until - now, 0.0)
+            return (available, now, blocked_until), delay
+
+        try:
+            return self.store.update(self._key(endpoint), take)
+        except Exception as e:
+            logger.error(f"Failed to reserve a '{endpoint}' rate-limit slot: {e}")
+            return 0.0
+
+    def block_until(self, endpoint: str, until: float) -> None:
+        """
+        Hold back an endpoint until a point in time, e.g. the reset reported by the API.
+
+        :param endpoint: Endpoint name.
+        :param until: Unix timestamp before which no call may start.
+        """
+        capacity = self.limits.get(endpoint, (0, 0))[0]
+
+        def block(state: Optional[BucketState]) -> Tuple[BucketState, None]:
+            now = time.time()
+            available, updated_at, blocked_until = state or (capacity, now, 0.0)
+            return (available, updated_at, max(blocked_until, until)), None
+
+        try:
+            self.store.update(self._key(endpoint), block)
+            logger.warning(f"Rate limit for '{endpoint}' exhausted; holding calls for {max(0.0, until - time.time()):.0f} seconds.")
+        except Exception as e:
+            logger.error(f"Failed to record the '{endpoint}' rate-limit reset: {e}")
+
+    def observe(self, endpoint: str, headers: Mapping[str, str]) -> Optional[float]:
+        """
+        Apply the rate-limit headers of an API response to an endpoint's bucket.
+
+        :param endpoint: Endpoint name.
+        :param headers: Response headers (``x-rate-limit-remaining`` and ``x-rate-limit-reset``).
+        :return: The reset time if the endpoint is now blocked until it, otherwise None.
+        """
+        remaining = headers.get('x-rate-limit-remaining')
+        reset = headers.get('x-rate-limit-reset')
+        if reset is None or (remaining is not None and int(remaining) > 0):
+            return None
+        self.block_until(endpoint, float(reset))
+        return float(reset)
+
+    def acquire(self, endpoint: str) -> None:
+        """
+        Block the calling thread until the endpoint may be called.
+
+        This is for callers running on a thread of their own, such as the command-line loop.
+        Coroutines use aacquire, and callers able to reschedule the work (such as the
+        MentionWorker pool) take the delay from reserve instead.
+
+        :param endpoint: Endpoint name.
+        """
+        delay = self.reserve(endpoint)
+        if delay > 0:
+            logger.debug(f"Rate limit for '{endpoint}' reached. Sleeping for {delay:.2f} seconds.")
+            time.sleep(delay)
+
+    async def aacquire(self, endpoint: str) -> None:
+        """
+        Wait until the endpoint may be called without blocking the event loop.
+
+        :param endpoint: Endpoint name.
+        """
+        delay = self.reserve(endpoint)
+        if delay > 0:
+            logger.debug(f"Rate limit for '{endpoint}' reached. Waiting {delay:.2f} seconds.")
+            await asyncio.sleep(delay)
+
+    def close(self) -> None:
+        """
+        Close the shared state store.
+        """
+        self.store.close()
+
+class RetryPolicy:
+    STRATEGIES = ('retry_with_exponential_backoff', 'retry', 'fail_gracefully')
+
+    def __init__(self, strategy: str = 'retry_with_exponential_backoff', max_attempts: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Initialize the retry policy named by an ``error_handling_strategy``.
+
+        ``retry_with_exponential_backoff`` waits a random time up to ``base_delay * 2 ** n``
+        (capped at ``max_delay``) before retry n; ``retry`` waits ``base_delay`` with jitter;
+        ``fail_gracefully`` never retries. Unknown strategies fall back to exponential backoff.
+
+        :param strategy: Strategy name from the character's interaction policies.
+        :param max_attempts: Maximum number of attempts, including the first.
+        :param base_delay: Base delay in seconds.
+        :param max_delay: Upper bound of a single delay in seconds.
+        """
+        if strategy not in self.STRATEGIES:
+            logger.warning(f"Unknown error handling strategy '{strategy}'; using retry_with_exponential_backoff.")
+            strategy = 'retry_with_exponential_backoff'
+        self.strategy = strategy
+        self.max_attempts = 1 if strategy == 'fail_gracefully' else max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> Optional[float]:
+        """
+        Return the delay before retrying a failed attempt.
+
+        :param attempt: Number of the failed attempt, starting at 0.
+        :return: Seconds to wait, or None if no attempts remain.
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if self.strategy == 'retry':
+            return self.base_delay * random.uniform(0.5, 1.5)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
@@ -0,0 +1,131 @@
+# utils/response_cache.py
+
+import logging
+import time
+import uuid
+from threading import Lock
+from typing import Any, Dict, List, Optional
+import numpy as np
+from utils.lance_db_utils import LanceDBUtils, embedding_matrix, quote_sql_literal
+
+logger = logging.getLogger(__name__)
+
+class SemanticResponseCache:
+    def __init__(self, db_utils: LanceDBUtils, persona: str, table_name: str = 'response_cache',
+                 similarity_threshold: float = 0.95, ttl_seconds: float = 24 * 60 * 60, candidates: int = 5):
+        """
+        Initialize a cache of generated responses keyed by query meaning.
+
+        A lookup searches the stored query vectors nearest to the new query's vector and returns
+        the response of the most similar one whose cosine similarity reaches the threshold.
+        Entries are scoped to one persona and expire after ``ttl_seconds``; expired rows are
+        ignored by lookups and deleted periodically.
+
+        :param db_utils: LanceDBUtils holding the cache table.
+        :param persona: Persona the cached responses belong to.
+        :param table_name: Name of the cache table.
+        :param similarity_threshold: Minimum cosine similarity between queries for a hit.
+        :param ttl_seconds: Lifetime of a cached response, in seconds.
+        :param candidates: Number of nearest stored queries considered per lookup.
+        """
+        self.db_utils = db_utils
+        self.persona = persona
+        self.table_name = table_name
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.candidates = max(1, candidates)
+        self._lock = Lock()
+        self._last_prune = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, query_embedding: List[float]) -> Optional[str]:
+        """
+        Find a cached response for a query.
+
+        :param query_embedding: Embedding of the user's query.
+        :return: The cached response, or None on a miss.
+        """
+        try:
+            cutoff = time.time() - self.ttl_seconds
+            # Filtering before the vector search keeps other personas' and expired entries from crowding out hits
+            query = self.db_utils.search(self.table_name, query_embedding, self.candidates,
+                                         where=f"persona = {quote_sql_literal(self.persona)} AND created_at >= {cutoff}", prefilter=True)
+            if query is None:
+                self._record(False)
+                return None
+            results = query.select(['response', 'embedding', '_distance']).to_arrow()
+
+            best_response, best_similarity = None, self.similarity_threshold
+            if results.num_rows:
+                vector = np.asarray(query_embedding, dtype=np.float32)
+                stored = embedding_matrix(results)
+                similarities = stored @ vector / ((np.linalg.norm(stored, axis=1) * np.linalg.norm(vector)) + 1e-12)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= best_similarity:
+                    best_response, best_similarity = results.column('response')[best].as_py(), float(similarities[best])
+            self._record(best_response is not None)
+            if best_response is not None:
+                logger.debug(f"Response cache hit (similarity {best_similarity:.3f}).")
+            return best_response
+        except Exception as e:
+            logger.error(f"Error looking up the response cache: {e}")
+            self._record(False)
+            return None
+
+    def store(self, user_query: str, query_embedding: List[float], response: str) -> None:
+        """
+        Cache the response generated for a query.
+
+        :param user_query: The user's query string.
+        :param query_embedding: Embedding of the user's query.
+        :param response: The generated response.
+        """
+        try:
+            self.db_utils.add_data(self.table_name, [{
+                'id': uuid.uuid4().hex,
+                'persona': self.persona,
+                'query': user_query,
+                'response': response,
+                'created_at': time.time(),
+                'embedding': query_embedding
+            }])
+            with self._lock:
+                self.stores += 1
+                prune = time.time() - self._last_prune >= self.ttl_seconds / 4
+                if prune:
+                    self._last_prune = time.time()
+            if prune:
+                self.prune()
+        except Exception as e:
+            logger.error(f"Error storing response in cache: {e}")
+
+    def prune(self) -> None:
+        """
+        Delete this persona's expired entries.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        self.db_utils.delete_where(self.table_name, f"persona = {quote_sql_literal(self.persona)} AND created_at < {cutoff}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters.
+
+        :return: Dictionary with hits, misses, stores and hit_rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,162 @@
+# utils/system_prompt.py
+
+import hashlib
+import json
+import logging
+import os
+from threading import Lock
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from utils.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+def render_system_prompt(character_profile: Dict[str, Any]) -> str:
+    """
+    Render the persona system prompt from a character profile.
+
+    :param character_profile: Dictionary containing the character's detailed profile.
+    :return: The system prompt string.
+    """
+    parts: List[str] = [
+        f"You are {character_profile.get('name', 'an AI assistant')}.",
+        f" {character_profile.get('description', '')}\n\n"
+    ]
+
+    # History
+    history = character_profile.get('history', {})
+    if history:
+        parts.append("### History\n")
+        parts.append(f"Creation Date: {history.get('creation_date', 'Unknown')}.\n")
+        parts.append(f"Creator: {history.get('creator', 'Unknown')}.\n")
+        parts.append(f"Purpose: {history.get('purpose', 'Unknown')}.\n\n")
+
+    # Background
+    background = character_profile.get('background', {})
+    if background:
+        parts.append("### Background\n")
+        education = background.get('education', {})
+        if education:
+            parts.append("Education:\n")
+            for degree_level, details in education.items():
+                parts.append(f"- {degree_level.capitalize()}: {details.get('degree', 'Unknown')} from {details.get('institution', 'Unknown')} ({details.get('graduation_year', 'Unknown')}).\n")
+        experience = background.get('experience', '')
+        if experience:
+            parts.append(f"\nExperience: {experience}\n\n")
+
+    # Life Story
+    life_story = character_profile.get('life_story', '')
+    if life_story:
+        parts.append(f"### Life Story\n{life_story}\n\n")
+
+    # Personal Anecdotes
+    anecdotes = character_profile.get('personal_anecdotes', [])
+    if anecdotes:
+        parts.append("### Personal Anecdotes\n")
+        parts.extend(f"- {anecdote}\n" for anecdote in anecdotes)
+        parts.append("\n")
+
+    # Personality Traits
+    traits = character_profile.get('personality_traits', {})
+    active_traits = [trait.replace('_', ' ').capitalize() for trait, value in traits.items() if value]
+    if active_traits:
+        parts.append(f"### Personality Traits\n{', '.join(active_traits)}.\n\n")
+
+    # Likes & Dislikes
+    likes = character_profile.get('likes', [])
+    dislikes = character_profile.get('dislikes', [])
+    if likes:
+        parts.append(f"### Likes\n{', '.join(likes)}.\n\n")
+    if dislikes:
+        parts.append(f"### Dislikes\n{', '.join(dislikes)}.\n\n")
+
+    # Things It Is Against
+    things_against = character_profile.get('things_it_is_against', [])
+    if things_against:
+        parts.append(f"### Do Not Engage In\n{', '.join(things_against)}.\n\n")
+
+    # Communication Style & Tone
+    communication_style = character_profile.get('communication_style', '')
+    tone = character_profile.get('tone', '')
+    if communication_style:
+        parts.append(f"### Communication Style\n{communication_style}.\n\n")
+    if tone:
+        parts.append(f"### Tone\n{tone}.\n\n")
+
+    # Response Format
+    response_format = character_profile.get('response_format', {})
+    if response_format:
+        parts.append("### Response Format\n")
+        parts.extend(f"- {key.replace('_', ' ').capitalize()}: {value}.\n" for key, value in response_format.items())
+        parts.append("\n")
+
+    # Additional Instructions
+    additional_instructions = character_profile.get('additional_instructions', '')
+    if additional_instructions:
+        parts.append(f"### Additional Instructions\n{additional_instructions}\n\n")
+
+    return ''.join(parts)
+
+class CompiledPrompt(NamedTuple):
+    text: str
+    token_count: int
+    source_hash: str
+
+class SystemPromptCache:
+    def __init__(self, character_config_path: Optional[str] = None, character_profile: Optional[Dict[str, Any]] = None,
+                 model: str = 'gpt-4'):
+        """
+        Initialize a cache holding the persona system prompt compiled once.
+
+        With a character file, each lookup only stats the file: the prompt is recompiled when
+        its mtime or size changes and the content hash differs, so touching the file without
+        editing it costs a single read. Without a file the prompt is compiled once from
+        ``character_profile``.
+
+        :param character_config_path: Optional path of the character JSON file to watch.
+        :param character_profile: Character profile used when there is no file or it cannot be read.
+        :param model: Model whose tokenizer counts the prompt's tokens.
+        """
+        self.character_config_path = character_config_path
+        self.character_profile = character_profile or {}
+        self.model = model
+        self._lock = Lock()
+        self._stat: Optional[Tuple[int, int]] = None
+        self._compiled: Optional[CompiledPrompt] = None
+
+    def _compile(self, profile: Dict[str, Any], source_hash: str) -> CompiledPrompt:
+        text = render_system_prompt(profile)
+        compiled = CompiledPrompt(text=text, token_count=count_tokens(text, self.model), source_hash=source_hash)
+        logger.info(f"Compiled system prompt ({compiled.token_count} tokens).")
+        return compiled
+
+    def _fallback(self) -> CompiledPrompt:
+        if self._compiled is None:
+            source_hash = hashlib.sha256(json.dumps(self.character_profile, sort_keys=True).encode('utf-8')).hexdigest()
+            self._compiled = self._compile(self.character_profile, source_hash)
+        return self._compiled
+
+    def get(self) -> CompiledPrompt:
+        """
+        Return the compiled system prompt, recompiling it if the character file changed.
+
+        :return: The prompt text, its token count and the hash of its source.
+        """
+        with self._lock:
+            if not self.character_config_path:
+                return self._fallback()
+            try:
+                stat = os.stat(self.character_config_path)
+                key = (stat.st_mtime_ns, stat.st_size)
+                if self._compiled is not None and key == self._stat:
+                    return self._compiled
+                with open(self.character_config_path, 'rb') as file:
+                    raw = file.read()
+                source_hash = hashlib.sha256(raw).hexdigest()
+                if self._compiled is None or source_hash != self._compiled.source_hash:
+                    self.character_profile = json.loads(raw)
+                    self._compiled = self._compile(self.character_profile, source_hash)
+                self._stat = key
+                return self._compiled
+            except Exception as e:
+                logger.error(f"Failed to compile system prompt from {self.character_config_path}: {e}")
+                return self._fallback()
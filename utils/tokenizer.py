@@ -0,0 +1,64 @@
+# utils/tokenizer.py
+
+import logging
+from functools import lru_cache
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio of English text, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> Optional[Any]:
+    """
+    Return the tiktoken encoding for a model, loading it once per process.
+
+    :param model: OpenAI model name.
+    :return: The encoding, or None if tiktoken or the encoding is unavailable.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken is not installed; token counts are estimated from text length.")
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding('cl100k_base')
+    except Exception as e:
+        logger.warning(f"Failed to load the tiktoken encoding for '{model}'; token counts are estimated: {e}")
+        return None
+
+def count_tokens(text: str, model: str = 'gpt-4') -> int:
+    """
+    Count the tokens of a text for a model.
+
+    :param text: The text to count.
+    :param model: OpenAI model name.
+    :return: Number of tokens (estimated if no encoding is available).
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = 'gpt-4') -> str:
+    """
+    Cut a text down to at most a number of tokens.
+
+    :param text: The text to truncate.
+    :param max_tokens: Maximum number of tokens to keep.
+    :param model: OpenAI model name.
+    :return: The longest prefix of the text within the limit.
+    """
+    if max_tokens <= 0:
+        return ''
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,238 @@
+# utils/tweet_splitter.py
+
+import logging
+import unicodedata
+from functools import lru_cache
+from itertools import accumulate
+from typing import List, Tuple
+import regex
+
+logger = logging.getLogger(__name__)
+
+# Twitter's weighted length: code points in these ranges count 1 and all others 2, every URL
+# counts 23 and an emoji sequence counts 2 however many code points it has
+LIGHT_RANGES = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+URL_WEIGHT = 23
+EMOJI_WEIGHT = 2
+EMOJI_RANGES = ((0x1F000, 0x1FAFF), (0x2600, 0x27BF), (0x2300, 0x23FF), (0x2B00, 0x2BFF))
+EMOJI_COMPONENTS = {0x200D, 0xFE0F, 0x20E3}
+
+URL_PATTERN = regex.compile(r'https?://\S+|www\.\S+\.\S+')
+GRAPHEME_PATTERN = regex.compile(r'\X')
+SENTENCE_ENDS = set('.!?…')
+FULL_WIDTH_SENTENCE_ENDS = set('。！？')
+CLOSERS = set('"\')]»”’」』')
+
+# Boundary kinds of a cut position
+NO_BREAK, WORD_BREAK, SENTENCE_BREAK = 0, 1, 2
+
+def _code_point_weight(code_point: int) -> int:
+    for low, high in LIGHT_RANGES:
+        if low <= code_point <= high:
+            return 1
+    return 2
+
+@lru_cache(maxsize=8192)
+def cluster_weight(cluster: str) -> int:
+    """
+    Return the weighted length of one grapheme cluster.
+
+    :param cluster: A grapheme cluster.
+    :return: Its weight: 2 for an emoji sequence, otherwise the sum of its code point weights.
+    """
+    code_points = [ord(char) for char in cluster]
+    if any(code_point in EMOJI_COMPONENTS or any(low <= code_point <= high for low, high in EMOJI_RANGES)
+           for code_point in code_points):
+        return EMOJI_WEIGHT
+    return sum(_code_point_weight(code_point) for code_point in code_points)
+
+def tokenize(text: str) -> Tuple[List[str], List[int]]:
+    """
+    Split text into units that are never broken apart: URLs and grapheme clusters.
+
+    :param text: NFC-normalized text.
+    :return: The units and their weighted lengths.
+    """
+    units: List[str] = []
+    weights: List[int] = []
+    position = 0
+
+    def add_clusters(segment: str) -> None:
+        clusters = GRAPHEME_PATTERN.findall(segment)
+        units.extend(clusters)
+        weights.extend(map(cluster_weight, clusters))
+
+    for match in URL_PATTERN.finditer(text):
+        add_clusters(text[position:match.start()])
+        units.append(match.group())
+        weights.append(URL_WEIGHT)
+        position = match.end()
+    add_clusters(text[position:])
+    return units, weights
+
+def weighted_length(text: str) -> int:
+    """
+    Return the length of a text as Twitter counts it.
+
+    :param text: The text to measure.
+    :return: Its weighted length.
+    """
+    return sum(tokenize(unicodedata.normalize('NFC', text))[1])
+
+class TweetSegmenter:
+    def __init__(self, character_limit: int = 280, prefix: str = '', suffix: str = '', numbering: bool = False):
+        """
+        Initialize a segmenter that cuts text into tweets by Twitter's weighted length.
+
+        Lengths are weighted as Twitter counts them (CJK and emoji count double, URLs count 23),
+        grapheme clusters and URLs are never split, and each tweet ends at the last sentence
+        boundary that fits if that fills at least half the tweet, otherwise at the last word
+        boundary, and only cuts inside a word longer than a whole tweet. Weights are summed
+        once into prefix sums and every cut is found in a single forward scan, so splitting
+        runs in time linear in the length of the text.
+
+        Text can be split whole with ``split`` or fed incrementally with ``feed`` and ``flush``,
+        which emit the same tweets as soon as they can no longer grow.
+
+        :param character_limit: Maximum weighted length of a tweet.
+        :param prefix: Text put before every tweet (e.g. an emoji).
+        :param suffix: Text put after every tweet (e.g. hashtags), separated by a space.
+        :param numbering: Append the position in the thread: ``k/n`` when splitting whole text
+            of more than one tweet, ``k/`` when feeding incrementally.
+        """
+        self.character_limit = character_limit
+        self.prefix = prefix
+        self.suffix = f" {suffix}" if suffix else ''
+        self.numbering = numbering
+        self.base_capacity = character_limit - weighted_length(self.prefix) - weighted_length(self.suffix)
+        self._buffer = ''
+        self._emitted = 0
+
+    def _plan(self, units: List[str], weights: List[int], capacity: int) -> List[Tuple[int, int]]:
+        """
+        Choose the tweets of a sequence of units.
+
+        :return: (start, end) unit ranges of the tweets, with surrounding whitespace excluded.
+        """
+        count = len(units)
+        capacity = max(1, capacity)
+        prefix_sums = list(accumulate(weights, initial=0))
+        is_space = list(map(str.isspace, units))
+
+        # For each cut position: its boundary kind, and where the text before it ends once
+        # trailing whitespace is dropped
+        kinds = [NO_BREAK] * (count + 1)
+        trimmed = list(range(count + 1))
+        sentence_pending = False
+        for index, unit in enumerate(units):
+            position = index + 1
+            if is_space[index]:
+                trimmed[position] = trimmed[index]
+                kinds[position] = SENTENCE_BREAK if sentence_pending else WORD_BREAK
+            elif unit[-1] in FULL_WIDTH_SENTENCE_ENDS:
+                kinds[position] = SENTENCE_BREAK
+                sentence_pending = True
+            elif unit[-1] in SENTENCE_ENDS or (sentence_pending and unit in CLOSERS):
+                sentence_pending = True
+            else:
+                sentence_pending = False
+
+        tweets = []
+        start = 0
+        while True:
+            while start < count and is_space[start]:
+                start += 1
+            if start >= count:
+                return tweets
+            sentence = word = 0
+            fit = start
+            cut = count
+            position = start + 1
+            while position <= count:
+                if prefix_sums[trimmed[position]] - prefix_sums[start] > capacity:
+                    if sentence and 2 * (prefix_sums[trimmed[sentence]] - prefix_sums[start]) >= capacity:
+                        cut = sentence
+                    else:
+                        cut = word or sentence or max(fit, start + 1)
+                    break
+                fit = position
+                if kinds[position] == SENTENCE_BREAK:
+                    sentence = position
+                elif kinds[position] == WORD_BREAK:
+                    word = position
+                position += 1
+            tweets.append((start, trimmed[cut]))
+            start = cut
+
+    def _bodies(self, text: str, numbering_width: int = 0) -> List[str]:
+        units, weights = tokenize(text)
+        offsets = list(accumulate(map(len, units), initial=0))
+        plan = self._plan(units, weights, self.base_capacity - numbering_width)
+        return [text[offsets[start]:offsets[end]] for start, end in plan]
+
+    def _format(self, body: str, label: str = '') -> str:
+        return f"{self.prefix}{body}{self.suffix}{f' {label}' if label else ''}"
+
+    def split(self, text: str) -> List[str]:
+        """
+        Split a complete text into tweets.
+
+        :param text: The text to split.
+        :return: List of tweets.
+        """
+        text = unicodedata.normalize('NFC', text)
+        bodies = self._bodies(text)
+        if not self.numbering or len(bodies) <= 1:
+            return [self._format(body) for body in bodies]
+
+        # Reserve room for " k/n"; widen and re-plan if the thread needs more digits
+        digits = 1
+        while True:
+            bodies = self._bodies(text, numbering_width=2 + 2 * digits)
+            if len(bodies) < 10 ** digits:
+                break
+            digits += 1
+        total = len(bodies)
+        return [self._format(body, f"{index}/{total}") for index, body in enumerate(bodies, start=1)]
+
+    def _stream_numbering_width(self) -> int:
+        return 5 if self.numbering else 0  # Room for " 999/"
+
+    def _stream_format(self, body: str) -> str:
+        self._emitted += 1
+        return self._format(body, f"{self._emitted}/" if self.numbering else '')
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add text and return the tweets it completed.
+
+        Only text up to the last whitespace is planned, so a word, URL or grapheme cluster that
+        is still arriving is never cut.
+
+        :param text: The next piece of text.
+        :return: Tweets that are complete, in order.
+        """
+        self._buffer = unicodedata.normalize('NFC', self._buffer + text)
+        stable_end = max(self._buffer.rfind(' '), self._buffer.rfind('\n')) + 1
+        if stable_end == 0:
+            return []
+        stable = self._buffer[:stable_end]
+        units, weights = tokenize(stable)
+        if sum(weights) <= self.base_capacity - self._stream_numbering_width():
+            return []
+        offsets = list(accumulate(map(len, units), initial=0))
+        plan = self._plan(units, weights, self.base_capacity - self._stream_numbering_width())
+        if len(plan) <= 1:
+            return []
+        tweets = [self._stream_format(stable[offsets[start]:offsets[end]]) for start, end in plan[:-1]]
+        self._buffer = self._buffer[offsets[plan[-1][0]]:]
+        return tweets
+
+    def flush(self) -> List[str]:
+        """
+        Return the remaining text as the final tweets.
+
+        :return: The last tweets, or nothing if no text is left.
+        """
+        text, self._buffer = self._buffer, ''
+        return [self._stream_format(body) for body in self._bodies(text, self._stream_numbering_width())]
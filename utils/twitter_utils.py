@@ -1,71 +1,213 @@
 # utils/twitter_utils.py
 
-import tweepy
+import asyncio
 import logging
-from typing import Optional
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
 from utils.config import Config
+from utils.http_transport import HTTPTransport
+from utils.lazy_import import lazy_import
+from utils.rate_limiter import RateLimiter, RetryPolicy
 import time
 
+tweepy = lazy_import('tweepy')
+
 logger = logging.getLogger(__name__)
 
+# Per-user limits of the v1.1 endpoints used here, as (requests, window in seconds)
+TWITTER_RATE_LIMITS = {
+    'tweet': (300, 3 * 60 * 60),
+    'direct_message': (1000, 24 * 60 * 60),
+    'user_lookup': (900, 15 * 60),
+    'mentions': (75, 15 * 60),
+    'direct_message_list': (15, 15 * 60),
+}
+
 class TwitterAPI:
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 transport: Optional[HTTPTransport] = None):
+        """
+        Initialize the Twitter client. Credentials are checked and the client authenticates on
+        its first request, so constructing it costs no network round trip.
+
+        Every request first takes a token from its endpoint's bucket in ``rate_limiter``. Rate-limit
+        responses block the endpoint until the reset time the API reports, and rate-limit, server
+        and connection errors are retried according to ``retry_policy``.
+
+        :param rate_limiter: Limiter with buckets for the TWITTER_RATE_LIMITS endpoints; by default
+            one sharing its state through the configured rate-limit state file.
+        :param retry_policy: Retry policy for failed requests; exponential backoff by default.
+        :param transport: Shared HTTP transport whose pooled connections carry the requests; a
+            private one is created if omitted.
+        """
         config = Config()
         self.api_key = config.twitter_api_key
         self.api_secret = config.twitter_api_secret
         self.access_token = config.twitter_access_token
         self.access_token_secret = config.twitter_access_token_secret
+        self.transport = transport or HTTPTransport()
+        self._api: Optional[Any] = None
+        self._user_id: Optional[int] = None
+        self._auth_lock = Lock()
+        self.rate_limiter = rate_limiter or RateLimiter(TWITTER_RATE_LIMITS, db_path=config.rate_limit_state_path or None)
+        self.retry_policy = retry_policy or RetryPolicy()
 
-        try:
-            auth = tweepy.OAuth1UserHandler(
-                self.api_key,
-                self.api_secret,
-                self.access_token,
-                self.access_token_secret
-            )
-            self.api = tweepy.API(auth, wait_on_rate_limit=True)
-            self.api.verify_credentials()
-            logger.info("Authenticated with Twitter API.")
-        except Exception as e:
-            logger.error(f"Failed to authenticate with Twitter API: {e}")
-            raise
+    def _authenticate(self) -> None:
+        with self._auth_lock:
+            if self._api is not None:
+                return
+            try:
+                Config().require('twitter')
+                auth = tweepy.OAuth1UserHandler(
+                    self.api_key,
+                    self.api_secret,
+                    self.access_token,
+                    self.access_token_secret
+                )
+                # Rate limits are handled by our own limiter instead of sleeping inside tweepy
+                api = tweepy.API(auth, wait_on_rate_limit=False, timeout=self.transport.timeout)
+                # tweepy closes its session after every request; the shared one keeps its connections
+                api.session = self.transport.session
+                self._user_id = api.verify_credentials().id
+                self._api = api
+                logger.info("Authenticated with Twitter API.")
+            except Exception as e:
+                logger.error(f"Failed to authenticate with Twitter API: {e}")
+                raise
+
+    @property
+    def api(self) -> Any:
+        """
+        Return the tweepy API client, authenticating on first use.
+        """
+        if self._api is None:
+            self._authenticate()
+        return self._api
+
+    @property
+    def user_id(self) -> int:
+        """
+        Return the ID of the authenticated account, authenticating on first use.
+        """
+        if self._api is None:
+            self._authenticate()
+        return self._user_id
+
+    async def _aapi(self) -> Any:
+        # Authenticate in a thread so the first request does not block the event loop
+        if self._api is None:
+            await asyncio.to_thread(self._authenticate)
+        return self._api
 
-    def post_tweet(self, message: str) -> None:
+    def _retry_delay(self, endpoint: str, error: Exception, attempt: int) -> float:
+        """
+        Decide whether a failed request is retried.
+
+        :param endpoint: Endpoint of the failed request.
+        :param error: The raised error.
+        :param attempt: Number of the failed attempt, starting at 0.
+        :return: Seconds to back off before the next attempt (the wait for any reset overlaps it).
+        :raises Exception: The error itself if it is not retryable or no attempts remain.
+        """
+        if isinstance(error, tweepy.TooManyRequests):
+            self.rate_limiter.observe(endpoint, error.response.headers)
+        elif isinstance(error, tweepy.HTTPException) and not isinstance(error, tweepy.TwitterServerError):
+            raise error
+        elif not isinstance(error, tweepy.TweepyException):
+            raise error
+        delay = self.retry_policy.backoff(attempt)
+        if delay is None:
+            raise error
+        logger.warning(f"'{endpoint}' request failed ({error}); retrying in {delay:.1f} seconds.")
+        return delay
+
+    def _call(self, endpoint: str, request: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Make a rate-limited request, retrying transient failures.
+
+        The backoff after a failure and the wait for the endpoint's next token (including any
+        reset reported by the API) overlap in a single wait rather than running one after the
+        other. The calling thread blocks during it, as with RateLimiter.acquire.
+
+        :param endpoint: Endpoint name in TWITTER_RATE_LIMITS.
+        :param request: tweepy API method to call.
+        :return: The method's result.
+        """
+        attempt = 0
+        backoff = 0.0
+        while True:
+            delay = max(backoff, self.rate_limiter.reserve(endpoint))
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                return request(*args, **kwargs)
+            except Exception as e:
+                backoff = self._retry_delay(endpoint, e, attempt)
+            attempt += 1
+
+    async def _acall(self, endpoint: str, request: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Make a rate-limited request like _call, waiting on the event loop instead of in a thread.
+
+        :param endpoint: Endpoint name in TWITTER_RATE_LIMITS.
+        :param request: tweepy API method to call.
+        :return: The method's result.
+        """
+        attempt = 0
+        backoff = 0.0
+        while True:
+            delay = max(backoff, self.rate_limiter.reserve(endpoint))
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await asyncio.to_thread(request, *args, **kwargs)
+            except Exception as e:
+                backoff = self._retry_delay(endpoint, e, attempt)
+            attempt += 1
+
+    @staticmethod
+    def _tweet_params(message: str, in_reply_to_status_id: Optional[int]) -> Dict[str, Any]:
+        return {
+            'status': message,
+            'in_reply_to_status_id': in_reply_to_status_id,
+            'auto_populate_reply_metadata': in_reply_to_status_id is not None
+        }
+
+    def post_tweet(self, message: str, in_reply_to_status_id: Optional[int] = None) -> Optional[int]:
         """
         Post a tweet with the given message.
 
         :param message: The content of the tweet.
+        :param in_reply_to_status_id: Optional ID of the tweet this one replies to.
+        :return: The ID of the posted tweet, or None if posting failed.
         """
         try:
-            self.api.update_status(status=message)
+            status = self._call('tweet', self.api.update_status, **self._tweet_params(message, in_reply_to_status_id))
             logger.info("Tweet posted successfully.")
-        except tweepy.RateLimitError:
-            logger.warning("Rate limit reached. Sleeping for 15 minutes.")
-            time.sleep(15 * 60)
-            self.post_tweet(message)  # Retry after sleeping
-        except tweepy.TweepError as e:
+            return status.id
+        except tweepy.TweepyException as e:
             logger.error(f"Failed to post tweet: {e}")
         except Exception as e:
             logger.error(f"An unexpected error occurred while posting tweet: {e}")
+        return None
 
-    def send_direct_message(self, user_id: int, message: str) -> None:
+    def send_direct_message(self, user_id: int, message: str) -> bool:
         """
         Send a direct message to a user.
 
         :param user_id: The Twitter user ID to send the DM to.
         :param message: The content of the DM.
+        :return: True if the DM was sent.
         """
         try:
-            self.api.send_direct_message(recipient_id=user_id, text=message)
+            self._call('direct_message', self.api.send_direct_message, recipient_id=user_id, text=message)
             logger.info(f"Direct message sent to user ID {user_id}.")
-        except tweepy.RateLimitError:
-            logger.warning("Rate limit reached while sending DM. Sleeping for 15 minutes.")
-            time.sleep(15 * 60)
-            self.send_direct_message(user_id, message)  # Retry after sleeping
-        except tweepy.TweepError as e:
+            return True
+        except tweepy.TweepyException as e:
             logger.error(f"Failed to send direct message: {e}")
         except Exception as e:
             logger.error(f"An unexpected error occurred while sending DM: {e}")
+        return False
 
     def get_user_id(self, screen_name: str) -> Optional[int]:
         """
@@ -75,10 +217,137 @@ class TwitterAPI:
         :return: The user ID or None if not found.
         """
         try:
-            user = self.api.get_user(screen_name=screen_name)
+            user = self._call('user_lookup', self.api.get_user, screen_name=screen_name)
+            logger.debug(f"Retrieved user ID {user.id} for screen name '{screen_name}'.")
+            return user.id
+        except tweepy.TweepyException as e:
+            logger.error(f"Failed to retrieve user ID for '{screen_name}': {e}")
+            return None
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while retrieving user ID: {e}")
+            return None
+
+    def get_mentions(self, since_id: Optional[int] = None, count: int = 200) -> List[Dict[str, Any]]:
+        """
+        Fetch mentions of the authenticated account newer than a cursor.
+
+        With a cursor, pages of ``count`` mentions are fetched newest first, each ending below
+        the oldest mention of the page before, until the cursor is reached, so a burst of more
+        than one page between polls is not skipped. If any page fails nothing is returned and
+        the next poll starts again from the same cursor. Without a cursor, only the newest
+        page is fetched.
+
+        :param since_id: Only return mentions with a greater ID.
+        :param count: Mentions fetched per page.
+        :return: Mentions as dicts with id, text, user_id and screen_name, oldest first.
+        """
+        statuses: List[Any] = []
+        max_id: Optional[int] = None
+        try:
+            while True:
+                page = self._call('mentions', self.api.mentions_timeline, since_id=since_id, max_id=max_id, count=count,
+                                  tweet_mode='extended')
+                statuses.extend(page)
+                if not page or since_id is None:
+                    break
+                max_id = min(status.id for status in page) - 1
+        except tweepy.TweepyException as e:
+            logger.error(f"Failed to fetch mentions: {e}")
+            return []
+        mentions = [
+            {
+                'id': status.id,
+                'text': status.full_text,
+                'user_id': status.user.id,
+                'screen_name': status.user.screen_name
+            }
+            for status in statuses if status.user.id != self.user_id
+        ]
+        return sorted(mentions, key=lambda mention: mention['id'])
+
+    def get_direct_messages(self, since_id: Optional[int] = None, count: int = 50) -> List[Dict[str, Any]]:
+        """
+        Fetch direct messages received by the authenticated account newer than a cursor.
+
+        The DM endpoint has no since_id parameter, so older events are filtered out here.
+
+        :param since_id: Only return messages with a greater ID.
+        :param count: Maximum number of events to fetch.
+        :return: Messages as dicts with id, text and user_id, oldest first.
+        """
+        try:
+            events = self._call('direct_message_list', self.api.get_direct_messages, count=count)
+        except tweepy.TweepyException as e:
+            logger.error(f"Failed to fetch direct messages: {e}")
+            return []
+        messages = []
+        for event in events:
+            sender_id = int(event.message_create['sender_id'])
+            event_id = int(event.id)
+            if sender_id == self.user_id or (since_id is not None and event_id <= since_id):
+                continue
+            messages.append({
+                'id': event_id,
+                'text': event.message_create['message_data']['text'],
+                'user_id': sender_id
+            })
+        return sorted(messages, key=lambda message: message['id'])
+
+    # The v1.1 endpoints used here are only exposed through tweepy's synchronous client, so the
+    # async variants run each request in a worker thread, while rate-limit waits and retry
+    # backoff happen on the event loop.
+
+    async def apost_tweet(self, message: str, in_reply_to_status_id: Optional[int] = None) -> Optional[int]:
+        """
+        Post a tweet without blocking the event loop.
+
+        :param message: The content of the tweet.
+        :param in_reply_to_status_id: Optional ID of the tweet this one replies to.
+        :return: The ID of the posted tweet, or None if posting failed.
+        """
+        try:
+            api = await self._aapi()
+            status = await self._acall('tweet', api.update_status, **self._tweet_params(message, in_reply_to_status_id))
+            logger.info("Tweet posted successfully.")
+            return status.id
+        except tweepy.TweepyException as e:
+            logger.error(f"Failed to post tweet: {e}")
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while posting tweet: {e}")
+        return None
+
+    async def asend_direct_message(self, user_id: int, message: str) -> bool:
+        """
+        Send a direct message without blocking the event loop.
+
+        :param user_id: The Twitter user ID to send the DM to.
+        :param message: The content of the DM.
+        :return: True if the DM was sent.
+        """
+        try:
+            api = await self._aapi()
+            await self._acall('direct_message', api.send_direct_message, recipient_id=user_id, text=message)
+            logger.info(f"Direct message sent to user ID {user_id}.")
+            return True
+        except tweepy.TweepyException as e:
+            logger.error(f"Failed to send direct message: {e}")
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while sending DM: {e}")
+        return False
+
+    async def aget_user_id(self, screen_name: str) -> Optional[int]:
+        """
+        Retrieve the user ID for a screen name without blocking the event loop.
+
+        :param screen_name: The Twitter handle of the user.
+        :return: The user ID or None if not found.
+        """
+        try:
+            api = await self._aapi()
+            user = await self._acall('user_lookup', api.get_user, screen_name=screen_name)
             logger.debug(f"Retrieved user ID {user.id} for screen name '{screen_name}'.")
             return user.id
-        except tweepy.TweepError as e:
+        except tweepy.TweepyException as e:
             logger.error(f"Failed to retrieve user ID for '{screen_name}': {e}")
             return None
         except Exception as e:
@@ -0,0 +1,158 @@
+# utils/url_loader.py
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from threading import BoundedSemaphore, Lock
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+
+logger = logging.getLogger(__name__)
+
+def partition_html_text(html: str) -> str:
+    """
+    Extract the text of an HTML page with Unstructured, as UnstructuredURLLoader does.
+
+    Defined at module level so it can run in a process pool.
+
+    :param html: Raw HTML of the page.
+    :return: Text of the page elements separated by blank lines.
+    """
+    from unstructured.partition.html import partition_html
+    elements = partition_html(text=html)
+    return "\n\n".join(str(element) for element in elements)
+
+class ConcurrentURLLoader:
+    def __init__(self, urls: List[str], fetch_workers: int = 8, parse_workers: Optional[int] = None,
+                 per_host_limit: int = 4, timeout: float = 30.0,
+                 parse_fn: Callable[[str], str] = partition_html_text,
+                 session: Optional[requests.Session] = None, max_in_flight: Optional[int] = None):
+        """
+        Initialize a loader that fetches URLs concurrently and parses them in a process pool.
+
+        Each URL is isolated: a fetch or parse failure is logged and recorded in ``failures``
+        without affecting the other URLs.
+
+        :param urls: URLs to load.
+        :param fetch_workers: Number of threads fetching pages.
+        :param parse_workers: Number of processes parsing pages; 0 parses in the fetch threads
+            and None uses one process per CPU.
+        :param per_host_limit: Maximum number of concurrent requests to one host.
+        :param timeout: Connect/read timeout per request, in seconds.
+        :param parse_fn: Picklable function turning a page's HTML into text.
+        :param session: Optional requests session to fetch with.
+        :param max_in_flight: Maximum number of URLs being fetched or parsed at once; further
+            URLs are only started as loaded documents are consumed. Defaults to twice the
+            number of fetch workers.
+        """
+        self.urls = urls
+        self.fetch_workers = max(1, fetch_workers)
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else max(0, parse_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.timeout = timeout
+        self.parse_fn = parse_fn
+        self.session = session or self._build_session()
+        self.max_in_flight = max(1, max_in_flight or 2 * self.fetch_workers)
+        self.failures: Dict[str, str] = {}
+        self._host_limits: Dict[str, BoundedSemaphore] = {}
+        self._host_lock = Lock()
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.fetch_workers, pool_maxsize=self.fetch_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _host_limit(self, url: str) -> BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            return self._host_limits.setdefault(host, BoundedSemaphore(self.per_host_limit))
+
+    def _fetch(self, url: str) -> str:
+        with self._host_limit(url):
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.text
+
+    def _fetch_and_parse(self, url: str) -> str:
+        return self.parse_fn(self._fetch(url))
+
+    def _record_failure(self, url: str, stage: str, error: Exception) -> None:
+        self.failures[url] = f"{stage} failed: {error}"
+        logger.error(f"Failed to {stage} '{url}': {error}")
+
+    def lazy_load(self) -> Iterator['Document']:
+        """
+        Load the URLs, yielding one document per URL as soon as it is parsed.
+
+        At most ``max_in_flight`` URLs are fetched or parsed at a time, so a slow consumer
+        holds back the loader instead of letting parsed pages pile up in memory.
+
+        :return: Iterator over loaded documents, in completion order.
+        """
+        from langchain.docstore.document import Document
+
+        self.failures = {}
+        # Spawned rather than forked: by now LanceDB, the embedding model and HTTP pools have threads running
+        parse_pool: Optional[Executor] = ProcessPoolExecutor(
+            max_workers=self.parse_workers, mp_context=multiprocessing.get_context('spawn')
+        ) if self.parse_workers else None
+        fetch_pool = ThreadPoolExecutor(max_workers=self.fetch_workers)
+        task = self._fetch if parse_pool else self._fetch_and_parse
+        remaining = iter(self.urls)
+        fetches: Dict[Future, str] = {}
+        parses: Dict[Future, str] = {}
+
+        def fill() -> None:
+            while len(fetches) + len(parses) < self.max_in_flight:
+                url = next(remaining, None)
+                if url is None:
+                    return
+                fetches[fetch_pool.submit(task, url)] = url
+
+        try:
+            fill()
+            while fetches or parses:
+                done, _ = wait(list(fetches) + list(parses), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fetches:
+                        url = fetches.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            self._record_failure(url, 'fetch' if parse_pool else 'load', e)
+                            continue
+                        if parse_pool:
+                            parses[parse_pool.submit(self.parse_fn, result)] = url
+                            continue
+                    else:
+                        url = parses.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            self._record_failure(url, 'parse', e)
+                            continue
+                    yield Document(page_content=result, metadata={'source': url})
+                fill()
+        finally:
+            fetch_pool.shutdown(cancel_futures=True)
+            if parse_pool:
+                parse_pool.shutdown(cancel_futures=True)
+
+    def load(self) -> List['Document']:
+        """
+        Load all URLs.
+
+        :return: Loaded documents in the order of ``urls``; failed URLs are omitted.
+        """
+        order = {url: index for index, url in enumerate(self.urls)}
+        documents = sorted(self.lazy_load(), key=lambda doc: order[doc.metadata['source']])
+        logger.info(f"Loaded {len(documents)} of {len(self.urls)} URLs ({len(self.failures)} failed).")
+        return documents